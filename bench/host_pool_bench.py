@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import configparser
+import json
+import sys
+import time
+
+from core import global_event_loop as gloop
+from core import metrics
+from services import binance_rest_api_async as api_async
+
+BASE_PORT = 18770
+
+
+async def _start_stand_in(port: int, delay_sec: float, state: dict):
+    # Stand-in for one exchange cluster: answers ping and time after delay_sec, or 503 when state["down"]
+    from aiohttp import web
+
+    async def handle(request):
+        state["requests"] += 1
+        await asyncio.sleep(delay_sec)
+        if state["down"]:
+            return web.Response(status=503, text="{}")
+        return web.Response(text=json.dumps({"serverTime": int(time.time() * 1000)}), content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/api/v1/ping", handle)
+    app.router.add_get("/api/v1/time", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def _round_trips(api: api_async.BinanceRestApi, total: int) -> float:
+    # Sequential requests, so every one of them is routed by the current statistics
+    started = time.perf_counter()
+    for _ in range(total):
+        if await api.fetch_server_time(None) is None:
+            raise RuntimeError("Request to the stand-in hosts has failed")
+    return (time.perf_counter() - started) / total
+
+
+async def _run(delays: list, total: int):
+    states = [{"requests": 0, "down": False} for _ in delays]
+    runners = [await _start_stand_in(BASE_PORT + i, delay, states[i]) for i, delay in enumerate(delays)]
+    hosts = ["http://127.0.0.1:{}".format(BASE_PORT + i) for i in range(len(delays))]
+    parser = configparser.ConfigParser()
+    parser.read_dict({"Exchange": {"hosts": ", ".join(hosts), "host_probe_interval_sec": "0.2"}})
+    api = api_async.BinanceRestApi(parser)
+    results = {"hosts": dict(zip(hosts, delays))}
+
+    # Without probes only the first host gets measured, so requests keep the config order
+    results["first_host_ms"] = round(await _round_trips(api, total) * 1000, 2)
+    probe_task = api.start_host_probing()
+    await asyncio.sleep(1)
+    results["best_host"] = api._hosts.best_host()
+    results["best_host_ms"] = round(await _round_trips(api, total) * 1000, 2)
+
+    # The best host goes down, requests fail over and the pool moves to the next one
+    states[hosts.index(results["best_host"])]["down"] = True
+    results["failover_ms"] = round(await _round_trips(api, total) * 1000, 2)
+    results["after_failover_host"] = api._hosts.best_host()
+    results["requests_by_host"] = {host: state["requests"] for host, state in zip(hosts, states)}
+    results["metrics"] = {name: value for name, value in metrics.snapshot().items() if name.startswith("host_pool")}
+
+    probe_task.cancel()
+    for runner in runners:
+        await runner.cleanup()
+    return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Host pool routing over local stand-in exchange hosts")
+    parser.add_argument("-d", "--delays-ms", type=float, nargs="+", default=[60, 10, 30],
+                        help="response delay of every stand-in host")
+    parser.add_argument("-n", "--requests", type=int, default=50)
+    args = parser.parse_args(argv)
+    results = gloop.get_loop().run_until_complete(_run([delay / 1000 for delay in args.delays_ms], args.requests))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import configparser
+import json
+import subprocess
+import sys
+import time
+
+from core import global_event_loop as gloop
+from core import config as cfg
+from core import metrics
+from services import binance_rest_api_async as api_async
+
+MOCK_PORT = 18765
+
+
+def _mock_klines(count: int = 500) -> str:
+    return json.dumps([
+        [1499040000000 + i * 60000, "0.01634790", "0.80000000", "0.01575800", "0.01577100", "148976.11427815",
+         1499040059999 + i * 60000, "2434.19055334", 308, "1756.87402397", "28.46694368", "0"]
+        for i in range(count)
+    ])
+
+
+async def _start_mock_exchange(port: int):
+    # Minimal stand-in for the exchange REST routes used by the benchmark
+    from aiohttp import web
+    klines = _mock_klines()
+    open_orders = json.dumps([{"symbol": "LTCBTC", "orderId": 1, "price": "0.1", "origQty": "1.0",
+                               "executedQty": "0.0", "side": "BUY"}])
+
+    async def handle_klines(request):
+        return web.Response(text=klines, content_type="application/json")
+
+    async def handle_open_orders(request):
+        return web.Response(text=open_orders, content_type="application/json")
+
+    app = web.Application()
+    app.router.add_get("/api/v1/klines", handle_klines)
+    app.router.add_get("/api/v3/openOrders", handle_open_orders)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def _run_requests(api: api_async.BinanceRestApi, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            if i % 2:
+                res = await api.fetch_klines(None, "ETHBTC", "1m", limit=500)
+            else:
+                res = await api.query_open_orders(None, timestamp=int(time.time() * 1000))
+            if res is None:
+                raise RuntimeError("Request to the mock exchange has failed")
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(total)])
+    return time.perf_counter() - started
+
+
+def run_single(use_uvloop: bool, total: int, concurrency: int, port: int):
+    parser = configparser.ConfigParser()
+    parser.read_dict({
+        "Exchange": {"host": "http://127.0.0.1:{}".format(port), "api_key": "bench", "secret": "bench"},
+        "Loop": {"use_uvloop": "yes" if use_uvloop else "no"},
+    })
+    loop = gloop.init_loop(cfg.Settings.from_parser(parser).loop)
+    runner = loop.run_until_complete(_start_mock_exchange(port))
+    api = api_async.BinanceRestApi(parser)
+    loop.run_until_complete(_run_requests(api, concurrency, concurrency))  # warm up
+    elapsed = loop.run_until_complete(_run_requests(api, total, concurrency))
+    loop.run_until_complete(runner.cleanup())
+    print(json.dumps({
+        "loop": metrics.snapshot().get("event_loop.type"),
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_sec": round(elapsed, 3),
+        "requests_per_sec": round(total / elapsed, 1),
+        "lag_p99_ms": metrics.snapshot().get("event_loop.lag_ms.p99"),
+    }))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Async client throughput on asyncio and uvloop event loops")
+    parser.add_argument("-n", "--requests", type=int, default=2000)
+    parser.add_argument("-c", "--concurrency", type=int, default=50)
+    parser.add_argument("--single", choices=["asyncio", "uvloop"], help="run one loop type in this process")
+    args = parser.parse_args(argv)
+    if args.single:
+        run_single(args.single == "uvloop", args.requests, args.concurrency, MOCK_PORT)
+        return
+    # Every loop type runs in a fresh process, the global loop can be created only once
+    for loop_type in ("asyncio", "uvloop"):
+        subprocess.run([sys.executable, "-m", "bench.loop_bench", "--single", loop_type,
+                        "-n", str(args.requests), "-c", str(args.concurrency)])
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,86 @@
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from typing import Tuple
+
+from services import models
+
+
+def _ticker_24h_json(count: int) -> str:
+    # Same fields as /api/v1/ticker/24hr, so the decoded dicts are as big as the real ones
+    rnd = random.Random(1)
+    items = []
+    for i in range(count):
+        price = rnd.uniform(0.000001, 0.1)
+        items.append({
+            "symbol": "S{:04d}BTC".format(i), "priceChange": "{:.8f}".format(price * 0.01),
+            "priceChangePercent": "{:.3f}".format(rnd.uniform(-10, 10)), "weightedAvgPrice": "{:.8f}".format(price),
+            "prevClosePrice": "{:.8f}".format(price), "lastPrice": "{:.8f}".format(price),
+            "lastQty": "1.00000000", "bidPrice": "{:.8f}".format(price * 0.999), "bidQty": "30.00000000",
+            "askPrice": "{:.8f}".format(price * 1.001), "askQty": "3.00000000", "openPrice": "{:.8f}".format(price),
+            "highPrice": "{:.8f}".format(price * 1.05), "lowPrice": "{:.8f}".format(price * 0.95),
+            "volume": "{:.8f}".format(rnd.uniform(1, 1e6)), "quoteVolume": "{:.8f}".format(rnd.uniform(1, 1e4)),
+            "openTime": 1516535006924, "closeTime": 1516621406924, "firstId": 404, "lastId": 504, "count": 101,
+        })
+    return json.dumps(items)
+
+
+def _retained_bytes(build) -> Tuple[int, object]:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    obj = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return sum(stat.size_diff for stat in after.compare_to(before, "filename")), obj
+
+
+def _rank_dicts(items: list, passes: int) -> float:
+    started = time.perf_counter()
+    for _ in range(passes):
+        for item in items:
+            ask = float(item["askPrice"])
+            bid = float(item["bidPrice"])
+            ((ask - bid) / bid) * float(item["quoteVolume"]) * (1 - float(item["priceChangePercent"]) / 100)
+    return time.perf_counter() - started
+
+
+def _rank_models(items: list, passes: int) -> float:
+    started = time.perf_counter()
+    for _ in range(passes):
+        for item in items:
+            ask = item.ask_price
+            bid = item.bid_price
+            ((ask - bid) / bid) * item.quote_volume * (1 - item.price_change_percent / 100)
+    return time.perf_counter() - started
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Memory and access cost of raw ticker dicts vs __slots__ models")
+    parser.add_argument("-n", "--tickers", type=int, default=1500)
+    parser.add_argument("-p", "--passes", type=int, default=20, help="passes over the list, like repeated accesses")
+    args = parser.parse_args(argv)
+    text = _ticker_24h_json(args.tickers)
+
+    dicts_bytes, dicts = _retained_bytes(lambda: json.loads(text))
+    # Models are built from the decoded list, which is dropped right after, as in the worker
+    models_bytes, tickers = _retained_bytes(lambda: models.Ticker.from_json_list(json.loads(text)))
+    started = time.perf_counter()
+    models.Ticker.from_json_list(dicts)
+    parse_sec = time.perf_counter() - started
+
+    print(json.dumps({
+        "tickers": args.tickers,
+        "dicts_kb": round(dicts_bytes / 1024, 1),
+        "models_kb": round(models_bytes / 1024, 1),
+        "models_parse_ms": round(parse_sec * 1000, 2),
+        "rank_dicts_ms": round(_rank_dicts(dicts, args.passes) * 1000, 2),
+        "rank_models_ms": round(_rank_models(tickers, args.passes) * 1000, 2),
+        "passes": args.passes,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
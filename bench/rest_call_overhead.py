@@ -0,0 +1,88 @@
+import argparse
+import hashlib
+import hmac
+import json
+import sys
+import time
+
+from services import endpoints
+
+API_KEY = "bench-api-key"
+SECRET_KEY = "bench-secret-key-of-the-usual-length-0123456789abcdef0123456789abcdef"
+
+_ORDER = {"symbol": "ETHBTC", "side": "BUY", "type": "LIMIT", "quantity": 0.5, "timestamp": 1499827319559,
+          "price": 0.069, "timeInForce": "GTC", "recvWindow": 5000}
+_KLINES = {"symbol": "ETHBTC", "interval": "1m", "startTime": 1499040000000, "limit": 500}
+_OPEN_ORDERS = {"timestamp": 1499827319559, "recvWindow": 5000}
+
+
+def _hand_coded_order() -> tuple:
+    # What every order method of the clients did before the endpoint table
+    params = _ORDER
+    query = "symbol={}&side={}&type={}&quantity={}&timestamp={}".format(
+        params["symbol"], params["side"], params["type"], f"{params['quantity']:.8f}", str(params["timestamp"]))
+    if params.get("timeInForce"):
+        query += "&timeInForce={}".format(params["timeInForce"])
+    if params.get("price"):
+        query += "&price={:.8f}".format(params["price"])
+    if params.get("recvWindow"):
+        query += "&recvWindow={}".format(params["recvWindow"])
+    signature = hmac.new(SECRET_KEY.encode(), query.encode(), hashlib.sha256).hexdigest()
+    query += "&signature={}".format(signature)
+    return "/api/v3/order" + "?" + query, {'X-MBX-APIKEY': '{}'.format(API_KEY)}
+
+
+def _hand_coded_klines() -> tuple:
+    params = _KLINES
+    query = "/api/v1/klines?symbol={}&interval={}".format(params["symbol"], params["interval"])
+    if params.get("startTime"):
+        query += "&startTime={}".format(params["startTime"])
+    if params.get("endTime"):
+        query += "&endTime={}".format(params["endTime"])
+    if params.get("limit"):
+        query += "&limit={}".format(str(params["limit"]))
+    return query, None
+
+
+def _hand_coded_open_orders() -> tuple:
+    params = _OPEN_ORDERS
+    query = "timestamp={}".format(str(params["timestamp"]))
+    if params.get("recvWindow"):
+        query += "&recvWindow={}".format(str(params["recvWindow"]))
+    signature = hmac.new(SECRET_KEY.encode(), query.encode(), hashlib.sha256).hexdigest()
+    query += "&signature={}".format(signature)
+    return "/api/v3/openOrders" + "?" + query, {'X-MBX-APIKEY': '{}'.format(API_KEY)}
+
+
+def _per_call_us(func, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return round((time.perf_counter() - started) / calls * 1e6, 3)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Per-call cost of building and signing a REST request")
+    parser.add_argument("-n", "--calls", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    builder = endpoints.RequestBuilder(API_KEY, SECRET_KEY)
+    cases = (
+        ("new_order", _ORDER, _hand_coded_order),
+        ("klines", _KLINES, _hand_coded_klines),
+        ("open_orders", _OPEN_ORDERS, _hand_coded_open_orders),
+    )
+    results = {}
+    for name, params, hand_coded in cases:
+        endpoint = endpoints.ENDPOINTS[name]
+        if builder.build(endpoint, params) != hand_coded():
+            raise RuntimeError("Request of {} differs from the hand-coded one".format(name))
+        results[name] = {
+            "hand_coded_us": _per_call_us(hand_coded, args.calls),
+            "registry_us": _per_call_us(lambda: builder.build(endpoint, params), args.calls),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+# Same imports as "python core/cbot.py" does before the first cycle
+STARTUP_CODE = "import sys; sys.path.insert(0, 'core'); import cbot"
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    :return: [(module, self_us, cumulative_us)] for every line of -X importtime output
+    """
+    res = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        res.append((module.rstrip(), int(self_us), int(cumulative_us)))
+    return res
+
+
+def _depth(module: str) -> int:
+    return (len(module) - len(module.lstrip())) // 2
+
+
+def run_once() -> Tuple[float, List[Tuple[str, int, int]]]:
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+        cwd=PROJECT_ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError("Startup imports have failed:\n{}".format(proc.stderr[-2000:]))
+    return wall_ms, parse_importtime(proc.stderr)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Startup import time of the bot")
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    parser.add_argument("-t", "--top", type=int, default=15)
+    parser.add_argument("-o", "--output", help="append the result as a json line to this file")
+    args = parser.parse_args(argv)
+
+    runs = [run_once() for _ in range(args.runs)]
+    best_wall_ms, best_modules = min(runs, key=lambda run: run[0])
+    # Cumulative time of a module includes everything it pulled in. Depth 0 gives the total,
+    # depth 1 shows what cbot imports directly
+    total_import_ms = sum(module[2] for module in best_modules if _depth(module[0]) == 0) / 1000
+    top_level = [module for module in best_modules if _depth(module[0]) == 1]
+    top_level.sort(key=lambda module: module[2], reverse=True)
+
+    print("Process wall time (best of {}): {:.1f} ms".format(args.runs, best_wall_ms))
+    print("Imports cumulative: {:.1f} ms in {} modules".format(total_import_ms, len(best_modules)))
+    for module, self_us, cumulative_us in top_level[:args.top]:
+        print("{:>10.1f} ms  {}".format(cumulative_us / 1000, module.strip()))
+
+    if args.output:
+        with open(args.output, "a") as f:
+            f.write(json.dumps({
+                "time": int(time.time()),
+                "wall_ms": round(best_wall_ms, 1),
+                "imports_ms": round(total_import_ms, 1),
+                "modules": len(best_modules),
+                "top": [(module.strip(), cumulative_us) for module, _, cumulative_us in top_level[:args.top]],
+            }) + "\n")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
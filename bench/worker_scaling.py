@@ -0,0 +1,99 @@
+import argparse
+import configparser
+import json
+import sys
+import time
+import tracemalloc
+from typing import Dict
+
+from core import config as cfg
+from core import log_facade
+from services import binance_worker
+from services import sim_market
+
+
+# Time of every phase of the last _work call
+_PHASES: Dict[str, float] = {}
+
+
+def _timed(name: str, func, *args):
+    started = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        _PHASES[name] = _PHASES.get(name, 0.0) + time.perf_counter() - started
+
+
+class _TimedWorker(binance_worker.BinanceWorker):
+    def _generate_sell_orders_slow(self, *args):
+        return _timed("sell_ms", super()._generate_sell_orders_slow, *args)
+
+    def _generate_buy_orders_slow(self, *args):
+        return _timed("buy_ms", super()._generate_buy_orders_slow, *args)
+
+    def _apply_buy_orders(self, *args):
+        return _timed("apply_ms", super()._apply_buy_orders, *args)
+
+
+class _TimedWrapper(binance_worker.ApiWrapperSim):
+    def exchange_symbols_info(self):
+        return _timed("symbols_info_ms", super().exchange_symbols_info)
+
+    def sorted_trade_pairs_btc(self):
+        return _timed("rank_ms", super().sorted_trade_pairs_btc)
+
+
+def _run(symbols: int, held: int, seed: int, cycles: int, trace_memory: bool) -> dict:
+    started = time.perf_counter()
+    market = sim_market.SyntheticMarket(symbols=symbols, held_assets=held, seed=seed)
+    generate_sec = time.perf_counter() - started
+    config = configparser.ConfigParser()
+    settings = cfg.Settings.from_parser(config)
+    wrapper = _TimedWrapper(config, market.exchange, settings=settings)
+    worker = _TimedWorker(config, api_wrapper=wrapper, settings=settings)
+    res = {"symbols": symbols, "btc_pairs": len(market.btc_symbols), "held": held,
+           "generate_ms": round(generate_sec * 1000, 1)}
+    for cycle in range(cycles):
+        _PHASES.clear()
+        requests_before = wrapper._api.requests
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        worker._work()
+        work_sec = time.perf_counter() - started
+        if trace_memory:
+            res["peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+            tracemalloc.stop()
+        # The first cycle fills the trades cache, the next ones show the steady state
+        prefix = "cold_" if cycle == 0 else "warm_"
+        res[prefix + "work_ms"] = round(work_sec * 1000, 1)
+        res[prefix + "requests"] = wrapper._api.requests - requests_before
+        if cycle == cycles - 1:
+            res.update({name: round(value * 1000, 2) for name, value in sorted(_PHASES.items())})
+        market.exchange.step_market()
+    return res
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Time and memory of BinanceWorker._work on a synthetic market "
+                                                 "as the number of symbols and held assets grows")
+    parser.add_argument("-n", "--symbols", default="100,300,1000,3000,10000", help="comma separated sizes")
+    parser.add_argument("-m", "--held", type=int, default=None, help="held assets, default is 10%% of symbols")
+    parser.add_argument("-c", "--cycles", type=int, default=2)
+    parser.add_argument("-s", "--seed", type=int, default=1)
+    parser.add_argument("--memory", action="store_true", help="trace peak memory (makes the timings slower)")
+    args = parser.parse_args(argv)
+    # Debug records of every symbol would measure the logger instead of the worker
+    log_facade.LOG.configure(cfg.LogSettings(level="WARNING", queue_size=10000, rank_log_every_n=1000000,
+                                             metrics_interval_sec=0))
+
+    results = []
+    for symbols in (int(item) for item in args.symbols.split(",")):
+        held = args.held if args.held is not None else max(1, symbols // 10)
+        results.append(_run(symbols, held, args.seed, max(1, args.cycles), args.memory))
+        print(json.dumps(results[-1]), file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
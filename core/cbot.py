@@ -1,4 +1,3 @@
-import setup_path
 import asyncio as aio
 import getopt
 import os
@@ -6,11 +5,15 @@ import sys
 import signal
 from typing import List
 
-import daemon
-from daemon import pidfile
-
-import global_event_loop as gloop
-import config as cfg
+import setup_path
+setup_path.correct_python_path()
+
+# Project modules are imported by their package path only, so core modules aren't loaded twice
+from core import global_event_loop as gloop
+from core import config as cfg
+from core import log_facade
+from core import metrics
+from core import tracing
 from logger import logger
 from services import exchange_factory
 from utils import async_timer
@@ -24,13 +27,34 @@ class Application(object):
         self.config_filename = None
         self.is_run_background = None
         self.is_stopped = False
+        self.is_reload_requested = False
+        self._stop_task: aio.Task = None
+        self._worker = None  # Lives between cycles, so the fast re-pricing uses the state of the last cycle
         signal.signal(signal.SIGINT, self.stopping)
         signal.signal(signal.SIGTERM, self.stopping)
-        signal.signal(signal.SIGUSR1, self.init_config)
+        signal.signal(signal.SIGUSR1, self.request_config_reload)
 
     def stopping(self, signum, frame):
         LOG.info("SIGTEMR signal has received")
         self.is_stopped = True
+        loop = gloop.get_loop()
+        if loop.is_running():
+            loop.call_soon_threadsafe(self.stop)
+
+    def stop(self):
+        # Running tasks are cancelled and awaited, then the loop is stopped and main() returns
+        if self._stop_task:
+            return
+
+        async def _async_stop():
+            await gloop.cancel_all_tasks(cfg.global_settings.tasks.shutdown_timeout_sec)
+            gloop.get_loop().stop()
+
+        LOG.info("Stopping application...")
+        if self._worker:
+            self._worker.save_state()
+        metrics.log_snapshot()
+        self._stop_task = gloop.push_async_task(None, _async_stop)
 
     def initialize(self) -> bool:
         try:
@@ -58,15 +82,75 @@ class Application(object):
         LOG.info("After init argv param. Config filename: {}, run in background: {}"
                  .format(self.config_filename, self.is_run_background))
 
-    def init_config(self, signum=None, frame=None):
+    def init_config(self):
         LOG.info("Config file:{}".format(self.config_filename))
         cfg.init_global_config(self.config_filename)
+        log_facade.LOG.configure(cfg.global_settings.log)
+        tracing.configure(cfg.global_settings.trace)
+
+    def request_config_reload(self, signum, frame):
+        # The worker may be in the middle of a cycle. New config is applied before the next one
+        LOG.info("SIGUSR1 signal has received. Config will be reloaded before the next cycle")
+        self.is_reload_requested = True
+
+    def reload_config_if_requested(self):
+        if not self.is_reload_requested:
+            return
+        self.is_reload_requested = False
+        try:
+            self.init_config()
+            if self._worker:
+                self._worker.save_state()  # The new worker starts warm from it
+            self._worker = None  # Created again with the new settings
+        except Exception as ex:
+            LOG.error("Config reload has failed, keep the current one: {}".format(ex.args[-1]))
 
     def run(self) -> bool:
         LOG.debug("Application has ran")
+        self.start_host_probing()
         self._async_start()
+        self._start_reprice_timer()
+        self._start_metrics_timer()
         return True
 
+    def _start_metrics_timer(self):
+        interval_sec = cfg.global_settings.log.metrics_interval_sec
+        if not interval_sec or self.is_stopped:
+            return
+        timer = async_timer.Timer(self.log_metrics, interval_sec)
+        if not timer.start():
+            LOG.error("{} - unknown error".format(LOG.func_name()))
+
+    def log_metrics(self, future: aio.Future):
+        if self.is_stopped:
+            return
+        metrics.log_snapshot()
+        self._start_metrics_timer()
+
+    def _start_reprice_timer(self):
+        interval_sec = cfg.global_settings.exchange.reprice_interval_sec
+        if not interval_sec or self.is_stopped:
+            return
+        timer = async_timer.Timer(self.awake_reprice, interval_sec)
+        if not timer.start():
+            LOG.error("{} - unknown error".format(LOG.func_name()))
+
+    def awake_reprice(self, future: aio.Future):
+        if self.is_stopped:
+            return
+        if self._worker:
+            try:
+                self._worker.run_reprice()
+            except Exception as ex:
+                LOG.error("Unknown error has occured in worker re-pricing:{}".format(ex.args[-1]))
+        self._start_reprice_timer()
+
+    def start_host_probing(self):
+        if len(cfg.global_settings.exchange.hosts) < 2:
+            return
+        from services import binance_rest_api_async
+        binance_rest_api_async.BinanceRestApi(cfg.global_core_conf).start_host_probing()
+
     def _async_start(self):
         timer = async_timer.Timer(self.awake, timeout_sec=0)
         if not timer.start():
@@ -74,13 +158,18 @@ class Application(object):
             sys.exit(2)
 
     def start(self):
-        host = cfg.global_core_conf.get("Exchange", "host", fallback="https://api.binance.com")
+        self.reload_config_if_requested()
+        settings = cfg.global_settings
+        host = settings.exchange.host
         LOG.debug("Starting tasks for application for host:{}".format(host))
         if "binance" in host:
-            worker = exchange_factory.ExchangeFactory.create_exchange(
-                exchange_factory.Exchanges.BINANCE,
-                config=cfg.global_core_conf
-            )
+            if not self._worker:
+                self._worker = exchange_factory.ExchangeFactory.create_exchange(
+                    exchange_factory.Exchanges.BINANCE,
+                    config=cfg.global_core_conf,
+                    settings=settings
+                )
+            worker = self._worker
             if worker:
                 LOG.info("Starting worker...")
                 try:
@@ -93,33 +182,53 @@ class Application(object):
             LOG.error("Did't set a name of working exchange! Abort")
             sys.exit(1)
         if self.is_stopped:
-            LOG.info("Stopped application and exit")
-            sys.exit(0)
-        timer = async_timer.Timer(self.awake, cfg.global_core_conf.getint("Exchange", "awake_timeout_sec", fallback=300))
+            self.stop()
+            return
+        timeout_sec = settings.exchange.awake_timeout_sec
+        if self._worker:
+            timeout_sec = self._worker.next_awake_timeout_sec(timeout_sec)
+        timer = async_timer.Timer(self.awake, timeout_sec)
         if not timer.start():
             sys.exit(2)
 
     def awake(self, future: aio.Future):
-        if future:
+        if self.is_stopped:
+            self.stop()
+        elif future:
             self.start()
         else:
             LOG.error("{} - Invalid future. Aborting...".format(LOG.func_name()))
             sys.exit(4)
 
 
+def configure_task_groups(tasks_settings):
+    gloop.configure_group(
+        gloop.GROUP_REST,
+        max_concurrent=tasks_settings.rest_max_concurrent,
+        timeout_sec=tasks_settings.rest_timeout_sec
+    )
+
+
 def main(argv):
     app = Application(argv)
     file_pid_lock = __file__ + ".lock"
     LOG.debug("{}".format(file_pid_lock))
     try:
         def run():
+            gloop.init_loop(cfg.global_settings.loop)
+            cfg.subscribe("loop", lambda old_settings, new_settings: gloop.init_loop(new_settings))
+            configure_task_groups(cfg.global_settings.tasks)
+            cfg.subscribe("tasks", lambda old_settings, new_settings: configure_task_groups(new_settings))
             if app.run():
-                gloop.global_ev_loop.run_forever()
+                gloop.get_loop().run_forever()
+                LOG.info("Stopped application and exit")
 
         if not app.initialize():
             sys.exit(5)
         if app.is_daemon():
             LOG.info("Daemonize this application. Lock file: {} Pwd: {}".format(file_pid_lock, os.getcwd()))
+            import daemon
+            from daemon import pidfile
             with daemon.DaemonContext(
                 working_directory=os.getcwd(),  # Get working dir
                 umask=0o002,
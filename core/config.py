@@ -1,11 +1,393 @@
 from configparser import ConfigParser
+from dataclasses import dataclass, fields
+from typing import Callable, Dict, List, Tuple
 from logger import logger
 
 LOG = logger.LOG
+
+
+@dataclass(frozen=True)
+class ExchangeSettings(object):
+    __slots__ = ("host", "hosts", "host_probe_interval_sec", "awake_timeout_sec", "min_pair_price",
+                 "min_profit_coef", "loss_time_sec", "trade_pairs_limit", "min_free_btc_split_coef", "dry_run",
+                 "dry_run_report_file", "reprice_interval_sec", "symbols_info_ttl_sec", "account_ttl_sec",
+                 "order_qty_tolerance_pct")
+    host: str
+    hosts: Tuple[str, ...]
+    host_probe_interval_sec: float
+    awake_timeout_sec: int
+    min_pair_price: float
+    min_profit_coef: float
+    loss_time_sec: int
+    trade_pairs_limit: int
+    min_free_btc_split_coef: int
+    dry_run: bool
+    dry_run_report_file: str
+    reprice_interval_sec: float
+    symbols_info_ttl_sec: float
+    account_ttl_sec: float
+    order_qty_tolerance_pct: float
+
+    @staticmethod
+    def from_parser(parser: ConfigParser) -> "ExchangeSettings":
+        host = parser.get("Exchange", "host", fallback="https://api.binance.com")
+        # Equivalent base urls separated by comma, e.g. "https://api.binance.com, https://api1.binance.com"
+        hosts = tuple(item.strip().rstrip("/") for item in parser.get("Exchange", "hosts", fallback="").split(",")
+                      if item.strip())
+        res = ExchangeSettings(
+            host=host,
+            hosts=hosts if hosts else (host.rstrip("/"),),
+            host_probe_interval_sec=parser.getfloat("Exchange", "host_probe_interval_sec", fallback=30),
+            awake_timeout_sec=parser.getint("Exchange", "awake_timeout_sec", fallback=300),
+            min_pair_price=parser.getfloat("Exchange", "min_pair_price", fallback=0.000001),
+            min_profit_coef=parser.getfloat("Exchange", "min_profit_coef", fallback=1.04),
+            loss_time_sec=parser.getint("Exchange", "loss_time_sec", fallback=604800),  # default - 7 days
+            trade_pairs_limit=parser.getint("Exchange", "trade_pairs_limit", fallback=10),
+            min_free_btc_split_coef=parser.getint("Exchange", "min_free_btc_split_coef", fallback=200),
+            # Orders are only validated by the test order endpoint and reported, nothing is placed or cancelled
+            dry_run=parser.getboolean("Exchange", "dry_run", fallback=False),
+            dry_run_report_file=parser.get("Exchange", "dry_run_report_file", fallback="dry_run_report.jsonl"),
+            # Fast re-pricing by the book ticker between the full cycles, 0 - disabled
+            reprice_interval_sec=parser.getfloat("Exchange", "reprice_interval_sec", fallback=0),
+            # How long the worker keeps symbols metadata and balances between cycles, 0 - fetched every cycle
+            symbols_info_ttl_sec=parser.getfloat("Exchange", "symbols_info_ttl_sec", fallback=3600),
+            account_ttl_sec=parser.getfloat("Exchange", "account_ttl_sec", fallback=60),
+            # Open order is kept if its remaining quantity differs from the wanted one not more than by this percent
+            order_qty_tolerance_pct=parser.getfloat("Exchange", "order_qty_tolerance_pct", fallback=5),
+        )
+        if not res.host:
+            raise ValueError("Did't got host param from config")
+        if res.host_probe_interval_sec <= 0:
+            raise ValueError("Exchange.host_probe_interval_sec must be > 0")
+        if res.awake_timeout_sec < 0 or res.reprice_interval_sec < 0 \
+                or res.symbols_info_ttl_sec < 0 or res.account_ttl_sec < 0:
+            raise ValueError("Exchange intervals and ttls must be >= 0")
+        if res.trade_pairs_limit <= 0 or res.min_free_btc_split_coef <= 0:
+            raise ValueError("Exchange.trade_pairs_limit and Exchange.min_free_btc_split_coef must be > 0")
+        if res.order_qty_tolerance_pct < 0:
+            raise ValueError("Exchange.order_qty_tolerance_pct must be >= 0")
+        return res
+
+
+@dataclass(frozen=True)
+class RankSettings(object):
+    __slots__ = ("percent_multiply_coef",)
+    percent_multiply_coef: float
+
+    @staticmethod
+    def from_parser(parser: ConfigParser) -> "RankSettings":
+        return RankSettings(
+            percent_multiply_coef=parser.getfloat("Rank", "percent_multiply_coef", fallback=2),
+        )
+
+
+@dataclass(frozen=True)
+class CacheSettings(object):
+    __slots__ = ("trades_cache_file", "trades_cache_max_symbols", "checkpoint_file", "checkpoint_interval_sec",
+                 "checkpoint_max_age_sec")
+    trades_cache_file: str
+    trades_cache_max_symbols: int
+    checkpoint_file: str
+    checkpoint_interval_sec: float
+    checkpoint_max_age_sec: float
+
+    @staticmethod
+    def from_parser(parser: ConfigParser) -> "CacheSettings":
+        res = CacheSettings(
+            trades_cache_file=parser.get("Cache", "trades_cache_file", fallback="my_trades_cache.json"),
+            trades_cache_max_symbols=parser.getint("Cache", "trades_cache_max_symbols", fallback=512),
+            # Worker state for the warm restart, empty - disabled
+            checkpoint_file=parser.get("Cache", "checkpoint_file", fallback="worker_checkpoint.bin"),
+            checkpoint_interval_sec=parser.getfloat("Cache", "checkpoint_interval_sec", fallback=60),
+            checkpoint_max_age_sec=parser.getfloat("Cache", "checkpoint_max_age_sec", fallback=86400),
+        )
+        if res.trades_cache_max_symbols <= 0:
+            raise ValueError("Cache.trades_cache_max_symbols must be > 0")
+        if res.checkpoint_interval_sec < 0 or res.checkpoint_max_age_sec < 0:
+            raise ValueError("Cache.checkpoint_interval_sec and Cache.checkpoint_max_age_sec must be >= 0")
+        return res
+
+
+@dataclass(frozen=True)
+class BackfillSettings(object):
+    __slots__ = ("klines_dir", "klines_page_limit", "max_concurrent_requests", "requests_per_sec",
+                 "agg_trades_window_sec")
+    klines_dir: str
+    klines_page_limit: int
+    max_concurrent_requests: int
+    requests_per_sec: float
+    agg_trades_window_sec: int
+
+    @staticmethod
+    def from_parser(parser: ConfigParser) -> "BackfillSettings":
+        res = BackfillSettings(
+            klines_dir=parser.get("Backfill", "klines_dir", fallback="klines_cache"),
+            klines_page_limit=parser.getint("Backfill", "klines_page_limit", fallback=500),
+            max_concurrent_requests=parser.getint("Backfill", "max_concurrent_requests", fallback=8),
+            requests_per_sec=parser.getfloat("Backfill", "requests_per_sec", fallback=10),
+            agg_trades_window_sec=parser.getint("Backfill", "agg_trades_window_sec", fallback=3600),
+        )
+        if res.max_concurrent_requests <= 0 or res.requests_per_sec <= 0 or res.klines_page_limit <= 0 \
+                or res.agg_trades_window_sec <= 0:
+            raise ValueError("Backfill limits must be > 0")
+        return res
+
+
+@dataclass(frozen=True)
+class LoopSettings(object):
+    __slots__ = ("use_uvloop", "debug", "slow_callback_duration_sec", "default_executor_workers",
+                 "lag_monitor_interval_sec", "lag_log_interval_sec")
+    use_uvloop: bool
+    debug: bool
+    slow_callback_duration_sec: float
+    default_executor_workers: int
+    lag_monitor_interval_sec: float
+    lag_log_interval_sec: float
+
+    @staticmethod
+    def from_parser(parser: ConfigParser) -> "LoopSettings":
+        res = LoopSettings(
+            use_uvloop=parser.getboolean("Loop", "use_uvloop", fallback=False),
+            debug=parser.getboolean("Loop", "debug", fallback=False),
+            slow_callback_duration_sec=parser.getfloat("Loop", "slow_callback_duration_sec", fallback=0.1),
+            default_executor_workers=parser.getint("Loop", "default_executor_workers", fallback=0),  # 0 - default
+            # Heartbeat of the loop lag monitor, 0 - disabled. Stalls longer than slow_callback_duration_sec
+            # are caught with the stack of the blocking callback
+            lag_monitor_interval_sec=parser.getfloat("Loop", "lag_monitor_interval_sec", fallback=0.5),
+            lag_log_interval_sec=parser.getfloat("Loop", "lag_log_interval_sec", fallback=60),
+        )
+        if res.slow_callback_duration_sec <= 0 or res.default_executor_workers < 0:
+            raise ValueError("Loop.slow_callback_duration_sec must be > 0 and default_executor_workers >= 0")
+        if res.lag_monitor_interval_sec < 0 or res.lag_log_interval_sec < 0:
+            raise ValueError("Loop.lag_monitor_interval_sec and Loop.lag_log_interval_sec must be >= 0")
+        return res
+
+
+@dataclass(frozen=True)
+class LogSettings(object):
+    __slots__ = ("level", "queue_size", "rank_log_every_n", "metrics_interval_sec")
+    level: str
+    queue_size: int
+    rank_log_every_n: int
+    metrics_interval_sec: float
+
+    @staticmethod
+    def from_parser(parser: ConfigParser) -> "LogSettings":
+        res = LogSettings(
+            level=parser.get("Log", "level", fallback=None),  # None - level of the logger file handler
+            queue_size=parser.getint("Log", "queue_size", fallback=10000),
+            rank_log_every_n=parser.getint("Log", "rank_log_every_n", fallback=50),
+            # Snapshot of core.metrics is written to the log with this interval, 0 - only on stop
+            metrics_interval_sec=parser.getfloat("Log", "metrics_interval_sec", fallback=300),
+        )
+        if res.level and res.level.upper() not in ("DEBUG", "INFO", "WARNING", "ERROR"):
+            raise ValueError("Log.level must be one of DEBUG, INFO, WARNING, ERROR")
+        if res.queue_size <= 0 or res.rank_log_every_n <= 0:
+            raise ValueError("Log.queue_size and Log.rank_log_every_n must be > 0")
+        if res.metrics_interval_sec < 0:
+            raise ValueError("Log.metrics_interval_sec must be >= 0")
+        return res
+
+
+@dataclass(frozen=True)
+class TasksSettings(object):
+    __slots__ = ("rest_max_concurrent", "rest_timeout_sec", "shutdown_timeout_sec")
+    rest_max_concurrent: int
+    rest_timeout_sec: float
+    shutdown_timeout_sec: float
+
+    @staticmethod
+    def from_parser(parser: ConfigParser) -> "TasksSettings":
+        res = TasksSettings(
+            rest_max_concurrent=parser.getint("Tasks", "rest_max_concurrent", fallback=10),  # 0 - unlimited
+            rest_timeout_sec=parser.getfloat("Tasks", "rest_timeout_sec", fallback=30),  # 0 - unlimited
+            shutdown_timeout_sec=parser.getfloat("Tasks", "shutdown_timeout_sec", fallback=5),
+        )
+        if res.rest_max_concurrent < 0 or res.rest_timeout_sec < 0 or res.shutdown_timeout_sec < 0:
+            raise ValueError("Tasks limits must be >= 0")
+        return res
+
+
+# Names of the REST endpoints for their own timeouts
+ENDPOINTS = ("ping", "server_time", "exchange_info", "order_book", "trades", "agg_trades", "klines", "ticker_24h",
+             "book_ticker", "new_order", "test_order", "open_orders", "cancel_order", "account", "my_trades")
+# Heavy answers of all symbols need more time to read than the default
+_ENDPOINT_TIMEOUTS_DEFAULT = {"exchange_info": "3, 30", "ticker_24h": "3, 15", "klines": "3, 15"}
+
+
+@dataclass(frozen=True)
+class TimeoutSettings(object):
+    __slots__ = ("connect_sec", "read_sec", "endpoints", "cycle_budget_sec")
+    connect_sec: float
+    read_sec: float
+    endpoints: Tuple[Tuple[str, float, float], ...]
+    cycle_budget_sec: float
+
+    def for_endpoint(self, name: str) -> Tuple[float, float]:
+        """
+        :return: (connect, read) timeouts in seconds
+        """
+        for endpoint, connect_sec, read_sec in self.endpoints:
+            if endpoint == name:
+                return connect_sec, read_sec
+        return self.connect_sec, self.read_sec
+
+    @staticmethod
+    def from_parser(parser: ConfigParser) -> "TimeoutSettings":
+        connect_sec = parser.getfloat("Timeouts", "connect_sec", fallback=3)
+        read_sec = parser.getfloat("Timeouts", "read_sec", fallback=5)
+        values = dict(_ENDPOINT_TIMEOUTS_DEFAULT)
+        if parser.has_section("Timeouts"):
+            values.update({key: value for key, value in parser.items("Timeouts")
+                           if key not in ("connect_sec", "read_sec", "cycle_budget_sec")})
+        endpoints = []
+        for name, value in sorted(values.items()):
+            if name not in ENDPOINTS:
+                raise ValueError("Unknown endpoint in Timeouts: {}".format(name))
+            # "<read>" or "<connect>, <read>"
+            items = [float(item) for item in value.split(",")]
+            endpoints.append((name, items[0] if len(items) > 1 else connect_sec, items[-1]))
+        res = TimeoutSettings(
+            connect_sec=connect_sec,
+            read_sec=read_sec,
+            endpoints=tuple(endpoints),
+            # The worker cycle is aborted after it, the orders would be placed by stale prices. 0 - unlimited
+            cycle_budget_sec=parser.getfloat("Timeouts", "cycle_budget_sec", fallback=60),
+        )
+        if res.connect_sec <= 0 or res.read_sec <= 0 \
+                or any(connect <= 0 or read <= 0 for _, connect, read in res.endpoints):
+            raise ValueError("Timeouts must be > 0")
+        if res.cycle_budget_sec < 0:
+            raise ValueError("Timeouts.cycle_budget_sec must be >= 0")
+        return res
+
+
+@dataclass(frozen=True)
+class TraceSettings(object):
+    __slots__ = ("sample_rate", "dir", "max_events_per_trace")
+    sample_rate: float
+    dir: str
+    max_events_per_trace: int
+
+    @staticmethod
+    def from_parser(parser: ConfigParser) -> "TraceSettings":
+        res = TraceSettings(
+            sample_rate=parser.getfloat("Trace", "sample_rate", fallback=0),  # Share of traced cycles, 0 - disabled
+            dir=parser.get("Trace", "dir", fallback="traces"),
+            max_events_per_trace=parser.getint("Trace", "max_events_per_trace", fallback=100000),
+        )
+        if not 0 <= res.sample_rate <= 1:
+            raise ValueError("Trace.sample_rate must be in [0, 1]")
+        if res.max_events_per_trace <= 0:
+            raise ValueError("Trace.max_events_per_trace must be > 0")
+        return res
+
+
+@dataclass(frozen=True)
+class ScheduleSettings(object):
+    __slots__ = ("adaptive", "min_interval_sec", "max_interval_sec", "busy_move_percent", "quiet_move_percent",
+                 "weight_limit_per_min", "weight_budget_share")
+    adaptive: bool
+    min_interval_sec: float
+    max_interval_sec: float
+    busy_move_percent: float
+    quiet_move_percent: float
+    weight_limit_per_min: int
+    weight_budget_share: float
+
+    @staticmethod
+    def from_parser(parser: ConfigParser) -> "ScheduleSettings":
+        res = ScheduleSettings(
+            # Interval between the worker cycles by the market activity, otherwise Exchange.awake_timeout_sec
+            adaptive=parser.getboolean("Schedule", "adaptive", fallback=False),
+            min_interval_sec=parser.getfloat("Schedule", "min_interval_sec", fallback=30),
+            max_interval_sec=parser.getfloat("Schedule", "max_interval_sec", fallback=900),
+            # 90th percentile of the price moves of BTC pairs between cycles, scaled to one minute
+            busy_move_percent=parser.getfloat("Schedule", "busy_move_percent", fallback=0.5),
+            quiet_move_percent=parser.getfloat("Schedule", "quiet_move_percent", fallback=0.1),
+            weight_limit_per_min=parser.getint("Schedule", "weight_limit_per_min", fallback=1200),
+            # Share of the request weight limit which the worker cycles and re-pricing may use
+            weight_budget_share=parser.getfloat("Schedule", "weight_budget_share", fallback=0.5),
+        )
+        if res.min_interval_sec <= 0 or res.max_interval_sec < res.min_interval_sec:
+            raise ValueError("Schedule.min_interval_sec must be > 0 and <= Schedule.max_interval_sec")
+        if res.quiet_move_percent < 0 or res.busy_move_percent <= res.quiet_move_percent:
+            raise ValueError("Schedule.busy_move_percent must be > Schedule.quiet_move_percent >= 0")
+        if res.weight_limit_per_min <= 0 or not 0 < res.weight_budget_share <= 1:
+            raise ValueError("Schedule.weight_limit_per_min must be > 0 and weight_budget_share in (0, 1]")
+        return res
+
+
+@dataclass(frozen=True)
+class Settings(object):
+    """
+    Immutable typed snapshot of the config. It is parsed and validated once and never changed,
+    reload builds a new snapshot and swaps it in between worker cycles.
+    """
+    __slots__ = ("exchange", "rank", "cache", "backfill", "loop", "log", "tasks", "trace", "schedule", "timeouts")
+    exchange: ExchangeSettings
+    rank: RankSettings
+    cache: CacheSettings
+    backfill: BackfillSettings
+    loop: LoopSettings
+    log: LogSettings
+    tasks: TasksSettings
+    trace: TraceSettings
+    schedule: ScheduleSettings
+    timeouts: TimeoutSettings
+
+    @staticmethod
+    def from_parser(parser: ConfigParser) -> "Settings":
+        return Settings(
+            exchange=ExchangeSettings.from_parser(parser),
+            rank=RankSettings.from_parser(parser),
+            cache=CacheSettings.from_parser(parser),
+            backfill=BackfillSettings.from_parser(parser),
+            loop=LoopSettings.from_parser(parser),
+            log=LogSettings.from_parser(parser),
+            tasks=TasksSettings.from_parser(parser),
+            trace=TraceSettings.from_parser(parser),
+            schedule=ScheduleSettings.from_parser(parser),
+            timeouts=TimeoutSettings.from_parser(parser),
+        )
+
+
 global_core_conf: ConfigParser = ConfigParser()
+global_settings: Settings = Settings.from_parser(global_core_conf)
+_section_subscribers: Dict[str, List[Callable]] = {}
+
+
+def subscribe(section: str, callback: Callable):
+    """
+    :param section: field name of Settings, e.g. "exchange"
+    :param callback: callback(old_section_settings, new_section_settings), fired when the section has changed
+    """
+    if section not in (field.name for field in fields(Settings)):
+        raise ValueError("Unknown config section: {}".format(section))
+    _section_subscribers.setdefault(section, []).append(callback)
+
+
+def _notify_changed(old: Settings, new: Settings):
+    for field in fields(Settings):
+        old_section = getattr(old, field.name)
+        new_section = getattr(new, field.name)
+        if old_section == new_section:
+            continue
+        LOG.info("Config section '{}' has changed: {}".format(field.name, new_section))
+        for callback in _section_subscribers.get(field.name, []):
+            try:
+                callback(old_section, new_section)
+            except Exception as ex:
+                LOG.error("Error fired in config subscriber for '{}': {}".format(field.name, ex.args[-1]))
 
 
 def init_global_config(filename: str):
-    global_core_conf.read(filename)
-    for section in global_core_conf.sections():  # Printing config
-        LOG.info('{0}:{1}'.format(section, dict({item[0]: item[1] for item in global_core_conf.items(section)})))
+    global global_core_conf, global_settings
+    parser = ConfigParser()
+    parser.read(filename)
+    settings = Settings.from_parser(parser)  # Raises on invalid config, the current one stays active
+    for section in parser.sections():  # Printing config
+        LOG.info('{0}:{1}'.format(section, dict({item[0]: item[1] for item in parser.items(section)})))
+    old_settings = global_settings
+    global_core_conf, global_settings = parser, settings
+    _notify_changed(old_settings, settings)
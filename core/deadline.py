@@ -0,0 +1,77 @@
+import contextlib
+import time
+from contextvars import ContextVar
+from typing import Tuple
+from logger import logger
+from core import metrics
+
+LOG = logger.LOG
+
+_exceeded_counter = metrics.counter("deadline.exceeded")
+
+# Monotonic time when the current unit of work (e.g. a worker cycle) goes stale, None - no deadline
+_deadline: ContextVar = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+@contextlib.contextmanager
+def scope(budget_sec: float):
+    """
+    Deadline for everything called inside, including the tasks pushed from it, they copy the context.
+    A nested scope can only shorten the deadline of the outer one.
+    :param budget_sec: 0 or None - no own deadline
+    """
+    deadline = _deadline.get()
+    if budget_sec:
+        own_deadline = time.monotonic() + budget_sec
+        deadline = own_deadline if deadline is None else min(deadline, own_deadline)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> float:
+    """
+    :return: seconds left, None if there is no deadline
+    """
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def is_exceeded() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check(what: str):
+    left = remaining()
+    if left is not None and left <= 0:
+        _exceeded_counter.inc()
+        raise DeadlineExceeded("Deadline has passed {:.1f} sec ago, {} is skipped".format(-left, what))
+
+
+def request_timeouts(connect_sec: float, read_sec: float, what: str) -> Tuple[float, float]:
+    """
+    :return: (connect, read) timeouts of a request, each of them is cut to the time left
+    """
+    left = remaining()
+    if left is None:
+        return connect_sec, read_sec
+    check(what)
+    return min(connect_sec, left), min(read_sec, left)
+
+
+if __name__ == '__main__':
+    with scope(0.2):
+        LOG.info("Timeouts within the budget: {}".format(request_timeouts(3, 30, "exchange_info")))
+        time.sleep(0.25)
+        try:
+            request_timeouts(3, 5, "open_orders")
+        except DeadlineExceeded as ex:
+            LOG.info(ex.args[-1])
+    LOG.info("Without deadline: {}".format(request_timeouts(3, 5, "open_orders")))
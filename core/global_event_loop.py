@@ -1,19 +1,416 @@
 import asyncio
+import collections
+import heapq
+import itertools
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, List, Set, Tuple
+from logger import logger
+from core import metrics
+from core import tracing
 
+LOG = logger.LOG
 
-def push_async_task(callback_func, run_func, *args, **kwargs) -> asyncio.Task:
+LOOP_TYPE_ASYNCIO = "asyncio"
+LOOP_TYPE_UVLOOP = "uvloop"
+
+GROUP_DEFAULT = "default"
+GROUP_REST = "rest"
+
+# Lower value is started first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+_loop: asyncio.AbstractEventLoop = None
+_executor = None  # Default executor installed by init_loop, replaced only when the number of workers changes
+_executor_workers = 0
+_loop_type_gauge = metrics.gauge("event_loop.type")
+
+
+def _new_loop(use_uvloop: bool) -> asyncio.AbstractEventLoop:
+    if use_uvloop:
+        try:
+            import uvloop
+            loop = uvloop.new_event_loop()
+            _loop_type_gauge.set(LOOP_TYPE_UVLOOP)
+            return loop
+        except ImportError:
+            LOG.warning("uvloop is configured but isn't installed. Fall back to the default event loop")
+    _loop_type_gauge.set(LOOP_TYPE_ASYNCIO)
+    return asyncio.new_event_loop()
+
+
+def init_loop(loop_settings=None) -> asyncio.AbstractEventLoop:
+    """
+    Creates the global loop. Must be called before the first get_loop(), otherwise the already created loop
+    is only tuned.
+
+    :param loop_settings: core.config.LoopSettings, default event loop without tuning if None
+    """
+    global _loop
+    if _loop is None:
+        _loop = _new_loop(loop_settings.use_uvloop if loop_settings else False)
+        asyncio.set_event_loop(_loop)
+    elif loop_settings and loop_settings.use_uvloop and _loop_type_gauge.value != LOOP_TYPE_UVLOOP:
+        LOG.warning("Event loop has been created already, uvloop can't be enabled")
+    if loop_settings:
+        _loop.set_debug(loop_settings.debug)
+        _loop.slow_callback_duration = loop_settings.slow_callback_duration_sec
+        if loop_settings.default_executor_workers:
+            _set_default_executor(loop_settings.default_executor_workers)
+        _configure_lag_monitor(loop_settings)
+    LOG.info("Event loop: {}".format(_loop_type_gauge.value))
+    return _loop
+
+
+def _set_default_executor(max_workers: int):
+    global _executor, _executor_workers
+    if _executor is not None and _executor_workers == max_workers:
+        return
+    from concurrent.futures import ThreadPoolExecutor
+    old_executor, _executor = _executor, ThreadPoolExecutor(max_workers=max_workers)
+    _executor_workers = max_workers
+    _loop.set_default_executor(_executor)
+    if old_executor is not None:
+        # Jobs already submitted are finished by the old threads, which exit then
+        old_executor.shutdown(wait=False)
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    # The loop is created with the first use and not at import, so the daemon can fork before it
+    if _loop is None:
+        return init_loop()
+    return _loop
+
+
+def __getattr__(name):
+    # Keeps "gloop.global_ev_loop" working without creating the loop at import
+    if name == "global_ev_loop":
+        return get_loop()
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
+
+
+class _PriorityGate(object):
+    """
+    Semaphore which hands a released slot to the waiter with the lowest priority value,
+    FIFO within the same priority.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters = []  # Heap of (priority, seq, future)
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int):
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = get_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # The slot may have been handed over right before the cancellation
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake_up()
+
+    def set_limit(self, limit: int):
+        self.limit = limit
+        self._wake_up()
+
+    def _wake_up(self):
+        while self._waiters and self.in_flight < self.limit:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():  # Cancelled waiters are removed lazily
+                self.in_flight += 1
+                waiter.set_result(None)
+
+
+class TaskGroup(object):
+    """
+    Named set of tasks with an optional cap of concurrently running tasks and an optional timeout.
+    Tasks over the cap wait for a slot by priority.
+    """
+
+    def __init__(self, name: str, max_concurrent: int = None, timeout_sec: float = None):
+        self.name = name
+        self.timeout_sec = timeout_sec
+        self.tasks: Set[asyncio.Task] = set()
+        self._gate = _PriorityGate(max_concurrent) if max_concurrent else None
+        self._in_flight_gauge = metrics.gauge("tasks.{}.in_flight".format(name))
+        self._queued_gauge = metrics.gauge("tasks.{}.queued".format(name))
+        self._timeouts_counter = metrics.counter("tasks.{}.timeouts".format(name))
+        self._errors_counter = metrics.counter("tasks.{}.errors".format(name))
+        self._in_flight_gauge.set(0)
+        self._queued_gauge.set(0)
+
+    def configure(self, max_concurrent: int = None, timeout_sec: float = None):
+        self.timeout_sec = timeout_sec
+        if not max_concurrent:
+            if self._gate and self._gate.in_flight:
+                LOG.warning("Task group '{}' has running tasks, its limit can't be removed".format(self.name))
+                return
+            self._gate = None
+        elif self._gate:
+            self._gate.set_limit(max_concurrent)
+        else:
+            self._gate = _PriorityGate(max_concurrent)
+
+    async def _run(self, priority: int, run_func, args, kwargs):
+        # The task runs in a copy of the context of push_group_task, so its spans are children of the pusher
+        with tracing.span("task:" + _func_name(run_func), cat="task", group=self.name, priority=priority):
+            gate = self._gate
+            if gate:
+                self._queued_gauge.inc()
+                try:
+                    with tracing.span("task.queued", cat="task"):
+                        await gate.acquire(priority)
+                finally:
+                    self._queued_gauge.dec()
+            self._in_flight_gauge.inc()
+            try:
+                if not self.timeout_sec:
+                    return await run_func(*args, **kwargs)
+                try:
+                    return await asyncio.wait_for(run_func(*args, **kwargs), self.timeout_sec)
+                except asyncio.TimeoutError:
+                    # Same contract as the rest clients: a failed request gives None
+                    self._timeouts_counter.inc()
+                    LOG.error("Task {} of group '{}' has timed out after {} sec"
+                              .format(_func_name(run_func), self.name, self.timeout_sec))
+                    return None
+            finally:
+                self._in_flight_gauge.dec()
+                if gate:
+                    gate.release()
+
+    def _on_done(self, task: asyncio.Task, callback_func, trace: tracing.Trace = None):
+        try:
+            self._finish(task, callback_func)
+        finally:
+            tracing.release(trace)
+
+    def _finish(self, task: asyncio.Task, callback_func):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self._errors_counter.inc()
+            LOG.error("Error fired in task of group '{}' with:{}".format(self.name, repr(task.exception())))
+        if callback_func:
+            try:
+                # Done callbacks run in the context of push_group_task too
+                with tracing.span("callback:" + _func_name(callback_func), cat="task", group=self.name):
+                    callback_func(task)
+            except Exception as ex:
+                LOG.error("Error fired in callback {} of group '{}' with:{}".format(
+                    _func_name(callback_func), self.name, repr(ex)))
+
+
+def _func_name(func) -> str:
+    return getattr(func, "__qualname__", None) or repr(func)
+
+
+_groups: Dict[str, TaskGroup] = {}
+
+
+def configure_group(name: str, max_concurrent: int = None, timeout_sec: float = None) -> TaskGroup:
+    """
+    Creates the group or changes limits of the existing one.
+
+    :param max_concurrent: cap of running tasks, unlimited if None or 0
+    :param timeout_sec: a task is cancelled and gives None after it, unlimited if None or 0
+    """
+    group = _groups.get(name)
+    if group is None:
+        group = TaskGroup(name, max_concurrent, timeout_sec)
+        _groups[name] = group
+    else:
+        group.configure(max_concurrent, timeout_sec)
+    return group
+
+
+def get_group(name: str) -> TaskGroup:
+    # Unknown groups are created without limits, so clients work before the application configures them
+    group = _groups.get(name)
+    return group if group else configure_group(name)
+
+
+def push_group_task(group_name: str, callback_func, run_func, *args,
+                    priority: int = PRIORITY_NORMAL, **kwargs) -> asyncio.Task:
     if not run_func:
         raise ValueError("Don't set run function correctly!")
+    group = get_group(group_name)
     task: asyncio.Task = asyncio.ensure_future(
-        run_func(*args, **kwargs),
-        loop=global_ev_loop
+        group._run(priority, run_func, args, kwargs),
+        loop=get_loop()
     )
-    if callback_func:
-        task.add_done_callback(callback_func)
+    group.tasks.add(task)
+    # The trace of the pusher is written only after the task and its callback are finished
+    trace = tracing.hold()
+    task.add_done_callback(lambda done_task: group._on_done(done_task, callback_func, trace))
     return task
 
 
-global_ev_loop = asyncio.get_event_loop()
+def push_async_task(callback_func, run_func, *args, **kwargs) -> asyncio.Task:
+    return push_group_task(GROUP_DEFAULT, callback_func, run_func, *args, **kwargs)
+
+
+# Lag samples kept for the percentiles, the gauges are updated every LAG_GAUGES_EVERY heartbeats
+LAG_WINDOW = 512
+LAG_GAUGES_EVERY = 10
+STALL_STACK_DEPTH = 12
+# Frames of the loop machinery, the offender is the first frame out of them under the handle
+_LOOP_FILES = ("asyncio", "global_event_loop.py", "tracing.py", "contextlib.py")
+
+
+class LoopLagMonitor(object):
+    """
+    Heartbeat coroutine which measures how late the loop wakes it up, and a watchdog thread which captures
+    the stack of the loop thread while a callback blocks the loop longer than stall_threshold_sec.
+    Lag percentiles go to the event_loop.lag_ms.* gauges, every offender is logged at most once a log_interval_sec.
+    """
+
+    def __init__(self, interval_sec: float, stall_threshold_sec: float, log_interval_sec: float):
+        self.interval_sec = interval_sec
+        self.stall_threshold_sec = stall_threshold_sec
+        self.log_interval_sec = log_interval_sec
+        self._lags_ms = collections.deque(maxlen=LAG_WINDOW)
+        self._expected_at = time.monotonic()
+        self._loop_thread_id: int = None
+        self._stall: Tuple[float, str, List[str]] = None  # (expected_at, offender, stack) from the watchdog
+        self._logged_at: Dict[str, float] = {}
+        self._suppressed: Dict[str, int] = {}
+        self._stopped = threading.Event()
+        self._task: asyncio.Task = None
+        self._p50_gauge = metrics.gauge("event_loop.lag_ms.p50")
+        self._p99_gauge = metrics.gauge("event_loop.lag_ms.p99")
+        self._max_gauge = metrics.gauge("event_loop.lag_ms.max")
+        self._offender_gauge = metrics.gauge("event_loop.last_stall_offender")
+        self._stalls_counter = metrics.counter("event_loop.stalls")
+
+    def start(self):
+        self._task = push_async_task(None, self._heartbeat)
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _heartbeat(self):
+        self._loop_thread_id = threading.get_ident()
+        beats = 0
+        while not self._stopped.is_set():
+            self._expected_at = time.monotonic() + self.interval_sec
+            await asyncio.sleep(self.interval_sec)
+            lag_sec = max(0.0, time.monotonic() - self._expected_at)
+            self._lags_ms.append(lag_sec * 1000)
+            if lag_sec >= self.stall_threshold_sec:
+                self._on_stall(lag_sec)
+            self._stall = None
+            beats += 1
+            if beats % LAG_GAUGES_EVERY == 0:
+                self._update_gauges()
+
+    def _update_gauges(self):
+        ordered = sorted(self._lags_ms)
+        self._p50_gauge.set(round(ordered[len(ordered) // 2], 2))
+        self._p99_gauge.set(round(ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)], 2))
+        self._max_gauge.set(round(ordered[-1], 2))
+
+    def _watch(self):
+        # The heartbeat is late while the loop is blocked, the stack of the loop thread shows by what
+        period_sec = self.stall_threshold_sec / 2
+        while not self._stopped.wait(period_sec):
+            expected_at = self._expected_at
+            if self._loop_thread_id is None or self._stall is not None \
+                    or time.monotonic() - expected_at < self.stall_threshold_sec:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                offender, stack = _blocking_call(frame)
+                self._stall = (expected_at, offender, stack)
+
+    def _on_stall(self, lag_sec: float):
+        self._stalls_counter.inc()
+        stall = self._stall
+        # A stall shorter than the watchdog period may end before it looks at the loop
+        if stall is not None and stall[0] == self._expected_at:
+            offender, stack = stall[1], stall[2]
+        else:
+            offender, stack = "unknown", []
+        self._offender_gauge.set(offender)
+        now = time.monotonic()
+        if now - self._logged_at.get(offender, -self.log_interval_sec) < self.log_interval_sec:
+            self._suppressed[offender] = self._suppressed.get(offender, 0) + 1
+            return
+        self._logged_at[offender] = now
+        suppressed = self._suppressed.pop(offender, 0)
+        LOG.warning("Event loop has been blocked for {:.0f} ms by {}{}{}".format(
+            lag_sec * 1000, offender, ", {} more times since the last report".format(suppressed) if suppressed else "",
+            ". Stack:\n" + "".join(stack) if stack else ""))
+
+
+def _blocking_call(frame) -> Tuple[str, List[str]]:
+    """
+    :return: name of the callback which the loop runs and the innermost frames of the stack
+    """
+    frames = [item for item, _ in traceback.walk_stack(frame)]
+    frames.reverse()
+    # The code which has started the loop, then the loop machinery, then the callback
+    offender = None
+    in_loop = False
+    for item in frames:
+        code = item.f_code
+        is_loop_frame = any(part in code.co_filename for part in _LOOP_FILES)
+        if is_loop_frame:
+            in_loop = True
+        elif in_loop:
+            offender = "{}:{}".format(code.co_filename.rsplit("/", 1)[-1], getattr(code, "co_qualname", code.co_name))
+            break
+    stack = traceback.format_list(traceback.extract_stack(frame, limit=STALL_STACK_DEPTH))
+    return offender if offender else "loop", stack
+
+
+_lag_monitor: LoopLagMonitor = None
+
+
+def _configure_lag_monitor(loop_settings):
+    global _lag_monitor
+    if _lag_monitor:
+        _lag_monitor.stop()
+        _lag_monitor = None
+    if loop_settings.lag_monitor_interval_sec:
+        _lag_monitor = LoopLagMonitor(
+            loop_settings.lag_monitor_interval_sec,
+            stall_threshold_sec=loop_settings.slow_callback_duration_sec,
+            log_interval_sec=loop_settings.lag_log_interval_sec
+        )
+        _lag_monitor.start()
+
+
+async def cancel_all_tasks(timeout_sec: float = None):
+    """
+    Cancels tasks of all groups except the current one and waits for them to finish.
+    """
+    current = asyncio.current_task()
+    tasks = [task for group in _groups.values() for task in group.tasks if task is not current]
+    if not tasks:
+        return
+    LOG.info("Cancelling {} running tasks".format(len(tasks)))
+    for task in tasks:
+        task.cancel()
+    _, pending = await asyncio.wait(tasks, timeout=timeout_sec or None)
+    if pending:
+        LOG.warning("{} tasks haven't finished after cancelling".format(len(pending)))
 
 
 if __name__ == '__main__':
@@ -37,6 +434,9 @@ if __name__ == '__main__':
     push_async_task(callback_test, coro_test, " i am test")
     push_async_task(callback_test, coro_test1, " i am test1")
     push_async_task(None, coro_test1, " i am test2")
+    configure_group("test", max_concurrent=1)
+    push_group_task("test", callback_test, coro_test1, " i am test3 low", priority=PRIORITY_LOW)
+    push_group_task("test", callback_test, coro_test1, " i am test3 high", priority=PRIORITY_HIGH)
     push_async_task(None, None, " i am test2")
     push_async_task(None, None, None)
-    global_ev_loop.run_forever()
+    get_loop().run_forever()
@@ -0,0 +1,163 @@
+import atexit
+import json
+import logging
+import os
+import queue
+from logging import handlers
+from typing import Dict, List
+from logger import logger
+from core import metrics
+
+_LEVELS = {
+    "DEBUG": logging.DEBUG,
+    "INFO": logging.INFO,
+    "WARNING": logging.WARNING,
+    "ERROR": logging.ERROR,
+}
+
+_dropped_counter = metrics.counter("log.dropped")
+
+
+class _DroppingQueueHandler(handlers.QueueHandler):
+    # A full queue drops the record instead of blocking the event loop thread
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped_counter.inc()
+
+
+def _owners(handler: logging.Handler) -> List[logging.Logger]:
+    # Loggers the handler is attached to
+    loggers = [logging.getLogger()] + [item for item in logging.Logger.manager.loggerDict.values()
+                                      if isinstance(item, logging.Logger)]
+    return [item for item in loggers if handler in item.handlers]
+
+
+def _json_default(obj):
+    # Models with to_dict(), e.g. services.models, are logged as their dicts
+    to_dict = getattr(obj, "to_dict", None)
+    if to_dict is None:
+        raise TypeError("Object of type {} is not JSON serializable".format(type(obj).__name__))
+    return to_dict()
+
+
+class LogFacade(object):
+    """
+    Wrapper around logger.LOG for hot paths:
+    - a message is formatted only when its level is enabled, arguments are passed separately
+      (or as a callable) so nothing is built for a discarded record;
+    - after configure() the file handler of logger.LOG is fed from a bounded queue by a background thread,
+      the event loop thread only enqueues. Direct logger.LOG calls and the facade share the queue,
+      so their records keep the order. A full queue drops records instead of blocking;
+    - *_sampled methods write only every n-th record for the key, e.g. per-symbol lines.
+    """
+
+    def __init__(self, log=logger.LOG, level: int = None, queue_size: int = 10000):
+        self._log = log
+        self._queue_size = queue_size
+        self._file_handler: logging.Handler = getattr(log, "log_file_handler", None)
+        self._queue_handler: _DroppingQueueHandler = None
+        self._listener: handlers.QueueListener = None
+        self._level = level if level is not None else self._default_level()
+        self._sample_counters: Dict[str, int] = {}
+        self.rank_log_every_n = 1
+
+    def _default_level(self) -> int:
+        # Effective level of the file handler: its own one, or the one of the logger it is attached to if NOTSET
+        level = getattr(self._file_handler, "level", logging.NOTSET)
+        if level:
+            return level
+        attached = self._queue_handler if self._queue_handler else self._file_handler
+        owners = _owners(attached) if attached is not None else []
+        return owners[0].getEffectiveLevel() if owners else logging.DEBUG
+
+    def configure(self, log_settings):
+        """
+        :param log_settings: core.config.LogSettings
+        """
+        # Queue size can be changed only before the writer has started
+        if self._queue_handler is None:
+            self._queue_size = log_settings.queue_size
+            self._start_writer()
+        level = _LEVELS.get(log_settings.level.upper()) if log_settings.level else None
+        self._level = level if level is not None else self._default_level()
+        self.rank_log_every_n = log_settings.rank_log_every_n
+
+    def _start_writer(self):
+        # The queue handler takes the place of the file handler in every logger it is attached to
+        owners = _owners(self._file_handler) if self._file_handler is not None else []
+        if not owners:
+            return  # Not a logging handler, records are written synchronously
+        self._queue_handler = _DroppingQueueHandler(queue.Queue(maxsize=self._queue_size))
+        for owner in owners:
+            owner.removeHandler(self._file_handler)
+            owner.addHandler(self._queue_handler)
+        self._start_listener()
+
+    def _start_listener(self):
+        self._listener = handlers.QueueListener(self._queue_handler.queue, self._file_handler,
+                                                respect_handler_level=True)
+        self._listener.start()
+
+    def restart_after_fork(self):
+        # Threads don't survive the daemon fork. The records of the parent stay with it, the child gets a new queue
+        if self._queue_handler is None:
+            return
+        self._queue_handler.queue = queue.Queue(maxsize=self._queue_size)
+        self._start_listener()
+
+    def flush(self):
+        if self._listener is not None and self._listener._thread is not None:
+            self._queue_handler.queue.join()
+
+    def stop(self):
+        if self._listener is not None and self._listener._thread is not None:
+            self.flush()
+            self._listener.stop()
+
+    def is_enabled(self, level: int) -> bool:
+        return level >= self._level
+
+    def _emit(self, level: int, method: str, msg, args):
+        if level < self._level:
+            return
+        if callable(msg):
+            msg = msg()
+        elif args:
+            msg = msg.format(*args)
+        getattr(self._log, method)(msg)
+
+    def debug(self, msg, *args):
+        self._emit(logging.DEBUG, "debug", msg, args)
+
+    def info(self, msg, *args):
+        self._emit(logging.INFO, "info", msg, args)
+
+    def warning(self, msg, *args):
+        self._emit(logging.WARNING, "warning", msg, args)
+
+    def error(self, msg, *args):
+        self._emit(logging.ERROR, "error", msg, args)
+
+    def debug_json(self, payload, max_symbols: int = 512):
+        # Payloads are often mutated by the caller later, so they are serialized here and not in the writer
+        if logging.DEBUG < self._level:
+            return
+        self._emit(logging.DEBUG, "debug", lambda: json.dumps(payload, default=_json_default)[:max_symbols], None)
+
+    def sampled(self, key: str, every_n: int) -> bool:
+        count = self._sample_counters.get(key, 0)
+        self._sample_counters[key] = count + 1
+        return every_n <= 1 or count % every_n == 0
+
+    def debug_sampled(self, key: str, every_n: int, msg, *args):
+        if logging.DEBUG < self._level or not self.sampled(key, every_n):
+            return
+        self._emit(logging.DEBUG, "debug", msg, args)
+
+
+LOG = LogFacade()
+atexit.register(LOG.stop)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=LOG.restart_after_fork)
@@ -0,0 +1,59 @@
+from typing import Dict
+from logger import logger
+
+LOG = logger.LOG
+
+
+class Counter(object):
+    def __init__(self, name: str):
+        self.name = name
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+
+class Gauge(object):
+    def __init__(self, name: str):
+        self.name = name
+        self.value = None
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value = (self.value or 0) + amount
+
+    def dec(self, amount=1):
+        self.value = (self.value or 0) - amount
+
+
+# In-process registry. Metrics live for the whole process, so they are created once and cached
+# by the caller, e.g. on module level.
+_registry: Dict[str, object] = {}
+
+
+def _get_or_create(name: str, metric_type):
+    metric = _registry.get(name)
+    if metric is None:
+        metric = metric_type(name)
+        _registry[name] = metric
+    elif not isinstance(metric, metric_type):
+        raise ValueError("Metric {} is already registered as {}".format(name, type(metric).__name__))
+    return metric
+
+
+def counter(name: str) -> Counter:
+    return _get_or_create(name, Counter)
+
+
+def gauge(name: str) -> Gauge:
+    return _get_or_create(name, Gauge)
+
+
+def snapshot() -> dict:
+    return {name: metric.value for name, metric in _registry.items()}
+
+
+def log_snapshot():
+    LOG.info("Metrics: {}".format(snapshot()))
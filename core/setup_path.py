@@ -6,12 +6,9 @@ def correct_python_path():
     pth_lst = os.path.dirname(os.path.realpath(__file__)).split('/')
     del pth_lst[-1]
     pth = '/'.join(pth_lst)
-    sys.path.insert(0, pth)
+    if pth not in sys.path:
+        sys.path.insert(0, pth)
 
 
 def print_sys_path():
     print(sys.path)
-
-
-correct_python_path()
-print_sys_path()
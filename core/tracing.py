@@ -0,0 +1,292 @@
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from contextvars import ContextVar
+from typing import Dict, List
+from logger import logger
+from core import metrics
+
+LOG = logger.LOG
+
+_sampled_counter = metrics.counter("trace.sampled")
+_written_counter = metrics.counter("trace.written")
+_dropped_counter = metrics.counter("trace.dropped_events")
+_late_counter = metrics.counter("trace.late_events")
+
+_ids = itertools.count(1)
+_lanes = itertools.count(1)
+_task_lanes: "weakref.WeakKeyDictionary[asyncio.Task, int]" = weakref.WeakKeyDictionary()
+_thread_lanes: Dict[int, int] = {}
+_rnd = random.Random()
+_pid = os.getpid()
+
+_sample_rate = 0.0
+_trace_dir = "traces"
+_max_events = 100000
+_aiohttp_trace_config = None
+
+
+class Trace(object):
+    __slots__ = ("trace_id", "name", "events", "lanes", "root_done", "pending", "closed")
+
+    def __init__(self, name: str):
+        self.trace_id = next(_ids)
+        self.name = name
+        self.events: List[dict] = []
+        self.lanes = set()
+        self.root_done = False
+        self.pending = 0  # Tasks pushed under the trace which haven't finished yet
+        self.closed = False
+
+    def add(self, event: dict):
+        if self.closed:
+            _late_counter.inc()
+        elif len(self.events) >= _max_events:
+            _dropped_counter.inc()
+        else:
+            self.events.append(event)
+
+
+class Span(object):
+    __slots__ = ("trace", "name", "span_id", "parent", "lane", "start_us")
+
+    def __init__(self, trace: Trace, name: str, parent: "Span" = None):
+        self.trace = trace
+        self.name = name
+        self.span_id = next(_ids)
+        self.parent = parent
+        self.lane = _lane(trace)
+        self.start_us = now_us()
+
+
+_current_span: ContextVar = ContextVar("trace_span", default=None)
+
+
+def now_us() -> float:
+    return time.perf_counter() * 1000000
+
+
+def configure(trace_settings):
+    """
+    :param trace_settings: core.config.TraceSettings
+    """
+    global _sample_rate, _trace_dir, _max_events
+    _sample_rate = trace_settings.sample_rate
+    _trace_dir = trace_settings.dir
+    _max_events = trace_settings.max_events_per_trace
+
+
+def is_enabled() -> bool:
+    return _sample_rate > 0
+
+
+def current_span() -> Span:
+    return _current_span.get()
+
+
+def _lane(trace: Trace) -> int:
+    # Spans of one asyncio task (or one thread outside of the loop) nest, so every task gets its own row
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        lane = _task_lanes.get(task)
+        if lane is None:
+            lane = next(_lanes)
+            _task_lanes[task] = lane
+        lane_name = task.get_name()
+    else:
+        thread = threading.current_thread()
+        lane = _thread_lanes.get(thread.ident)
+        if lane is None:
+            lane = next(_lanes)
+            _thread_lanes[thread.ident] = lane
+        lane_name = thread.name
+    if lane not in trace.lanes:
+        trace.lanes.add(lane)
+        trace.add({"ph": "M", "name": "thread_name", "pid": _pid, "tid": lane, "args": {"name": lane_name}})
+    return lane
+
+
+def _complete(span: Span, cat: str, args: dict, end_us: float = None):
+    event_args = {"span_id": span.span_id, "parent_id": span.parent.span_id if span.parent else None}
+    if args:
+        event_args.update(args)
+    span.trace.add({"ph": "X", "name": span.name, "cat": cat, "pid": _pid, "tid": span.lane,
+                    "ts": span.start_us, "dur": (end_us if end_us is not None else now_us()) - span.start_us,
+                    "args": event_args})
+    parent = span.parent
+    if parent is not None and parent.lane != span.lane:
+        # Flow arrow from the row of the parent to the span which was started in another task
+        span.trace.add({"ph": "s", "name": "causal", "cat": cat, "id": span.span_id, "pid": _pid,
+                        "tid": parent.lane, "ts": span.start_us})
+        span.trace.add({"ph": "f", "bp": "e", "name": "causal", "cat": cat, "id": span.span_id, "pid": _pid,
+                        "tid": span.lane, "ts": span.start_us})
+
+
+@contextlib.contextmanager
+def start_trace(name: str, **args):
+    """
+    Root span of a new trace, e.g. a worker cycle. The trace is sampled by the configured rate,
+    spans under a not sampled root cost only a context variable lookup.
+    The sampled trace is written as Chrome trace-event json (chrome://tracing, Perfetto) when the root ends.
+    """
+    if not _sample_rate or _rnd.random() >= _sample_rate:
+        token = _current_span.set(None)
+        try:
+            yield None
+        finally:
+            _current_span.reset(token)
+        return
+    _sampled_counter.inc()
+    trace = Trace(name)
+    root = Span(trace, name)
+    token = _current_span.set(root)
+    try:
+        yield root
+    finally:
+        _current_span.reset(token)
+        _complete(root, "trace", args)
+        trace.root_done = True
+        _close_if_finished(trace)
+
+
+def hold() -> Trace:
+    """
+    Keeps the current trace open until release(), e.g. for a task which outlives the span that pushed it.
+    :return: the trace to release or None if nothing is traced
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    parent.trace.pending += 1
+    return parent.trace
+
+
+def release(trace: Trace):
+    if trace is None:
+        return
+    trace.pending -= 1
+    _close_if_finished(trace)
+
+
+def _close_if_finished(trace: Trace):
+    if trace.root_done and trace.pending <= 0 and not trace.closed:
+        trace.closed = True
+        _write(trace)
+
+
+@contextlib.contextmanager
+def span(name: str, cat: str = "app", **args):
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        _current_span.reset(token)
+        _complete(child, cat, args)
+
+
+def record(name: str, start_us: float, end_us: float, cat: str = "app", **args):
+    # Span measured by somebody else, e.g. by the aiohttp hooks, under the current span
+    parent = _current_span.get()
+    if parent is None:
+        return
+    child = Span(parent.trace, name, parent)
+    child.start_us = start_us
+    _complete(child, cat, args, end_us=end_us)
+
+
+def _write(trace: Trace):
+    path = os.path.join(_trace_dir, "trace_{}_{}_{}.json".format(trace.name, int(time.time()), trace.trace_id))
+    try:
+        os.makedirs(_trace_dir, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace.events, "displayTimeUnit": "ms"}, f)
+        _written_counter.inc()
+        LOG.debug("Trace {} with {} events has written to {}".format(trace.name, len(trace.events), path))
+    except Exception as ex:
+        LOG.error("Error fired in {} with:{}".format(LOG.func_name(), ex.args[-1]))
+
+
+def aiohttp_trace_configs() -> list:
+    """
+    trace_configs for aiohttp.ClientSession: DNS, connect (TCP and TLS handshake, aiohttp doesn't split them)
+    and time to the response headers of every request. Empty list if tracing is disabled.
+    """
+    global _aiohttp_trace_config
+    if not _sample_rate:
+        return []
+    if _aiohttp_trace_config is None:
+        _aiohttp_trace_config = _new_aiohttp_trace_config()
+    return [_aiohttp_trace_config]
+
+
+def _new_aiohttp_trace_config():
+    import aiohttp
+
+    async def on_request_start(session, ctx, params):
+        ctx.request_start_us = now_us()
+        ctx.send_start_us = ctx.request_start_us
+        ctx.method = params.method
+        ctx.path = params.url.path
+
+    async def on_connection_queued_start(session, ctx, params):
+        ctx.queued_start_us = now_us()
+
+    async def on_connection_queued_end(session, ctx, params):
+        record("http.pool_wait", ctx.queued_start_us, now_us(), cat="http")
+
+    async def on_dns_resolvehost_start(session, ctx, params):
+        ctx.dns_start_us = now_us()
+
+    async def on_dns_resolvehost_end(session, ctx, params):
+        record("http.dns", ctx.dns_start_us, now_us(), cat="http", host=params.host)
+
+    async def on_connection_create_start(session, ctx, params):
+        ctx.connect_start_us = now_us()
+
+    async def on_connection_create_end(session, ctx, params):
+        ctx.send_start_us = now_us()
+        record("http.connect_tls", ctx.connect_start_us, ctx.send_start_us, cat="http")
+
+    async def on_connection_reuseconn(session, ctx, params):
+        ctx.send_start_us = now_us()
+
+    async def on_request_end(session, ctx, params):
+        record("http.ttfb", ctx.send_start_us, now_us(), cat="http", method=ctx.method, path=ctx.path,
+               status=params.response.status)
+
+    async def on_request_exception(session, ctx, params):
+        record("http.failed", ctx.request_start_us, now_us(), cat="http", method=ctx.method, path=ctx.path,
+               error=repr(params.exception))
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_queued_start.append(on_connection_queued_start)
+    trace_config.on_connection_queued_end.append(on_connection_queued_end)
+    trace_config.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+    trace_config.on_dns_resolvehost_end.append(on_dns_resolvehost_end)
+    trace_config.on_connection_create_start.append(on_connection_create_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+
+async def read_text(response) -> str:
+    # Response body time, the part after the headers which the aiohttp hooks don't cover
+    with span("http.body", cat="http"):
+        return await response.text()
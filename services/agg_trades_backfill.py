@@ -0,0 +1,152 @@
+import asyncio
+import json
+from collections import deque
+from typing import Dict, List, Tuple
+from logger import logger
+from core import config as cfg
+from utils import rate_limiter
+from utils import utc_timestamp as tm
+from services import binance_rest_api_async as api_async
+
+LOG = logger.LOG
+
+AGG_TRADES_PAGE_LIMIT = 500
+# startTime and endTime of one aggTrades request must be less than an hour apart
+AGG_TRADES_MAX_WINDOW_MS = 60 * 60 * 1000
+
+
+class AggTradesBackfill(object):
+    """
+    Streams aggregate trades of [start_time, end_time] ordered by aggregate id.
+    The range is partitioned into time windows which are fetched concurrently, but only
+    max_concurrent_requests windows are kept ahead of the consumer, so memory is bounded
+    by the prefetch depth and not by the range length.
+    """
+
+    def __init__(self, config, api: api_async.BinanceRestApi = None, settings: cfg.BackfillSettings = None):
+        if not config:
+            raise ValueError("Did't got correct config")
+        settings = settings if settings else cfg.BackfillSettings.from_parser(config)
+        self._api = api if api else api_async.BinanceRestApi(config)
+        self._window_ms = min(settings.agg_trades_window_sec * 1000, AGG_TRADES_MAX_WINDOW_MS)
+        self._prefetch = settings.max_concurrent_requests
+        self._limiter = rate_limiter.RateLimiter(settings.requests_per_sec)
+
+    def split_windows(self, start_time: int, end_time: int) -> List[Tuple[int, int]]:
+        windows = []
+        window_start = start_time
+        while window_start <= end_time:
+            window_end = min(window_start + self._window_ms - 1, end_time)
+            windows.append((window_start, window_end))
+            window_start = window_end + 1
+        return windows
+
+    async def _fetch_page(self, symbol: str, **kwargs) -> List[dict]:
+        await self._limiter.acquire()
+        task = self._api.fetch_agg_trades(None, symbol, limit=AGG_TRADES_PAGE_LIMIT, **kwargs)
+        if not task:
+            raise ValueError("Did't create agg trades request for symbol {}".format(symbol))
+        res = await task
+        if res is None:
+            raise ValueError("Agg trades request for symbol {} has failed".format(symbol))
+        parsed = json.loads(res)
+        if not isinstance(parsed, list):
+            raise ValueError("Agg trades request for symbol {} has failed with: {}".format(symbol, parsed))
+        return parsed
+
+    async def _fetch_window(self, symbol: str, window: Tuple[int, int]) -> List[dict]:
+        trades = await self._fetch_page(symbol, start_time=window[0], end_time=window[1])
+        page = trades
+        # A busy window holds more than one page. Continue by id until the window end is passed
+        while len(page) == AGG_TRADES_PAGE_LIMIT:
+            page = await self._fetch_page(symbol, from_id=page[-1]["a"] + 1)
+            page = [trade for trade in page if trade["T"] <= window[1]]
+            trades.extend(page)
+        trades.sort(key=lambda trade: trade["a"])
+        return trades
+
+    async def stream(self, symbol: str, start_time: int, end_time: int = None):
+        """
+        Async generator of aggregate trades dicts, see BinanceRestApi.fetch_agg_trades for the format
+        """
+        end_time = end_time if end_time else tm.utc_timestamp()
+        windows = deque(self.split_windows(start_time, end_time))
+        in_flight = deque()
+        last_id = -1
+        try:
+            while windows or in_flight:
+                while windows and len(in_flight) < self._prefetch:
+                    in_flight.append(asyncio.ensure_future(self._fetch_window(symbol, windows.popleft())))
+                trades = await in_flight.popleft()
+                for trade in trades:
+                    if trade["a"] > last_id:
+                        last_id = trade["a"]
+                        yield trade
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+
+class VwapAccumulator(object):
+    def __init__(self):
+        self.volume = 0.0
+        self.quote_volume = 0.0
+        self.count = 0
+
+    def add(self, trade: dict):
+        qty = float(trade["q"])
+        self.volume += qty
+        self.quote_volume += qty * float(trade["p"])
+        self.count += 1
+
+    @property
+    def vwap(self) -> float:
+        return self.quote_volume / self.volume if self.volume else None
+
+
+class VolumeProfile(object):
+    """
+    Traded volume per price bucket, split by the aggressor side
+    """
+
+    def __init__(self, bucket_size: float):
+        if not bucket_size or bucket_size <= 0:
+            raise ValueError("Did't got correct bucket_size param: {}".format(bucket_size))
+        self._bucket_size = bucket_size
+        self.buy_volume: Dict[float, float] = {}
+        self.sell_volume: Dict[float, float] = {}
+
+    def add(self, trade: dict):
+        bucket = round(int(float(trade["p"]) / self._bucket_size) * self._bucket_size, 12)
+        # "m" is true when the buyer was the maker, so the aggressor sold
+        volumes = self.sell_volume if trade["m"] else self.buy_volume
+        volumes[bucket] = volumes.get(bucket, 0.0) + float(trade["q"])
+
+    def total(self) -> Dict[float, float]:
+        res = dict(self.buy_volume)
+        for bucket, volume in self.sell_volume.items():
+            res[bucket] = res.get(bucket, 0.0) + volume
+        return res
+
+    def point_of_control(self) -> float:
+        total = self.total()
+        return max(total, key=total.get) if total else None
+
+
+if __name__ == '__main__':
+    from core import config as conf
+    from core import global_event_loop as gloop
+
+    conf.init_global_config("/home/andrew/dev/crypto_bot/bot.cfg")
+    backfill = AggTradesBackfill(conf.global_core_conf, settings=conf.global_settings.backfill)
+
+    async def _vwap_for_last_day(symbol: str):
+        vwap = VwapAccumulator()
+        profile = VolumeProfile(bucket_size=0.00001)
+        async for trade in backfill.stream(symbol, tm.utc_timestamp() - 24 * AGG_TRADES_MAX_WINDOW_MS):
+            vwap.add(trade)
+            profile.add(trade)
+        LOG.debug("symbol:{} trades:{} vwap:{} poc:{}".format(
+            symbol, vwap.count, vwap.vwap, profile.point_of_control()))
+
+    gloop.global_ev_loop.run_until_complete(_vwap_for_last_day("ETHBTC"))
@@ -1,10 +1,23 @@
-import requests
-import hmac
-import hashlib
+from typing import Tuple
+from core import config as cfg
+from core import deadline
 from logger import logger
+from services import endpoints
+from services import host_pool
 
 LOG = logger.LOG
 
+_requests_module = None
+
+
+def _http():
+    # requests takes a noticeable part of the startup time, so it is imported with the first request
+    global _requests_module
+    if _requests_module is None:
+        import requests
+        _requests_module = requests
+    return _requests_module
+
 
 class BnApiEnums(object):
     KLINE_INTERVAL_1MINUTE = '1m'
@@ -49,29 +62,62 @@ class BnApiEnums(object):
     SYMBOL_TYPE_SPOT = 'SPOT'
 
 
+class BnApiWeights(object):
+    # Request weight of the endpoints as the exchange counts it against the per minute limit
+    LIMIT_PER_MINUTE = 1200
+    SERVER_TIME = endpoints.ENDPOINTS["server_time"].weight
+    EXCHANGE_INFO = endpoints.ENDPOINTS["exchange_info"].weight
+    TICKER_24H_ALL = endpoints.ENDPOINTS["ticker_24h"].weight_all
+    BOOK_TICKER_ALL = endpoints.ENDPOINTS["book_ticker"].weight_all
+    NEW_ORDER = endpoints.ENDPOINTS["new_order"].weight
+    TEST_ORDER = endpoints.ENDPOINTS["test_order"].weight
+    CANCEL_ORDER = endpoints.ENDPOINTS["cancel_order"].weight
+    OPEN_ORDERS_ALL = endpoints.ENDPOINTS["open_orders"].weight_all
+    ACCOUNT_INFO = endpoints.ENDPOINTS["account"].weight
+    MY_TRADES = endpoints.ENDPOINTS["my_trades"].weight
+
+
 class BinanceRestApi(object):
     def __init__(self, config):
         if not config:
             raise ValueError("Did't got correct config")
-        self._host: str = config.get("Exchange", "host", fallback="https://api.binance.com")
+        self._hosts = host_pool.pool_for_hosts(cfg.ExchangeSettings.from_parser(config).hosts)
         self._api_key: str = config.get("Exchange", "api_key", fallback=None)
         self._secret_key: str = config.get("Exchange", "secret", fallback=None)
-        self._request_timeout = 5
+        self._timeout_settings = cfg.TimeoutSettings.from_parser(config)
+        self._builder = endpoints.RequestBuilder(self._api_key, self._secret_key)
 
-    def ping_server(self):
+    def _timeouts(self, endpoint: str) -> Tuple[float, float]:
+        # (connect, read) of the endpoint, cut to the time left before the deadline of the caller
+        connect_sec, read_sec = self._timeout_settings.for_endpoint(endpoint)
+        return deadline.request_timeouts(connect_sec, read_sec, endpoint)
+
+    @property
+    def _host(self) -> str:
+        # The fastest healthy host by the probes of the async client
+        return self._hosts.best_host()
+
+    def _call(self, name: str, params: dict):
         """
-        :return: {}
+        Every request goes here, the params are checked and formatted by the endpoint from services.endpoints
+        :return: decoded json of the response, None on error
         """
+        endpoint = endpoints.ENDPOINTS[name]
         try:
-            if not self._host:
+            host = self._host
+            if not host:
                 raise ValueError("Did't got host param from config")
-            endpoint = "/api/v1/ping"
-            url = self._host + endpoint
-            LOG.debug("Try to get ping from server. url:{}".format(url))
-            responce = requests.get(url=url, timeout=self._request_timeout)
-            return responce.json()
+            path, headers = self._builder.build(endpoint, params)
+            LOG.debug("Try to {} {}".format(endpoint.method, path))
+            return _http().request(endpoint.method, host + path, headers=headers, timeout=self._timeouts(name)).json()
         except Exception as ex:
-            LOG.error("Error fired with ping server:{}".format(ex.args[-1]))
+            LOG.error("Error fired in {} with:{}".format(name, ex.args[-1]))
+
+    def ping_server(self):
+        """
+        :return: {}
+        """
+        return self._call("ping", {})
 
     def fetch_server_time(self):
         """
@@ -80,16 +126,7 @@ class BinanceRestApi(object):
           "serverTime": 1499827319559
         }
         """
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            endpoint = "/api/v1/time"
-            url = self._host + endpoint
-            LOG.debug("Try to get binance server time. url:{}".format(url))
-            responce = requests.get(url=url, timeout=self._request_timeout)
-            return responce.json()
-        except Exception as ex:
-            LOG.error("Error fired with fetch_server_time:{}".format(ex.args[-1]))
+        return self._call("server_time", {})
 
     def exchange_info(self):
         """
@@ -140,16 +177,7 @@ class BinanceRestApi(object):
           }]
         }
         """
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            endpoint = "/api/v1/exchangeInfo"
-            url = self._host + endpoint
-            LOG.debug("Try to get exchange_info from server. url:{}".format(url))
-            responce = requests.get(url=url, timeout=self._request_timeout)
-            return responce.json()
-        except Exception as ex:
-            LOG.error("Error fired with exchange_info:{}".format(ex.args[-1]))
+        return self._call("exchange_info", {})
 
     def fetch_order_book(self, symbol: str, limit: int = None):
         """
@@ -177,21 +205,7 @@ class BinanceRestApi(object):
           ]
         }
         """
-        try:
-            if not symbol:
-                raise ValueError("Did't got mandatory param symbol: {}".format(symbol))
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            query_params = "symbol={}".format(symbol)
-            if limit:
-                query_params += "&limit={}".format(str(limit))
-            endpoint = "/api/v1/depth"
-            url = self._host + endpoint + "?" + query_params
-            LOG.debug("Try to get order book by symbol. url:{}".format(url))
-            responce = requests.get(url=url, timeout=self._request_timeout)
-            return responce.json()
-        except Exception as ex:
-            LOG.error("Error fired with fetch_order_book:{}".format(ex.args[-1]))
+        return self._call("order_book", {"symbol": symbol, "limit": limit})
 
     def fetch_trades_list(self, symbol: str, limit: int = None):
         """
@@ -212,21 +226,7 @@ class BinanceRestApi(object):
           }
         ]
         """
-        try:
-            if not symbol:
-                raise ValueError("Did't got mandatory param symbol: {}".format(symbol))
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            query_params = "symbol={}".format(symbol)
-            if limit:
-                query_params += "&limit={}".format(str(limit))
-            endpoint = "/api/v1/trades"
-            url = self._host + endpoint + "?" + query_params
-            LOG.debug("Try to get order book by symbol. url:{}".format(url))
-            responce = requests.get(url=url, timeout=self._request_timeout)
-            return responce.json()
-        except Exception as ex:
-            LOG.error("Error fired with fetch_trades_list:{}".format(ex.args[-1]))
+        return self._call("trades", {"symbol": symbol, "limit": limit})
 
     def fetch_agg_trades(
             self,
@@ -262,27 +262,48 @@ class BinanceRestApi(object):
           }
         ]
         """
-        try:
-            if not symbol:
-                raise ValueError("Did't got mandatory param symbol: {}".format(symbol))
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            query_params = "symbol={0}".format(symbol)
-            if from_id:
-                query_params += "&fromId={}".format(from_id)
-            if start_time:
-                query_params += "&startTime={}".format(start_time)
-            if end_time:
-                query_params += "&endTime={}".format(end_time)
-            if limit:
-                query_params += "&limit={}".format(str(limit))
-            endpoint = "/api/v1/aggTrades"
-            url = self._host + endpoint + "?" + query_params
-            LOG.debug("Try to get aggregate trades list by symbol. url:{}".format(url))
-            responce = requests.get(url=url, timeout=self._request_timeout)
-            return responce.json()
-        except Exception as ex:
-            LOG.error("Error fired with fetch_agg_trades:{}".format(ex.args[-1]))
+        return self._call("agg_trades", {
+            "symbol": symbol, "fromId": from_id, "startTime": start_time, "endTime": end_time, "limit": limit})
+
+    def fetch_klines(
+            self,
+            symbol: str,
+            interval: str,
+            start_time: int = None,
+            end_time: int = None,
+            limit: int = None
+    ):
+        """
+        Kline/candlestick bars for a symbol. Klines are uniquely identified by their open time.
+
+        :input:
+        Name 	    Type 	Mandatory 	Description
+        symbol 	    STRING 	YES
+        interval 	ENUM 	YES         One of BnApiEnums.KLINE_INTERVAL_*
+        startTime 	LONG 	NO
+        endTime 	LONG 	NO
+        limit 	    INT 	NO 	        Default 500; max 500.
+
+        :return:
+        [
+          [
+            1499040000000,      // Open time
+            "0.01634790",       // Open
+            "0.80000000",       // High
+            "0.01575800",       // Low
+            "0.01577100",       // Close
+            "148976.11427815",  // Volume
+            1499644799999,      // Close time
+            "2434.19055334",    // Quote asset volume
+            308,                // Number of trades
+            "1756.87402397",    // Taker buy base asset volume
+            "28.46694368",      // Taker buy quote asset volume
+            "17928899.62484339" // Ignore
+          ]
+        ]
+        """
+        return self._call("klines", {
+            "symbol": symbol, "interval": interval, "startTime": start_time, "endTime": end_time, "limit": limit})
 
     def fetch_ticker_24h(self, symbol: str = None):
         """
@@ -341,18 +362,7 @@ class BinanceRestApi(object):
           }
         ]
         """
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            query_params = ""
-            if symbol:
-                query_params += "?symbol={}".format(symbol)
-            endpoint = "/api/v1/ticker/24hr"
-            url = self._host + endpoint + "?" + query_params
-            LOG.debug("Try to get 24hr ticker price change stat. url:{}".format(url))
-            return requests.get(url=url, timeout=self._request_timeout).json()
-        except Exception as ex:
-            LOG.error("Error fired with fetch_ticker_24h:{}".format(ex.args[-1]))
+        return self._call("ticker_24h", {"symbol": symbol})
 
     def fetch_order_book_ticker(self, symbol: str = None):
         """
@@ -388,18 +398,7 @@ class BinanceRestApi(object):
           }
         ]
         """
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            query_params = ""
-            if symbol:
-                query_params += "?symbol={}".format(symbol)
-            endpoint = "/api/v3/ticker/bookTicker"
-            url = self._host + endpoint + "?" + query_params
-            LOG.debug("Try to get order book ticker. url:{}".format(url))
-            return requests.get(url=url, timeout=self._request_timeout).json()
-        except Exception as ex:
-            LOG.error("Error fired with fetch_order_book_ticker:{}".format(ex.args[-1]))
+        return self._call("book_ticker", {"symbol": symbol})
 
     def create_new_order(
             self,
@@ -454,64 +453,8 @@ class BinanceRestApi(object):
           "side": "SELL"
         }
         """
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            if not self._api_key:
-                raise ValueError("Did't got api key from config")
-            if not self._secret_key:
-                raise ValueError("Did't got secret key from config")
-            if not symbol:
-                raise ValueError("Did't got symbol param")
-            if not side:
-                raise ValueError("Did't got side param")
-            if not order_type:
-                raise ValueError("Did't got type param")
-            if not quantity:
-                raise ValueError("Did't got quantity param")
-            if not timestamp:
-                raise ValueError("Did't got timestamp param")
-
-            query_params = "symbol={}&side={}&type={}&quantity={}&timestamp={}".format(
-                symbol,
-                side,
-                order_type,
-                f"{quantity:.8f}",
-                str(timestamp)
-            )
-
-            timeInForce = kwargs.get("timeInForce", None)
-            newClientOrderId = kwargs.get("newClientOrderId", None)
-            price = kwargs.get("price", None)
-            stopPrice = kwargs.get("icebergQty", None)
-            icebergQty = kwargs.get("icebergQty", None)
-            newOrderRespType = kwargs.get("newOrderRespType", None)
-            recvWindow = kwargs.get("recvWindow", None)
-
-            if timeInForce:
-                query_params += "&timeInForce={}".format(timeInForce)
-            if price:
-                query_params += "&price={:.8f}".format(price)
-            if newClientOrderId:
-                query_params += "&newClientOrderId={}".format(newClientOrderId)
-            if stopPrice:
-                query_params += "&stopPrice={:.8f}".format(stopPrice)
-            if icebergQty:
-                query_params += "&icebergQty={:.8f}".format(icebergQty)
-            if newOrderRespType:
-                query_params += "&newOrderRespType={}".format(newOrderRespType)
-            if recvWindow:
-                query_params += "&recvWindow={}".format(recvWindow)
-
-            signature = hmac.new(self._secret_key.encode(), query_params.encode(), hashlib.sha256).hexdigest()
-            query_params += "&signature={}".format(signature)
-            headers = {'X-MBX-APIKEY': '{}'.format(self._api_key)}
-            endpoint = "/api/v3/order"
-            url = self._host + endpoint + "?" + query_params
-            LOG.debug("Try to create_new_order. url:{}".format(url))
-            return requests.post(url=url, headers=headers, timeout=self._request_timeout).json()
-        except Exception as ex:
-            LOG.error("Error fired with create_new_order:{}".format(ex.args[-1]))
+        return self._call("new_order", dict(
+            kwargs, symbol=symbol, side=side, type=order_type, quantity=quantity, timestamp=timestamp))
 
     def create_new_test_order(
             self,
@@ -579,64 +522,8 @@ class BinanceRestApi(object):
           }
         ]
         """
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            if not self._api_key:
-                raise ValueError("Did't got api key from config")
-            if not self._secret_key:
-                raise ValueError("Did't got secret key from config")
-            if not symbol:
-                raise ValueError("Did't got symbol param")
-            if not side:
-                raise ValueError("Did't got side param")
-            if not order_type:
-                raise ValueError("Did't got type param")
-            if not quantity:
-                raise ValueError("Did't got quantity param")
-            if not timestamp:
-                raise ValueError("Did't got timestamp param")
-
-            query_params = "symbol={}&side={}&type={}&quantity={}&timestamp={}".format(
-                symbol,
-                side,
-                order_type,
-                f"{quantity:.8f}",
-                str(timestamp)
-            )
-
-            timeInForce = kwargs.get("timeInForce", None)
-            newClientOrderId = kwargs.get("newClientOrderId", None)
-            price = kwargs.get("price", None)
-            stopPrice = kwargs.get("icebergQty", None)
-            icebergQty = kwargs.get("icebergQty", None)
-            newOrderRespType = kwargs.get("newOrderRespType", None)
-            recvWindow = kwargs.get("recvWindow", None)
-
-            if timeInForce:
-                query_params += "&timeInForce={}".format(timeInForce)
-            if price:
-                query_params += "&price={:.8f}".format(price)
-            if newClientOrderId:
-                query_params += "&newClientOrderId={}".format(newClientOrderId)
-            if stopPrice:
-                query_params += "&stopPrice={:.8f}".format(stopPrice)
-            if icebergQty:
-                query_params += "&icebergQty={:.8f}".format(icebergQty)
-            if newOrderRespType:
-                query_params += "&newOrderRespType={}".format(newOrderRespType)
-            if recvWindow:
-                query_params += "&recvWindow={}".format(recvWindow)
-
-            signature = hmac.new(self._secret_key.encode(), query_params.encode(), hashlib.sha256).hexdigest()
-            query_params += "&signature={}".format(signature)
-            headers = {'X-MBX-APIKEY': '{}'.format(self._api_key)}
-            endpoint = "/api/v3/order/test"
-            url = self._host + endpoint + "?" + query_params
-            LOG.debug("Try to {}. url:{}".format(LOG.func_name(), url))
-            return requests.post(url=url, headers=headers, timeout=self._request_timeout).json()
-        except Exception as ex:
-            LOG.error("Error fired with create_new_order:{}".format(ex.args[-1]))
+        return self._call("test_order", dict(
+            kwargs, symbol=symbol, side=side, type=order_type, quantity=quantity, timestamp=timestamp))
 
     def query_open_orders(self, timestamp: int, symbol: str = None, recvWindow: int = None):
         """
@@ -670,31 +557,7 @@ class BinanceRestApi(object):
           }
         ]
         """
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            if not self._api_key:
-                raise ValueError("Did't got api key from config")
-            if not self._secret_key:
-                raise ValueError("Did't got secret key from config")
-            if not timestamp:
-                raise ValueError("Did't got timestamp param")
-
-            query_params = "timestamp={}".format(str(timestamp))
-            if symbol:
-                query_params += "&symbol={}".format(symbol)
-            if recvWindow:
-                query_params += "&recvWindow={}".format(str(recvWindow))
-
-            signature = hmac.new(self._secret_key.encode(), query_params.encode(), hashlib.sha256).hexdigest()
-            query_params += "&signature={}".format(signature)
-            headers = {'X-MBX-APIKEY': '{}'.format(self._api_key)}
-            endpoint = "/api/v3/openOrders"
-            url = self._host + endpoint + "?" + query_params
-            LOG.debug("Try to {}. url:{}".format(LOG.func_name(), url))
-            return requests.get(url=url, headers=headers, timeout=self._request_timeout).json()
-        except Exception as ex:
-            LOG.error("Error fired in {} with:{}".format(LOG.func_name(), ex.args[-1]))
+        return self._call("open_orders", {"timestamp": timestamp, "symbol": symbol, "recvWindow": recvWindow})
 
     def cancel_order(
             self,
@@ -725,37 +588,9 @@ class BinanceRestApi(object):
           "clientOrderId": "cancelMyOrder1"
         }
         """
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            if not self._api_key:
-                raise ValueError("Did't got api key from config")
-            if not self._secret_key:
-                raise ValueError("Did't got secret key from config")
-            if not timestamp:
-                raise ValueError("Did't got timestamp param")
-            if not symbol:
-                raise ValueError("Did't got symbol param")
-
-            query_params = "timestamp={}&symbol={}".format(str(timestamp), symbol)
-            if orderId:
-                query_params += "&orderId={}".format(str(orderId))
-            if origClientOrderId:
-                query_params += "&origClientOrderId={}".format(origClientOrderId)
-            if newClientOrderId:
-                query_params += "&newClientOrderId={}".format(newClientOrderId)
-            if recvWindow:
-                query_params += "&recvWindow={}".format(recvWindow)
-
-            signature = hmac.new(self._secret_key.encode(), query_params.encode(), hashlib.sha256).hexdigest()
-            query_params += "&signature={}".format(signature)
-            headers = {'X-MBX-APIKEY': '{}'.format(self._api_key)}
-            endpoint = "/api/v3/order"
-            url = self._host + endpoint + "?" + query_params
-            LOG.debug("Try to {}. url:{}".format(LOG.func_name(), url))
-            return requests.delete(url=url, headers=headers, timeout=self._request_timeout).json()
-        except Exception as ex:
-            LOG.error("Error fired in {} with:{}".format(LOG.func_name(), ex.args[-1]))
+        return self._call("cancel_order", {
+            "timestamp": timestamp, "symbol": symbol, "orderId": orderId, "origClientOrderId": origClientOrderId,
+            "newClientOrderId": newClientOrderId, "recvWindow": recvWindow})
 
     def query_acc_info(self, timestamp: int, recvWindow: int=None):
         """
@@ -792,29 +627,7 @@ class BinanceRestApi(object):
           ]
         }
         """
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            if not self._api_key:
-                raise ValueError("Did't got api key from config")
-            if not self._secret_key:
-                raise ValueError("Did't got secret key from config")
-            if not timestamp:
-                raise ValueError("Did't got timestamp param")
-
-            query_params = "timestamp={}".format(str(timestamp))
-            if recvWindow:
-                query_params += "&recvWindow={}".format(recvWindow)
-
-            signature = hmac.new(self._secret_key.encode(), query_params.encode(), hashlib.sha256).hexdigest()
-            query_params += "&signature={}".format(signature)
-            headers = {'X-MBX-APIKEY': '{}'.format(self._api_key)}
-            endpoint = "/api/v3/account"
-            url = self._host + endpoint + "?" + query_params
-            LOG.debug("Try to {}. url:{}".format(LOG.func_name(), url))
-            return requests.get(url=url, headers=headers, timeout=self._request_timeout).json()
-        except Exception as ex:
-            LOG.error("Error fired in {} with:{}".format(LOG.func_name(), ex.args[-1]))
+        return self._call("account", {"timestamp": timestamp, "recvWindow": recvWindow})
 
     def my_trades(self, symbol: str, timestamp: int, limit: int=None, fromId: int=None, recvWindow: int=None):
         """
@@ -846,35 +659,8 @@ class BinanceRestApi(object):
           }
         ]
         """
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            if not self._api_key:
-                raise ValueError("Did't got api key from config")
-            if not self._secret_key:
-                raise ValueError("Did't got secret key from config")
-            if not symbol:
-                raise ValueError("Did't got symbol param")
-            if not timestamp:
-                raise ValueError("Did't got timestamp param")
-
-            query_params = "symbol={}&timestamp={}".format(symbol, str(timestamp))
-            if recvWindow:
-                query_params += "&recvWindow={}".format(str(recvWindow))
-            if limit:
-                query_params += "&limit={}".format(str(limit))
-            if fromId:
-                query_params += "&fromId={}".format(str(fromId))
-
-            signature = hmac.new(self._secret_key.encode(), query_params.encode(), hashlib.sha256).hexdigest()
-            query_params += "&signature={}".format(signature)
-            headers = {'X-MBX-APIKEY': '{}'.format(self._api_key)}
-            endpoint = "/api/v3/myTrades"
-            url = self._host + endpoint + "?" + query_params
-            LOG.debug("Try to {}. url:{}".format(LOG.func_name(), url))
-            return requests.get(url=url, headers=headers, timeout=self._request_timeout).json()
-        except Exception as ex:
-            LOG.error("Error fired in {} with:{}".format(LOG.func_name(), ex.args[-1]))
+        return self._call("my_trades", {
+            "symbol": symbol, "timestamp": timestamp, "recvWindow": recvWindow, "limit": limit, "fromId": fromId})
 
 
 if __name__ == '__main__':
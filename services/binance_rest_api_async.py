@@ -1,17 +1,40 @@
 import asyncio
-import aiohttp
 import async_timeout
-import hmac
-import hashlib
 import json
 import time
-from typing import List
+from typing import Dict, List, Tuple
 from core import global_event_loop as gloop
+from core import config as cfg
+from core import deadline
+from core import metrics
+from core import tracing
 from logger import logger
+from services import endpoints
+from services import host_pool
 
 
 LOG = logger.LOG
 
+_aiohttp_module = None
+_coalesced_counter = metrics.counter("rest.get.coalesced")
+_reused_counter = metrics.counter("rest.get.reused")
+
+
+def _aiohttp():
+    # aiohttp is heavy to import and isn't needed until the first async request
+    global _aiohttp_module
+    if _aiohttp_module is None:
+        import aiohttp
+        _aiohttp_module = aiohttp
+    return _aiohttp_module
+
+
+def _client_session(connect_sec: float = None, read_sec: float = None):
+    # Sessions carry the tracing hooks, the list is empty while tracing is disabled
+    aiohttp = _aiohttp()
+    return aiohttp.ClientSession(trace_configs=tracing.aiohttp_trace_configs(),
+                                 timeout=aiohttp.ClientTimeout(sock_connect=connect_sec, sock_read=read_sec))
+
 
 class BinanceApiEnums(object):
     KLINE_INTERVAL_1MINUTE = '1m'
@@ -60,33 +83,160 @@ class BinanceRestApi(object):
     def __init__(self, config):
         if not config:
             raise ValueError("Did't got correct config")
-        self._host: str = config.get("Exchange", "host", fallback="https://api.binance.com")
+        exchange_settings = cfg.ExchangeSettings.from_parser(config)
+        self._hosts = host_pool.pool_for_hosts(exchange_settings.hosts)
+        self._host_probe_interval_sec = exchange_settings.host_probe_interval_sec
         self._api_key: str = config.get("Exchange", "api_key", fallback=None)
         self._secret_key: str = config.get("Exchange", "secret", fallback=None)
-        self._request_timeout = 5
+        self._timeout_settings = cfg.TimeoutSettings.from_parser(config)
+        self._builder = endpoints.RequestBuilder(self._api_key, self._secret_key)
+        # Heavy market data (exchange info, 24h tickers) may be reused for a short time, 0 - disabled
+        self._reuse_ttl_sec: float = config.getfloat("Exchange", "get_reuse_ttl_sec", fallback=0)
+        self._inflight_gets: Dict[str, asyncio.Task] = {}
+        self._recent_gets: Dict[str, Tuple[float, str]] = {}
+
+    @property
+    def _host(self) -> str:
+        return self._hosts.best_host()
 
-    def ping_server(self, callback) -> asyncio.Task:
+    def start_host_probing(self) -> asyncio.Task:
+        async def _async_ping_host(host: str):
+            return await self.ping_server(None, host=host)
+
+        return self._hosts.start_probing(_async_ping_host, self._host_probe_interval_sec)
+
+    def _timeouts(self, endpoint: str) -> Tuple[float, float, float]:
         """
-        :return: {}
+        :return: (connect, read, total) timeouts of the endpoint, cut to the time left before the deadline of the caller
         """
-
-        async def _async_ping_server():
+        connect_sec, read_sec = self._timeout_settings.for_endpoint(endpoint)
+        connect_sec, read_sec = deadline.request_timeouts(connect_sec, read_sec, endpoint)
+        left = deadline.remaining()
+        total_sec = connect_sec + read_sec
+        return connect_sec, read_sec, total_sec if left is None else min(total_sec, left)
+
+    async def _get_text_from(self, host: str, path: str, endpoint: str = None) -> str:
+        connect_sec, read_sec, total_sec = self._timeouts(endpoint)
+        async with _client_session(connect_sec, read_sec) as session:
+            async with async_timeout.timeout(total_sec):
+                async with session.get(host + path) as response:
+                    if response.status >= 500:
+                        raise ValueError("Host {} has answered with status {}".format(host, response.status))
+                    return await tracing.read_text(response)
+
+    async def _get_text(self, path: str, endpoint: str = None) -> str:
+        # Unsigned GETs are idempotent, so a failed host is retried on the next one by preference
+        hosts = self._hosts.hosts_by_preference()
+        for index, host in enumerate(hosts):
+            started = time.monotonic()
             try:
-                async with aiohttp.ClientSession() as session:
-                    with async_timeout.timeout(self._request_timeout):
-                        async with session.get("https://api.binance.com/api/v1/ping") as response:
-                            return await response.text()
-            except Exception as exc:
-                LOG.error("Error with _async_ping: {}".format(exc.args[-1]))
-                return None
-
+                text = await self._get_text_from(host, path, endpoint)
+            except (asyncio.CancelledError, deadline.DeadlineExceeded):
+                raise
+            except Exception as ex:
+                self._hosts.report(host, time.monotonic() - started, False)
+                if index == len(hosts) - 1:
+                    raise
+                LOG.warning("GET {} has failed on host {} with:{}. Try the next one".format(path, host, repr(ex)))
+                continue
+            self._hosts.report(host, time.monotonic() - started, True)
+            return text
+
+    async def _shared_get(self, query: str, endpoint: str = None, reuse_ttl_sec: float = 0) -> str:
+        """
+        Single-flight GET for unsigned requests: concurrent calls with the same query share one request.
+        The query is a path with params, the host is chosen by the host pool.
+        The shared result is the response text, every caller parses its own copy, so nobody can change
+        the data of another one. Errors are raised to every caller, every caller waits only until its own deadline.
+        """
+        if reuse_ttl_sec:
+            recent = self._recent_gets.get(query)
+            if recent and recent[0] > time.monotonic():
+                _reused_counter.inc()
+                return recent[1]
+        task = self._inflight_gets.get(query)
+        if task:
+            _coalesced_counter.inc()
+        else:
+            task = asyncio.ensure_future(self._get_text(query, endpoint))
+            self._inflight_gets[query] = task
+            task.add_done_callback(lambda done_task: self._on_shared_get_done(query, done_task))
+        # A cancelled caller must not cancel the request of the others
+        left = deadline.remaining()
+        if left is None:
+            text = await asyncio.shield(task)
+        else:
+            deadline.check(endpoint)
+            text = await asyncio.wait_for(asyncio.shield(task), left)
+        if reuse_ttl_sec and text:
+            now = time.monotonic()
+            self._recent_gets = {key: value for key, value in self._recent_gets.items() if value[0] > now}
+            self._recent_gets[query] = (now + reuse_ttl_sec, text)
+        return text
+
+    def _on_shared_get_done(self, query: str, task: asyncio.Task):
+        if self._inflight_gets.get(query) is task:
+            del self._inflight_gets[query]
+        if not task.cancelled():
+            task.exception()  # Retrieved here in case all of the callers have been cancelled
+
+    async def _signed_request(self, endpoint: endpoints.Endpoint, path: str, headers: dict) -> str:
+        # Signed requests change the account or depend on the timestamp, so they are neither shared nor retried
+        connect_sec, read_sec, total_sec = self._timeouts(endpoint.name)
+        async with _client_session(connect_sec, read_sec) as session:
+            async with async_timeout.timeout(total_sec):
+                async with session.request(endpoint.method, self._host + path, headers=headers) as response:
+                    return await tracing.read_text(response)
+
+    def _call(self, callback, name: str, params: dict, priority: int = gloop.PRIORITY_NORMAL,
+              reuse_ttl_sec: float = 0) -> asyncio.Task:
+        """
+        Every request goes here, the params are checked, formatted and signed before the task is pushed,
+        unsigned GETs are shared by _shared_get
+        :return: task with the response text, None on error
+        """
+        endpoint = endpoints.ENDPOINTS[name]
         try:
             if not self._host:
                 raise ValueError("Did't got host param from config")
-            LOG.debug("Try to get ping from server")
-            return gloop.push_async_task(callback, _async_ping_server)
+            path, headers = self._builder.build(endpoint, params)
         except Exception as ex:
-            LOG.error("Error fired with ping server:{}".format(ex.args[-1]))
+            LOG.error("Error fired in {} with:{}".format(name, ex.args[-1]))
+            return None
+
+        async def _async_call():
+            try:
+                if endpoint.signed:
+                    return await self._signed_request(endpoint, path, headers)
+                return await self._shared_get(path, name, reuse_ttl_sec)
+            except Exception as exc:
+                LOG.error("Error in {} with: {}".format(name, exc.args[-1]))
+                return None
+
+        LOG.debug("Try to {} {}".format(endpoint.method, path))
+        return gloop.push_group_task(gloop.GROUP_REST, callback, _async_call, priority=priority)
+
+    def _call_on_host(self, callback, name: str, host: str) -> asyncio.Task:
+        # Unsigned GET without params on the given host, for the probes of the host pool
+        path = endpoints.ENDPOINTS[name].path
+
+        async def _async_call():
+            try:
+                return await self._get_text_from(host, path, name)
+            except Exception as exc:
+                LOG.error("Error in {} with: {}".format(name, exc.args[-1]))
+                return None
+
+        return gloop.push_group_task(gloop.GROUP_REST, callback, _async_call)
+
+    def ping_server(self, callback, host: str = None) -> asyncio.Task:
+        """
+        :param host: ping this host instead of the one chosen by the host pool
+        :return: {}
+        """
+        if host:
+            return self._call_on_host(callback, "ping", host)
+        return self._call(callback, "ping", {})
 
     def fetch_server_time(self, callback) -> asyncio.Task:
         """
@@ -95,24 +245,7 @@ class BinanceRestApi(object):
           "serverTime": 1499827319559
         }
         """
-
-        async def _async_fetch_server_time():
-            try:
-                async with aiohttp.ClientSession() as session:
-                    with async_timeout.timeout(self._request_timeout):
-                        async with session.get("https://api.binance.com/api/v1/time") as response:
-                            return await response.text()
-            except Exception as exc:
-                LOG.error("Error with _async_fetch_server_time: {}".format(exc.args[-1]))
-                return None
-
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            LOG.debug("Try to get binance server time")
-            return gloop.push_async_task(callback, _async_fetch_server_time)
-        except Exception as ex:
-            LOG.error("Error fired with fetch_server_time:{}".format(ex.args[-1]))
+        return self._call(callback, "server_time", {})
 
     def exchange_info(self, callback) -> asyncio.Task:
         """
@@ -163,24 +296,7 @@ class BinanceRestApi(object):
           }]
         }
         """
-
-        async def _async_exchange_info():
-            try:
-                async with aiohttp.ClientSession() as session:
-                    with async_timeout.timeout(self._request_timeout):
-                        async with session.get("https://api.binance.com/api/v1/exchangeInfo") as response:
-                            return await response.text()
-            except Exception as exc:
-                LOG.error("Error with _async_exchange_info: {}".format(exc.args[-1]))
-                return None
-
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            LOG.debug("Try to get exchange_info from server")
-            return gloop.push_async_task(callback, _async_exchange_info)
-        except Exception as ex:
-            LOG.error("Error fired with exchange_info:{}".format(ex.args[-1]))
+        return self._call(callback, "exchange_info", {}, reuse_ttl_sec=self._reuse_ttl_sec)
 
     def fetch_order_book(self, callback, symbol: str, limit: int = None) -> asyncio.Task:
         """
@@ -208,29 +324,7 @@ class BinanceRestApi(object):
           ]
         }
         """
-
-        async def _async_fetch_order_book():
-            try:
-                query = "https://api.binance.com/api/v1/depth?symbol={}".format(str(limit))
-                if limit:
-                    query += "&limit={}".format(str(limit))
-                async with aiohttp.ClientSession() as session:
-                    with async_timeout.timeout(self._request_timeout):
-                        async with session.get(query) as response:
-                            return await response.text()
-            except Exception as exc:
-                LOG.error("Error with _async_fetch_order_book: {}".format(exc.args[-1]))
-                return None
-
-        try:
-            if not symbol:
-                raise ValueError("Did't got mandatory param symbol: {}".format(symbol))
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            LOG.debug("Try to get order book by symbol {}".format(symbol))
-            return gloop.push_async_task(callback, _async_fetch_order_book)
-        except Exception as ex:
-            LOG.error("Error fired with fetch_order_book:{}".format(ex.args[-1]))
+        return self._call(callback, "order_book", {"symbol": symbol, "limit": limit})
 
     def fetch_trades_list(self, callback, symbol: str, limit: int = None) -> asyncio.Task:
         """
@@ -251,29 +345,7 @@ class BinanceRestApi(object):
           }
         ]
         """
-
-        async def _async_fetch_trades_list():
-            try:
-                query = "https://api.binance.com/api/v1/trades?symbol={}".format(symbol)
-                if limit:
-                    query += "&limit={}".format(str(limit))
-                async with aiohttp.ClientSession() as session:
-                    with async_timeout.timeout(self._request_timeout):
-                        async with session.get(query) as response:
-                            return await response.text()
-            except Exception as exc:
-                LOG.error("Error with _async_fetch_trades_list: {}".format(exc.args[-1]))
-                return None
-
-        try:
-            if not symbol:
-                raise ValueError("Did't got mandatory param symbol: {}".format(symbol))
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            LOG.debug("Try to get order book by symbol {}".format(symbol))
-            return gloop.push_async_task(callback, _async_fetch_trades_list)
-        except Exception as ex:
-            LOG.error("Error fired with fetch_trades_list:{}".format(ex.args[-1]))
+        return self._call(callback, "trades", {"symbol": symbol, "limit": limit})
 
     def fetch_agg_trades(
             self,
@@ -310,35 +382,49 @@ class BinanceRestApi(object):
           }
         ]
         """
+        return self._call(callback, "agg_trades", {
+            "symbol": symbol, "fromId": from_id, "startTime": start_time, "endTime": end_time, "limit": limit})
 
-        async def _async_fetch_agg_trades():
-            try:
-                query = "https://api.binance.com/api/v1/aggTrades?symbol={0}".format(symbol)
-                if from_id:
-                    query += "&fromId={}".format(from_id)
-                if start_time:
-                    query += "&startTime={}".format(start_time)
-                if end_time:
-                    query += "&endTime={}".format(end_time)
-                if limit:
-                    query += "&limit={}".format(str(limit))
-                async with aiohttp.ClientSession() as session:
-                    with async_timeout.timeout(self._request_timeout):
-                        async with session.get(query) as response:
-                            return await response.text()
-            except Exception as exc:
-                LOG.error("Error with _async_fetch_agg_trades: {}".format(exc.args[-1]))
-                return None
+    def fetch_klines(
+            self,
+            callback,
+            symbol: str,
+            interval: str,
+            start_time: int = None,
+            end_time: int = None,
+            limit: int = None
+    ) -> asyncio.Task:
+        """
+        Kline/candlestick bars for a symbol. Klines are uniquely identified by their open time.
 
-        try:
-            if not symbol:
-                raise ValueError("Did't got mandatory param symbol: {}".format(symbol))
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            LOG.debug("Try to get aggregate trades list by symbol {}".format(symbol))
-            return gloop.push_async_task(callback, _async_fetch_agg_trades)
-        except Exception as ex:
-            LOG.error("Error fired with fetch_agg_trades:{}".format(ex.args[-1]))
+        :input:
+        Name 	    Type 	Mandatory 	Description
+        symbol 	    STRING 	YES
+        interval 	ENUM 	YES         One of BinanceApiEnums.KLINE_INTERVAL_*
+        startTime 	LONG 	NO
+        endTime 	LONG 	NO
+        limit 	    INT 	NO 	        Default 500; max 500.
+
+        :return:
+        [
+          [
+            1499040000000,      // Open time
+            "0.01634790",       // Open
+            "0.80000000",       // High
+            "0.01575800",       // Low
+            "0.01577100",       // Close
+            "148976.11427815",  // Volume
+            1499644799999,      // Close time
+            "2434.19055334",    // Quote asset volume
+            308,                // Number of trades
+            "1756.87402397",    // Taker buy base asset volume
+            "28.46694368",      // Taker buy quote asset volume
+            "17928899.62484339" // Ignore
+          ]
+        ]
+        """
+        return self._call(callback, "klines", {
+            "symbol": symbol, "interval": interval, "startTime": start_time, "endTime": end_time, "limit": limit})
 
     def fetch_ticker_24h(self, callback, symbol: str = None) -> asyncio.Task:
         """
@@ -398,27 +484,7 @@ class BinanceRestApi(object):
           }
         ]
         """
-
-        async def _async_fetch_ticker_24h():
-            try:
-                query = "https://api.binance.com/api/v1/ticker/24hr"
-                if symbol:
-                    query += "?symbol={}".format(symbol)
-                async with aiohttp.ClientSession() as session:
-                    with async_timeout.timeout(self._request_timeout):
-                        async with session.get(query) as response:
-                            return await response.text()
-            except Exception as exc:
-                LOG.error("Error with _async_fetch_ticker_24h: {}".format(exc.args[-1]))
-                return None
-
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            LOG.debug("Try to get 24hr ticker price change statistics by symbol {}".format(symbol))
-            return gloop.push_async_task(callback, _async_fetch_ticker_24h)
-        except Exception as ex:
-            LOG.error("Error fired with fetch_ticker_24h:{}".format(ex.args[-1]))
+        return self._call(callback, "ticker_24h", {"symbol": symbol}, reuse_ttl_sec=self._reuse_ttl_sec)
 
     def fetch_order_book_ticker(self, callback, symbol: str = None) -> asyncio.Task:
         """
@@ -454,27 +520,7 @@ class BinanceRestApi(object):
           }
         ]
         """
-
-        async def _async_fetch_order_book_ticker():
-            try:
-                query = "https://api.binance.com/api/v3/ticker/bookTicker"
-                if symbol:
-                    query += "?symbol={}".format(symbol)
-                async with aiohttp.ClientSession() as session:
-                    with async_timeout.timeout(self._request_timeout):
-                        async with session.get(query) as response:
-                            return await response.text()
-            except Exception as exc:
-                LOG.error("Error with _async_fetch_order_book_ticker: {}".format(exc.args[-1]))
-                return None
-
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            LOG.debug("Try to get order book ticker by symbol {}".format(symbol))
-            return gloop.push_async_task(callback, _async_fetch_order_book_ticker)
-        except Exception as ex:
-            LOG.error("Error fired with fetch_order_book_ticker:{}".format(ex.args[-1]))
+        return self._call(callback, "book_ticker", {"symbol": symbol})
 
     def create_new_order(
             self,
@@ -543,75 +589,9 @@ class BinanceRestApi(object):
           }
         ]
         """
-
-        async def _async_create_new_order():
-            try:
-                entry_point = self._host + "/api/v3/order"
-                query_string = "symbol={}&side={}&type={}&quantity={}&timestamp={}".format(
-                    symbol,
-                    side,
-                    order_type,
-                    str(quantity),
-                    str(timestamp)
-                )
-
-                timeInForce = kwargs.get("timeInForce", None)
-                newClientOrderId = kwargs.get("newClientOrderId", None)
-                price = kwargs.get("price", None)
-                stopPrice = kwargs.get("icebergQty", None)
-                icebergQty = kwargs.get("icebergQty", None)
-                newOrderRespType = kwargs.get("newOrderRespType", None)
-                recvWindow = kwargs.get("recvWindow", None)
-
-                if timeInForce:
-                    query_string += "&timeInForce={}".format(timeInForce)
-                if price:
-                    query_string += "&price={}".format(price)
-                if newClientOrderId:
-                    query_string += "&newClientOrderId={}".format(newClientOrderId)
-                if stopPrice:
-                    query_string += "&stopPrice={}".format(stopPrice)
-                if icebergQty:
-                    query_string += "&icebergQty={}".format(icebergQty)
-                if newOrderRespType:
-                    query_string += "&newOrderRespType={}".format(newOrderRespType)
-                if recvWindow:
-                    query_string += "&recvWindow={}".format(recvWindow)
-
-                signature = hmac.new(self._secret_key.encode(), query_string.encode(), hashlib.sha256).hexdigest()
-                query_string += "&signature={}".format(signature)
-                headers = {'X-MBX-APIKEY': '{}'.format(self._api_key)}
-                async with aiohttp.ClientSession() as session:
-                    with async_timeout.timeout(self._request_timeout):
-                        url = entry_point + "?" + query_string
-                        async with session.post(url, headers=headers) as response:
-                            return await response.text()
-            except Exception as exc:
-                LOG.error("Error with _async_create_new_test_order: {}".format(exc.args[-1]))
-                return None
-
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            if not self._api_key:
-                raise ValueError("Did't got api key from config")
-            if not self._secret_key:
-                raise ValueError("Did't got secret key from config")
-            if not symbol:
-                raise ValueError("Did't got symbol param")
-            if not side:
-                raise ValueError("Did't got side param")
-            if not order_type:
-                raise ValueError("Did't got type param")
-            if not quantity:
-                raise ValueError("Did't got quantity param")
-            if not timestamp:
-                raise ValueError("Did't got timestamp param")
-
-            LOG.debug("Try to create_new_order by symbol {}".format(symbol))
-            return gloop.push_async_task(callback, _async_create_new_order)
-        except Exception as ex:
-            LOG.error("Error fired with create_new_order:{}".format(ex.args[-1]))
+        return self._call(callback, "new_order", dict(
+            kwargs, symbol=symbol, side=side, type=order_type, quantity=quantity, timestamp=timestamp),
+            priority=gloop.PRIORITY_HIGH)
 
     def create_new_test_order(
             self,
@@ -680,75 +660,8 @@ class BinanceRestApi(object):
           }
         ]
         """
-
-        async def _async_create_new_test_order():
-            try:
-                entry_point = self._host + "/api/v3/order/test"
-                query_string = "symbol={}&side={}&type={}&quantity={}&timestamp={}".format(
-                    symbol,
-                    side,
-                    order_type,
-                    str(quantity),
-                    str(timestamp)
-                )
-
-                timeInForce = kwargs.get("timeInForce", None)
-                newClientOrderId = kwargs.get("newClientOrderId", None)
-                price = kwargs.get("price", None)
-                stopPrice = kwargs.get("icebergQty", None)
-                icebergQty = kwargs.get("icebergQty", None)
-                newOrderRespType = kwargs.get("newOrderRespType", None)
-                recvWindow = kwargs.get("recvWindow", None)
-
-                if timeInForce:
-                    query_string += "&timeInForce={}".format(timeInForce)
-                if price:
-                    query_string += "&price={}".format(price)
-                if newClientOrderId:
-                    query_string += "&newClientOrderId={}".format(newClientOrderId)
-                if stopPrice:
-                    query_string += "&stopPrice={}".format(stopPrice)
-                if icebergQty:
-                    query_string += "&icebergQty={}".format(icebergQty)
-                if newOrderRespType:
-                    query_string += "&newOrderRespType={}".format(newOrderRespType)
-                if recvWindow:
-                    query_string += "&recvWindow={}".format(recvWindow)
-
-                signature = hmac.new(self._secret_key.encode(), query_string.encode(), hashlib.sha256).hexdigest()
-                query_string += "&signature={}".format(signature)
-                headers = {'X-MBX-APIKEY': '{}'.format(self._api_key)}
-                async with aiohttp.ClientSession() as session:
-                    with async_timeout.timeout(self._request_timeout):
-                        url = entry_point + "?" + query_string
-                        async with session.post(url, headers=headers) as response:
-                            return await response.text()
-            except Exception as exc:
-                LOG.error("Error in {} with: {}".format(LOG.func_name(), exc.args[-1]))
-                return None
-
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            if not self._api_key:
-                raise ValueError("Did't got api key from config")
-            if not self._secret_key:
-                raise ValueError("Did't got secret key from config")
-            if not symbol:
-                raise ValueError("Did't got symbol param")
-            if not side:
-                raise ValueError("Did't got side param")
-            if not order_type:
-                raise ValueError("Did't got type param")
-            if not quantity:
-                raise ValueError("Did't got quantity param")
-            if not timestamp:
-                raise ValueError("Did't got timestamp param")
-
-            LOG.debug("Try to create_new_test_order by symbol {}".format(symbol))
-            return gloop.push_async_task(callback, _async_create_new_test_order)
-        except Exception as ex:
-            LOG.error("Error fired with create_new_test_order:{}".format(ex.args[-1]))
+        return self._call(callback, "test_order", dict(
+            kwargs, symbol=symbol, side=side, type=order_type, quantity=quantity, timestamp=timestamp))
 
     def query_open_orders(self, callback, timestamp: int, symbol: str = None, recvWindow: int = None) -> asyncio.Task:
         """
@@ -782,43 +695,7 @@ class BinanceRestApi(object):
           }
         ]
         """
-
-        async def _async_f():
-            try:
-                entry_point = self._host + "/api/v3/openOrders"
-                query_string = "timestamp={}".format(str(timestamp))
-
-                if symbol:
-                    query_string += "&symbol={}".format(symbol)
-                if recvWindow:
-                    query_string += "&recvWindow={}".format(str(recvWindow))
-
-                signature = hmac.new(self._secret_key.encode(), query_string.encode(), hashlib.sha256).hexdigest()
-                query_string += "&signature={}".format(signature)
-                headers = {'X-MBX-APIKEY': '{}'.format(self._api_key)}
-                async with aiohttp.ClientSession() as session:
-                    with async_timeout.timeout(self._request_timeout):
-                        url = entry_point + "?" + query_string
-                        async with session.get(url, headers=headers) as response:
-                            return await response.text()
-            except Exception as exc:
-                LOG.error("Error in {} with: {}".format(LOG.func_name(), exc.args[-1]))
-                return None
-
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            if not self._api_key:
-                raise ValueError("Did't got api key from config")
-            if not self._secret_key:
-                raise ValueError("Did't got secret key from config")
-            if not timestamp:
-                raise ValueError("Did't got timestamp param")
-
-            LOG.debug("Try to {} by symbol {}".format(LOG.func_name(), symbol))
-            return gloop.push_async_task(callback, _async_f)
-        except Exception as ex:
-            LOG.error("Error fired in {} with:{}".format(LOG.func_name(), ex.args[-1]))
+        return self._call(callback, "open_orders", {"timestamp": timestamp, "symbol": symbol, "recvWindow": recvWindow})
 
     def cancel_order(
             self,
@@ -850,49 +727,9 @@ class BinanceRestApi(object):
           "clientOrderId": "cancelMyOrder1"
         }
         """
-
-        async def _async_f():
-            try:
-                entry_point = self._host + "/api/v3/order"
-                query_string = "timestamp={}&symbol={}".format(str(timestamp), symbol)
-
-                if orderId:
-                    query_string += "&orderId={}".format(str(orderId))
-                if origClientOrderId:
-                    query_string += "&origClientOrderId={}".format(origClientOrderId)
-                if newClientOrderId:
-                    query_string += "&newClientOrderId={}".format(newClientOrderId)
-                if recvWindow:
-                    query_string += "&recvWindow={}".format(recvWindow)
-
-                signature = hmac.new(self._secret_key.encode(), query_string.encode(), hashlib.sha256).hexdigest()
-                query_string += "&signature={}".format(signature)
-                headers = {'X-MBX-APIKEY': '{}'.format(self._api_key)}
-                async with aiohttp.ClientSession() as session:
-                    with async_timeout.timeout(self._request_timeout):
-                        url = entry_point + "?" + query_string
-                        async with session.delete(url, headers=headers) as response:
-                            return await response.text()
-            except Exception as exc:
-                LOG.error("Error in {} with: {}".format(LOG.func_name(), exc.args[-1]))
-                return None
-
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            if not self._api_key:
-                raise ValueError("Did't got api key from config")
-            if not self._secret_key:
-                raise ValueError("Did't got secret key from config")
-            if not timestamp:
-                raise ValueError("Did't got timestamp param")
-            if not symbol:
-                raise ValueError("Did't got symbol param")
-
-            LOG.debug("Try to {} by symbol {}".format(LOG.func_name(), symbol))
-            return gloop.push_async_task(callback, _async_f)
-        except Exception as ex:
-            LOG.error("Error fired in {} with:{}".format(LOG.func_name(), ex.args[-1]))
+        return self._call(callback, "cancel_order", {
+            "timestamp": timestamp, "symbol": symbol, "orderId": orderId, "origClientOrderId": origClientOrderId,
+            "newClientOrderId": newClientOrderId, "recvWindow": recvWindow}, priority=gloop.PRIORITY_HIGH)
 
     def cancel_orders_list(
             self,
@@ -902,27 +739,18 @@ class BinanceRestApi(object):
     ) -> asyncio.Task:
         async def _async_f():
             try:
-                entry_point = self._host + "/api/v3/order"
+                endpoint = endpoints.ENDPOINTS["cancel_order"]
                 error: bool = False
                 for order in orders_list:
-                    query_string = "timestamp={}&symbol={}&orderId={}"\
-                        .format(str(int(time.time() * 1000)), order["symbol"], order["orderId"])
-
-                    if recvWindow:
-                        query_string += "&recvWindow={}".format(str(recvWindow))
-                    signature = hmac.new(self._secret_key.encode(), query_string.encode(), hashlib.sha256).hexdigest()
-                    query_string += "&signature={}".format(signature)
-                    headers = {'X-MBX-APIKEY': '{}'.format(self._api_key)}
-                    async with aiohttp.ClientSession() as session:
-                        with async_timeout.timeout(self._request_timeout):
-                            url = entry_point + "?" + query_string
-                            async with session.delete(url, headers=headers) as response:
-                                result = await response.text()
-                                parsed_json: dict = json.loads(result)
-                                if not parsed_json or parsed_json.get("code") or parsed_json.get("msg"):
-                                    error = True
-                                    LOG.error("Error with trying to close order:{} with error:{}:{}"
-                                              .format(order["orderId"], parsed_json.get("code"), parsed_json.get("msg")))
+                    path, headers = self._builder.build(endpoint, {
+                        "timestamp": int(time.time() * 1000), "symbol": order["symbol"], "orderId": order["orderId"],
+                        "recvWindow": recvWindow})
+                    result = await self._signed_request(endpoint, path, headers)
+                    parsed_json: dict = json.loads(result)
+                    if not parsed_json or parsed_json.get("code") or parsed_json.get("msg"):
+                        error = True
+                        LOG.error("Error with trying to close order:{} with error:{}:{}"
+                                  .format(order["orderId"], parsed_json.get("code"), parsed_json.get("msg")))
                 return error
             except Exception as exc:
                 LOG.error("Error in {} with: {}".format(LOG.func_name(), exc.args[-1]))
@@ -937,7 +765,7 @@ class BinanceRestApi(object):
                 raise ValueError("Did't got secret key from config")
 
             LOG.debug("Try to {} by order list".format(LOG.func_name()))
-            return gloop.push_async_task(callback, _async_f)
+            return gloop.push_group_task(gloop.GROUP_REST, callback, _async_f, priority=gloop.PRIORITY_HIGH)
         except Exception as ex:
             LOG.error("Error fired in {} with msg:{}".format(LOG.func_name(), ex.args[-1]))
 
@@ -976,41 +804,7 @@ class BinanceRestApi(object):
           ]
         }
         """
-
-        async def _async_f():
-            try:
-                entry_point = self._host + "/api/v3/account"
-                query_string = "timestamp={}".format(str(timestamp))
-
-                if recvWindow:
-                    query_string += "&recvWindow={}".format(recvWindow)
-
-                signature = hmac.new(self._secret_key.encode(), query_string.encode(), hashlib.sha256).hexdigest()
-                query_string += "&signature={}".format(signature)
-                headers = {'X-MBX-APIKEY': '{}'.format(self._api_key)}
-                async with aiohttp.ClientSession() as session:
-                    with async_timeout.timeout(self._request_timeout):
-                        url = entry_point + "?" + query_string
-                        async with session.get(url, headers=headers) as response:
-                            return await response.text()
-            except Exception as exc:
-                LOG.error("Error in {} with: {}".format(LOG.func_name(), exc.args[-1]))
-                return None
-
-        try:
-            if not self._host:
-                raise ValueError("Did't got host param from config")
-            if not self._api_key:
-                raise ValueError("Did't got api key from config")
-            if not self._secret_key:
-                raise ValueError("Did't got secret key from config")
-            if not timestamp:
-                raise ValueError("Did't got timestamp param")
-
-            LOG.debug("Try to {}".format(LOG.func_name()))
-            return gloop.push_async_task(callback, _async_f)
-        except Exception as ex:
-            LOG.error("Error fired in {} with:{}".format(LOG.func_name(), ex.args[-1]))
+        return self._call(callback, "account", {"timestamp": timestamp, "recvWindow": recvWindow})
 
 
 """
@@ -1,18 +1,44 @@
-from typing import List
-from logger import logger
+import contextlib
 import json
+import time
+from typing import List, Tuple
+from logger import logger
+from core import config as cfg
+from core import log_facade
+from core import tracing
+from core import deadline
 from utils import utc_timestamp as tm
 from utils import algorithm as alg
 from services import exchange_base
 from services import binance_rest_api as api
+from services import endpoints
+from services import trades_cache
+from services import order_reconciler
+from services import models
+from services import market_index as mkt
+from services import ranking
+from services import dry_run
+from services import worker_state
+from services import checkpoint
+from services import cycle_policy
 
 LOG = logger.LOG
+FLOG = log_facade.LOG
 
 
 class ApiWrapperBase(object):
-    def exchange_symbols_info(self) -> List[dict]:
+    _market_index: mkt.MarketIndex = None
+    _ranking: ranking.TickerRanking = None
+
+    def exchange_symbols_info(self) -> List[models.SymbolInfo]:
         pass
 
+    def market_index(self) -> mkt.MarketIndex:
+        # Rebuilt by every exchange_symbols_info call
+        if self._market_index is None:
+            self.exchange_symbols_info()
+        return self._market_index
+
     def create_new_order(
             self,
             symbol: str,
@@ -24,30 +50,90 @@ class ApiWrapperBase(object):
     ) -> bool:
         pass
 
-    def cancel_order(self, order: dict) -> bool:
+    def cancel_order(self, order: models.Order) -> bool:
         pass
 
-    def open_orders_by_side(self, order_side: str) -> List[dict]:
+    def create_test_order(self, intent: order_reconciler.OrderIntent) -> dict:
         pass
 
-    def sorted_trade_pairs_btc(self) -> List[dict]:
+    def open_orders_by_side(self, order_side: str) -> List[models.Order]:
         pass
 
-    def acc_balance_for_assets(self) -> List[dict]:
+    def open_orders(self) -> List[models.Order]:
+        # Orders of both sides
+        buy_orders = self.open_orders_by_side(api.BnApiEnums.ORDER_SIDE_BUY)
+        sell_orders = self.open_orders_by_side(api.BnApiEnums.ORDER_SIDE_SELL)
+        if buy_orders is None or sell_orders is None:
+            return None
+        return buy_orders + sell_orders
+
+    def sorted_trade_pairs_btc(self) -> List[models.Ticker]:
         pass
 
-    def my_trades_by_symbol(self, symbol: str) -> List[dict]:
+    def book_tickers(self) -> List[models.BookTicker]:
+        pass
+
+    def ranking(self) -> ranking.TickerRanking:
+        # Kept between calls, so fast ticker updates re-rank single symbols
+        if self._ranking is None:
+            self._ranking = ranking.TickerRanking(
+                self._settings.rank.percent_multiply_coef,
+                min_pair_price=self._settings.exchange.min_pair_price
+            )
+        return self._ranking
+
+    def _rank_trade_pairs_btc(self, tickers_24h: List[dict]) -> List[models.Ticker]:
+        btc_symbols = self.market_index().symbols_for_quote("BTC")
+        pairs_ranking = self.ranking()
+        pairs_ranking.set_universe(btc_symbols)
+        pairs_ranking.update_tickers(
+            models.Ticker.from_json_list([pair for pair in tickers_24h if pair["symbol"] in btc_symbols]), full=True)
+        res = pairs_ranking.sorted_all()
+        for ticker in res:
+            FLOG.debug_sampled("rank", FLOG.rank_log_every_n, "symbol:{} rank:{}", ticker.symbol, ticker.rank)
+        return res
+
+    def acc_balance_for_assets(self) -> List[models.Balance]:
+        pass
+
+    def my_trades_by_symbol(self, symbol: str, total_balance: float = None) -> List[dict]:
+        pass
+
+    def server_time_ms(self) -> int:
+        pass
+
+    def checkpoint_path(self) -> str:
+        # Where the worker keeps its state for the warm restart, None - not kept
+        return None
+
+    def restore_symbols_info(self, symbols_info: List[models.SymbolInfo]):
+        self._market_index = mkt.MarketIndex(symbols_info)
+
+    def trades_snapshot(self) -> list:
+        return []
+
+    def restore_trades(self, entries: list) -> int:
+        return 0
+
+    def save_trades(self):
         pass
 
 
 class ApiWrapperMain(ApiWrapperBase):
-    def __init__(self, config):
-        self._api = api.BinanceRestApi(config)
+    def __init__(self, config, settings: cfg.Settings = None, rest_api=None):
+        self._api = rest_api if rest_api else api.BinanceRestApi(config)
         self._config = config
+        self._settings = settings if settings else cfg.Settings.from_parser(config)
+        self._trades_cache = trades_cache.MyTradesCache(
+            self._api,
+            path=self._settings.cache.trades_cache_file,
+            max_symbols=self._settings.cache.trades_cache_max_symbols
+        )
 
-    def exchange_symbols_info(self) -> List[dict]:
-        res = self._api.exchange_info()["symbols"]
-        LOG.debug(res, content_type="json", max_symbols=1024)
+    def exchange_symbols_info(self) -> List[models.SymbolInfo]:
+        res = models.SymbolInfo.from_json_list(self._api.exchange_info()["symbols"])
+        self._market_index = mkt.MarketIndex(res)
+        FLOG.debug_json(res, max_symbols=1024)
         return res
 
     def create_new_order(
@@ -69,70 +155,191 @@ class ApiWrapperMain(ApiWrapperBase):
             timeInForce=time_in_force,
             recvWindow=5000
         )
-        LOG.debug(res, content_type="json")
+        FLOG.debug_json(res)
         return "code" not in res and "msg" not in res
 
-    def cancel_order(self, order: dict) -> bool:
+    def cancel_order(self, order: models.Order) -> bool:
         res = self._api.cancel_order(
-            symbol=order["symbol"],
+            symbol=order.symbol,
             timestamp=tm.utc_timestamp(),
-            orderId=order["orderId"],
+            orderId=order.order_id,
             recvWindow=5000
         )
-        LOG.debug(res, content_type="json")
+        FLOG.debug_json(res)
         return "code" not in res and "msg" not in res
 
-    def open_orders_by_side(self, order_side: str) -> List[dict]:
-        open_orders_lst: List[dict] = self._api.query_open_orders(timestamp=tm.utc_timestamp(), recvWindow=5000)
-        res = list(filter(lambda order: order["side"] == order_side, open_orders_lst))
-        LOG.debug(res, content_type="json", max_symbols=1024)
+    def create_test_order(self, intent: order_reconciler.OrderIntent) -> dict:
+        # Validated by the exchange as a real order, but never sent to the matching engine
+        res = self._api.create_new_test_order(
+            symbol=intent.symbol,
+            side=intent.side,
+            order_type=intent.order_type,
+            quantity=intent.quantity,
+            timestamp=tm.utc_timestamp(),
+            price=intent.price,
+            timeInForce=intent.time_in_force,
+            recvWindow=5000
+        )
+        FLOG.debug_json(res)
+        return res
+
+    def open_orders_by_side(self, order_side: str) -> List[models.Order]:
+        return [order for order in self.open_orders() if order.side == order_side]
+
+    def open_orders(self) -> List[models.Order]:
+        res = models.Order.from_json_list(
+            self._api.query_open_orders(timestamp=tm.utc_timestamp(), recvWindow=5000))
+        FLOG.debug_json(res, max_symbols=1024)
         return res
 
-    def sorted_trade_pairs_btc(self) -> List[dict]:
-        def sort_func(key):
-            ask = float(key["askPrice"])
-            bid = float(key["bidPrice"])
-            volume24h = float(key["quoteVolume"])
-            change_percent = float(key["priceChangePercent"])
-            rank = ((ask - bid) / bid) * volume24h * (1 - ((change_percent * percent_multiply_coef) / 100))
-            LOG.debug("symbol:{} rank:{}".format(key["symbol"], str(rank)))
-            return rank
-
-        percent_multiply_coef = self._config.getfloat("Rank", "percent_multiply_coef", fallback=2)
-        pairs_lst: List[dict] = self._api.fetch_ticker_24h()
-        only_btc_pairs_lst: list = \
-            filter(
-                lambda pair:
-                "BTC" in pair["symbol"]
-                and "USDT" not in pair["symbol"]
-                and float(pair["lastPrice"]) > self._config.getfloat("Exchange", "min_pair_price", fallback=0.000001),
-                pairs_lst
-            )
-        res = sorted(only_btc_pairs_lst, key=sort_func, reverse=True)
-        LOG.debug(res, content_type="json", max_symbols=2048)
+    def sorted_trade_pairs_btc(self) -> List[models.Ticker]:
+        res = self._rank_trade_pairs_btc(self._api.fetch_ticker_24h())
+        FLOG.debug_json(res, max_symbols=2048)
+        return res
+
+    def book_tickers(self) -> List[models.BookTicker]:
+        # Best bid/ask of all symbols, much lighter than the 24h statistics
+        res = models.BookTicker.from_json_list(self._api.fetch_order_book_ticker())
+        FLOG.debug_json(res, max_symbols=2048)
         return res
 
-    def acc_balance_for_assets(self) -> List[dict]:
+    def acc_balance_for_assets(self) -> List[models.Balance]:
         res = self._api.query_acc_info(timestamp=tm.utc_timestamp(), recvWindow=5000)
-        balances_lst: List[dict] = res['balances']
-        res = list(filter(
-            lambda asset: float(asset["free"]) + float(asset["locked"]), balances_lst))
-        LOG.debug(res, content_type="json")
+        balances_lst: List[models.Balance] = models.Balance.from_json_list(res['balances'])
+        res = [asset for asset in balances_lst if asset.total]
+        FLOG.debug_json(res)
         return res
 
-    def my_trades_by_symbol(self, symbol: str) -> List[dict]:
-        res = self._api.my_trades(symbol=symbol, timestamp=tm.utc_timestamp(), recvWindow=5000, limit=1)
-        LOG.debug(res, content_type="json")
+    def my_trades_by_symbol(self, symbol: str, total_balance: float = None) -> List[dict]:
+        res = self._trades_cache.last_trades(symbol, total_balance=total_balance)
+        FLOG.debug_json(res)
         return res
 
+    def server_time_ms(self) -> int:
+        res = self._api.fetch_server_time()
+        return res["serverTime"] if res and "serverTime" in res else None
+
+    def checkpoint_path(self) -> str:
+        return self._settings.cache.checkpoint_file
+
+    def trades_snapshot(self) -> list:
+        return self._trades_cache.snapshot()
+
+    def restore_trades(self, entries: list) -> int:
+        return self._trades_cache.restore(entries)
+
+    def save_trades(self):
+        self._trades_cache.save()
+
+
+class ApiWrapperDryRun(ApiWrapperBase):
+    """
+    Reads the market through the wrapped one, but only records orders to create and cancel,
+    the worker sends the recorded orders to the test order endpoint after the cycle
+    """
+
+    def __init__(self, api_wrapper: ApiWrapperBase):
+        if not api_wrapper:
+            raise ValueError("Did't got api_wrapper param")
+        self._api_wr = api_wrapper
+        self._settings = api_wrapper._settings
+        self.intents: List[order_reconciler.OrderIntent] = []
+        self.cancels: List[models.Order] = []
+
+    def take_recorded(self) -> Tuple[List[order_reconciler.OrderIntent], List[models.Order]]:
+        intents, cancels = self.intents, self.cancels
+        self.intents, self.cancels = [], []
+        return intents, cancels
+
+    def exchange_symbols_info(self) -> List[models.SymbolInfo]:
+        return self._api_wr.exchange_symbols_info()
+
+    def market_index(self) -> mkt.MarketIndex:
+        return self._api_wr.market_index()
+
+    def ranking(self) -> ranking.TickerRanking:
+        return self._api_wr.ranking()
+
+    def create_new_order(
+            self,
+            symbol: str,
+            side: str,
+            order_type: str,
+            quantity: float,
+            price: float = None,
+            time_in_force: str = None
+    ) -> bool:
+        self.intents.append(order_reconciler.OrderIntent(symbol, side, order_type, quantity, price, time_in_force))
+        return True
+
+    def cancel_order(self, order: models.Order) -> bool:
+        self.cancels.append(order)
+        return True
+
+    def create_test_order(self, intent: order_reconciler.OrderIntent) -> dict:
+        return self._api_wr.create_test_order(intent)
+
+    def open_orders_by_side(self, order_side: str) -> List[models.Order]:
+        return self._api_wr.open_orders_by_side(order_side)
+
+    def open_orders(self) -> List[models.Order]:
+        return self._api_wr.open_orders()
+
+    def sorted_trade_pairs_btc(self) -> List[models.Ticker]:
+        return self._api_wr.sorted_trade_pairs_btc()
+
+    def book_tickers(self) -> List[models.BookTicker]:
+        return self._api_wr.book_tickers()
+
+    def acc_balance_for_assets(self) -> List[models.Balance]:
+        return self._api_wr.acc_balance_for_assets()
+
+    def my_trades_by_symbol(self, symbol: str, total_balance: float = None) -> List[dict]:
+        return self._api_wr.my_trades_by_symbol(symbol, total_balance=total_balance)
+
+    def server_time_ms(self) -> int:
+        return self._api_wr.server_time_ms()
+
+    def checkpoint_path(self) -> str:
+        return self._api_wr.checkpoint_path()
+
+    def restore_symbols_info(self, symbols_info: List[models.SymbolInfo]):
+        self._api_wr.restore_symbols_info(symbols_info)
+
+    def trades_snapshot(self) -> list:
+        return self._api_wr.trades_snapshot()
+
+    def restore_trades(self, entries: list) -> int:
+        return self._api_wr.restore_trades(entries)
+
+    def save_trades(self):
+        self._api_wr.save_trades()
+
+
+class ApiWrapperSim(ApiWrapperMain):
+    """
+    Real wrapper logic on top of the simulated exchange, see services.sim_exchange
+    """
+
+    def __init__(self, config, exchange, settings: cfg.Settings = None, faults=None):
+        from services import sim_exchange
+        super().__init__(config, settings=settings, rest_api=sim_exchange.SimBinanceApi(exchange, faults))
+        # Simulated trades must not get into the trades cache file of the real account
+        self._trades_cache = trades_cache.MyTradesCache(
+            self._api, max_symbols=self._settings.cache.trades_cache_max_symbols)
+
+    def checkpoint_path(self) -> str:
+        return None
+
 
 # noinspection PyUnusedLocal
 class ApiWrapperTest(ApiWrapperBase):
-    def __init__(self, config):
+    def __init__(self, config, settings: cfg.Settings = None):
         self._api = api.BinanceRestApi(config)
         self._config = config
+        self._settings = settings if settings else cfg.Settings.from_parser(config)
 
-    def exchange_symbols_info(self) -> List[dict]:
+    def exchange_symbols_info(self) -> List[models.SymbolInfo]:
         symbols = """[
         {
               "symbol": "ETHBTC",
@@ -272,8 +479,9 @@ class ApiWrapperTest(ApiWrapperBase):
             }
         ]
         """
-        res = json.loads(symbols)
-        LOG.debug(res, content_type="json")
+        res = models.SymbolInfo.from_json_list(json.loads(symbols))
+        self._market_index = mkt.MarketIndex(res)
+        FLOG.debug_json(res)
         return res
 
     def create_new_order(
@@ -303,10 +511,10 @@ class ApiWrapperTest(ApiWrapperBase):
               "msg":"Invalid symbol."
             }"""
         res = json.loads(res1)
-        LOG.debug(res, content_type="json")
+        FLOG.debug_json(res)
         return "code" not in res and "msg" not in res
 
-    def cancel_order(self, order: dict) -> bool:
+    def cancel_order(self, order: models.Order) -> bool:
         res = """{
           "symbol": "LTCBTC",
           "origClientOrderId": "myOrder1",
@@ -314,10 +522,10 @@ class ApiWrapperTest(ApiWrapperBase):
           "clientOrderId": "cancelMyOrder1"
         }"""
         res = json.loads(res)
-        LOG.debug(res, content_type="json")
+        FLOG.debug_json(res)
         return "code" not in res and "msg" not in res
 
-    def open_orders_by_side(self, order_side: str) -> List[dict]:
+    def open_orders_by_side(self, order_side: str) -> List[models.Order]:
         res = """
         [
           {
@@ -355,15 +563,15 @@ class ApiWrapperTest(ApiWrapperBase):
         ]
         """
         open_orders_lst: List[dict] = json.loads(res)
-        res = list(filter(lambda order: order["side"] == order_side, open_orders_lst))
-        LOG.debug(res, content_type="json")
+        res = models.Order.from_json_list(order for order in open_orders_lst if order["side"] == order_side)
+        FLOG.debug_json(res)
         return res
 
-    def sorted_trade_pairs_btc(self) -> List[dict]:
+    def sorted_trade_pairs_btc(self) -> List[models.Ticker]:
         res = """
         [
           {
-            "symbol": "EOSBTC",
+            "symbol": "ETHBTC",
             "priceChange": "0.00009821",
             "priceChangePercent": "8.576",
             "weightedAvgPrice": "0.00118724",
@@ -386,7 +594,7 @@ class ApiWrapperTest(ApiWrapperBase):
             "count": 115461
           },
           {
-            "symbol": "SNTBTC",
+            "symbol": "LTCBTC",
             "priceChange": "-0.00000031",
             "priceChangePercent": "-1.205",
             "weightedAvgPrice": "0.00002508",
@@ -432,7 +640,7 @@ class ApiWrapperTest(ApiWrapperBase):
             "count": 6860
           },
           {
-            "symbol": "ETCBTC",
+            "symbol": "NEOBTC",
             "priceChange": "0.00005700",
             "priceChangePercent": "2.140",
             "weightedAvgPrice": "0.00268113",
@@ -455,7 +663,7 @@ class ApiWrapperTest(ApiWrapperBase):
             "count": 27596
           },
           {
-            "symbol": "MTHBTC",
+            "symbol": "BNBBTC",
             "priceChange": "-0.00000130",
             "priceChangePercent": "-5.242",
             "weightedAvgPrice": "0.00002428",
@@ -480,29 +688,11 @@ class ApiWrapperTest(ApiWrapperBase):
         ]
         """
 
-        def sort_func(key):
-            ask = float(key["askPrice"])
-            bid = float(key["bidPrice"])
-            volume24h = float(key["quoteVolume"])
-            change_percent = float(key["priceChangePercent"])
-            rank = ((ask - bid) / bid) * volume24h * (1 - (change_percent / 100))
-            LOG.debug("symbol:{} rank:{}".format(key["symbol"], str(rank)))
-            return rank
-
-        pairs_lst: List[dict] = json.loads(res)
-        only_btc_pairs_lst: list = \
-            filter(
-                lambda pair:
-                "BTC" in pair["symbol"]
-                and "USDT" not in pair["symbol"]
-                and float(pair["lastPrice"]) > self._config.getfloat("Exchange", "min_pair_price", fallback=0.000001),
-                pairs_lst
-            )
-        res = sorted(only_btc_pairs_lst, key=sort_func, reverse=True)
-        LOG.debug(res, content_type="json")
+        res = self._rank_trade_pairs_btc(json.loads(res))
+        FLOG.debug_json(res)
         return res
 
-    def acc_balance_for_assets(self) -> List[dict]:
+    def acc_balance_for_assets(self) -> List[models.Balance]:
         res = """
         [
             {
@@ -517,13 +707,12 @@ class ApiWrapperTest(ApiWrapperBase):
             }
         ]
         """
-        balances_lst: List[dict] = json.loads(res)
-        res = list(filter(
-            lambda asset: float(asset["free"]) + float(asset["locked"]), balances_lst))
-        LOG.debug(res, content_type="json")
+        balances_lst: List[models.Balance] = models.Balance.from_json_list(json.loads(res))
+        res = [asset for asset in balances_lst if asset.total]
+        FLOG.debug_json(res)
         return res
 
-    def my_trades_by_symbol(self, symbol: str) -> List[dict]:
+    def my_trades_by_symbol(self, symbol: str, total_balance: float = None) -> List[dict]:
         res = """
         [
             {
@@ -541,17 +730,32 @@ class ApiWrapperTest(ApiWrapperBase):
         ]
         """
         res = json.loads(res)
-        LOG.debug(res, content_type="json")
+        FLOG.debug_json(res)
         return res
 
 
 class BinanceWorker(exchange_base.IExchangeBase):
-    def __init__(self, config, api_wrapper: ApiWrapperBase = None):
+    def __init__(self, config, api_wrapper: ApiWrapperBase = None, settings: cfg.Settings = None):
         self._config = config
+        self._settings = settings if settings else cfg.Settings.from_parser(config)
         if not api_wrapper:
-            self._api_wr = ApiWrapperMain(config=config)
+            self._api_wr = ApiWrapperMain(config=config, settings=self._settings)
         else:
             self._api_wr = api_wrapper
+        if self._settings.exchange.dry_run and not isinstance(self._api_wr, ApiWrapperDryRun):
+            LOG.info("Dry run mode: orders are sent to the test order endpoint only")
+            self._api_wr = ApiWrapperDryRun(self._api_wr)
+        self._report: dry_run.CycleReport = None
+        self._state = worker_state.WorkerState(self._settings.exchange)
+        self._checkpoint_path = self._api_wr.checkpoint_path()
+        self._checkpoint_saved_at = 0.0
+        self._is_started = False  # The first cycle syncs the clock and restores the checkpoint
+        self._policy = cycle_policy.CyclePolicy(self._settings.schedule, self._settings.exchange.awake_timeout_sec) \
+            if self._settings.schedule.adaptive else None
+        self._cycle_inputs: cycle_policy.CycleInputs = None
+        self._prev_prices: dict = {}
+        self._prev_prices_at = 0.0
+        self._reprice_weight = 0
 
     def run_worker(self):
         super().run_worker()
@@ -560,84 +764,342 @@ class BinanceWorker(exchange_base.IExchangeBase):
     def release(self):
         super().release()
 
+    @contextlib.contextmanager
+    def _phase(self, name: str, **args):
+        started = time.perf_counter()
+        with tracing.span("phase." + name, **args):
+            try:
+                yield
+            finally:
+                if self._report:
+                    self._report.add_phase(name, time.perf_counter() - started)
+
+    def run_reprice(self):
+        weight_before = endpoints.weight_used()
+        self._run_cycle("worker_reprice", self._reprice)
+        self._reprice_weight = endpoints.weight_used() - weight_before
+
+    def next_awake_timeout_sec(self, default_sec: float) -> float:
+        return self._policy.interval_sec if self._policy else default_sec
+
     def _work(self):
+        started = time.monotonic()
+        weight_before = endpoints.weight_used()
+        self._cycle_inputs = None
+        self._run_cycle("worker_cycle", self._work_traced)
+        self._api_wr.save_trades()  # Once per cycle and not by every synced asset
+        if self._policy:
+            self._schedule_next_cycle(time.monotonic() - started, endpoints.weight_used() - weight_before)
+        if time.monotonic() - self._checkpoint_saved_at >= self._settings.cache.checkpoint_interval_sec:
+            self.save_state()
+
+    def _observe_market(self, tickers: List[models.Ticker], my_open_orders_buy: List[models.Order]):
+        now = time.monotonic()
+        self._cycle_inputs = cycle_policy.CycleInputs(
+            move_percent=cycle_policy.price_moves_percent(self._prev_prices, tickers),
+            elapsed_sec=now - self._prev_prices_at if self._prev_prices else 0.0,
+            orders_total=len(my_open_orders_buy),
+            orders_off_market=cycle_policy.off_market_orders(my_open_orders_buy, models.by_symbol(tickers))
+        )
+        self._prev_prices = {ticker.symbol: ticker.last_price for ticker in tickers}
+        self._prev_prices_at = now
+
+    def _schedule_next_cycle(self, cycle_sec: float, cycle_weight: int):
+        # A failed cycle hasn't seen the market, only its cost is known
+        inputs = self._cycle_inputs if self._cycle_inputs else cycle_policy.CycleInputs()
+        inputs.cycle_sec = cycle_sec
+        inputs.cycle_weight = cycle_weight
+        reprice_interval_sec = self._settings.exchange.reprice_interval_sec
+        inputs.reprice_weight_per_min = self._reprice_weight * 60 / reprice_interval_sec if reprice_interval_sec else 0
+        self._policy.next_interval(inputs)
+
+    def save_state(self):
+        self._api_wr.save_trades()
+        if not self._checkpoint_path or self._state.symbols_info.value is None:
+            return
+        saved = checkpoint.WorkerCheckpoint(
+            saved_at_ms=int(time.time() * 1000),
+            clock_offset_ms=tm.offset_ms(),
+            symbols_info=self._state.symbols_info.value if self._state.symbols_info.is_valid() else [],
+            my_trades=self._api_wr.trades_snapshot(),
+            open_orders=self._state.open_orders,
+            created_orders=self._state.created_orders
+        )
+        if checkpoint.save(self._checkpoint_path, saved):
+            self._checkpoint_saved_at = time.monotonic()
+
+    def _warm_start(self):
+        """
+        Instead of the cold sync the checkpoint is validated by the open orders which the cycle has just fetched:
+        the metadata must know all of their symbols and is kept for the rest of its ttl,
+        orders which have gone since the checkpoint were filled or cancelled while the worker was down
+        """
+        self._is_started = True
+        saved = checkpoint.load(self._checkpoint_path)
+        self._sync_clock(saved.clock_offset_ms if saved else 0)
+        if saved is None:
+            return
+        age_sec = saved.age_sec()
+        if age_sec > self._settings.cache.checkpoint_max_age_sec:
+            LOG.info("Checkpoint is {:.0f} sec old, max age is {:.0f} sec. Cold sync".format(
+                age_sec, self._settings.cache.checkpoint_max_age_sec))
+            return
+        open_orders = self._state.open_orders
+        still_open = sum(1 for order_id in saved.open_orders if order_id in open_orders)
+        created = set(saved.created_orders)
+        new_orders = [order for order_id, order in open_orders.items() if order_id not in saved.open_orders]
+        created_open = sum(1 for order in new_orders if (order.symbol, order.side, round(order.price, 8)) in created)
+        symbols = set(info.symbol for info in saved.symbols_info)
+        unknown_symbols = [order.symbol for order in open_orders.values() if order.symbol not in symbols]
+        if saved.symbols_info and not unknown_symbols:
+            self._state.symbols_info.restore(saved.symbols_info, age_sec)
+            if self._state.symbols_info.is_valid():
+                self._api_wr.restore_symbols_info(saved.symbols_info)
+        elif unknown_symbols:
+            LOG.info("Checkpoint metadata doesn't know symbols of open orders: {}".format(unknown_symbols[:10]))
+        restored_trades = self._api_wr.restore_trades(saved.my_trades)
+        LOG.info("Checkpoint of {:.0f} sec ago has restored. Symbols:{} trades:{}. Orders still open:{} gone:{} "
+                 "created before the stop:{} unknown:{}".format(
+                     age_sec, len(saved.symbols_info) if self._state.symbols_info.is_valid() else 0, restored_trades,
+                     still_open, len(saved.open_orders) - still_open, created_open, len(new_orders) - created_open))
+
+    def _sync_clock(self, fallback_offset_ms: int):
+        # Offset from the middle of the request, the checkpoint one is used if the exchange doesn't answer
+        started = time.time()
+        server_time_ms = self._api_wr.server_time_ms()
+        finished = time.time()
+        if server_time_ms is None:
+            tm.set_offset_ms(fallback_offset_ms)
+            return
+        offset_ms = server_time_ms - int((started + finished) * 500)
+        LOG.info("Exchange clock offset: {} ms, request took {:.0f} ms".format(offset_ms, (finished - started) * 1000))
+        tm.set_offset_ms(offset_ms)
+
+    def _on_cycle_error(self, ex: Exception):
+        if isinstance(ex, deadline.DeadlineExceeded) or deadline.is_exceeded():
+            # Orders by the prices of this cycle would be stale, the next cycle starts from fresh data
+            LOG.warning("Cycle has aborted after its budget of {} sec: {}".format(
+                self._settings.timeouts.cycle_budget_sec, ex.args[-1] if ex.args else repr(ex)))
+        else:
+            LOG.error("Unknown exception has fired. Type:{} msg:{}".format(type(ex), ex.args[-1]))
+        if self._report:
+            self._report.error = repr(ex)
+
+    def _run_cycle(self, name: str, work_func):
+        with tracing.start_trace(name), deadline.scope(self._settings.timeouts.cycle_budget_sec):
+            if isinstance(self._api_wr, ApiWrapperDryRun):
+                self._report = dry_run.CycleReport()
+            try:
+                work_func()
+                if self._report:
+                    with self._phase("test_orders"):
+                        self._send_test_orders()
+            finally:
+                if self._report:
+                    self._report.finish()
+                    self._report.write(self._settings.exchange.dry_run_report_file)
+                    self._report = None
+
+    def _send_test_orders(self):
+        intents, cancels = self._api_wr.take_recorded()
+        self._report.cancels = cancels
+        started = time.perf_counter()
+        self._report.results = dry_run.send_test_orders(
+            self._api_wr.create_test_order, intents, self._settings.tasks.rest_max_concurrent)
+        self._report.test_orders_ms = (time.perf_counter() - started) * 1000
+
+    def _work_traced(self):
         try:
-            my_open_orders_buy: list = self._api_wr.open_orders_by_side(order_side=api.BnApiEnums.ORDER_SIDE_BUY)
-            # Close all open orders with side = 'BUY'
-            my_open_orders_buy[:] = [order for order in my_open_orders_buy if not self._api_wr.cancel_order(order)]
-            if my_open_orders_buy:
-                raise ValueError("Did't close all open orders for 'BUY' side")
-            all_trade_pairs_btc: List[dict] = self._api_wr.sorted_trade_pairs_btc()
-            potential_buy_list: List[dict] = all_trade_pairs_btc[:]
-            acc_balance_assets_info: List[dict] = self._api_wr.acc_balance_for_assets()
-            exchange_symbols_info: List[dict] = self._api_wr.exchange_symbols_info()
-            initial_btc_info: dict = next((asset for asset in acc_balance_assets_info if asset["asset"] == "BTC"), None)
-            if not all_trade_pairs_btc \
+            with self._phase("open_orders"):
+                my_open_orders_buy: List[models.Order] = self._open_orders_buy()
+            if not self._is_started and my_open_orders_buy is not None:
+                with self._phase("warm_start"):
+                    self._warm_start()
+            # Symbols metadata goes first, the market index built from it selects the pairs for ranking
+            with self._phase("symbols_info"):
+                exchange_symbols_info: List[models.SymbolInfo] = \
+                    self._state.symbols_info.get(self._api_wr.exchange_symbols_info)
+            if my_open_orders_buy is not None and exchange_symbols_info:
+                self._set_own_bids(my_open_orders_buy)
+            with self._phase("rank"):
+                all_trade_pairs_btc: List[models.Ticker] = self._api_wr.sorted_trade_pairs_btc()
+            potential_buy_list: List[models.Ticker] = all_trade_pairs_btc[:]
+            with self._phase("balances"):
+                acc_balance_assets_info: List[models.Balance] = \
+                    self._state.balances.get(self._api_wr.acc_balance_for_assets)
+            initial_btc_info: models.Balance = \
+                next((asset for asset in acc_balance_assets_info if asset.asset == "BTC"), None)
+            if my_open_orders_buy is None \
+                    or not all_trade_pairs_btc \
                     or not potential_buy_list \
                     or not acc_balance_assets_info \
                     or not exchange_symbols_info \
                     or not initial_btc_info:
                 raise ValueError("Something went wrong and one from mandatory params are None")
 
-            self._generate_sell_orders_slow(all_trade_pairs_btc, acc_balance_assets_info, potential_buy_list,
-                                            exchange_symbols_info)
-            self._generate_buy_orders_slow(potential_buy_list, exchange_symbols_info, initial_btc_info)
+            if self._policy:
+                self._observe_market(all_trade_pairs_btc, my_open_orders_buy)
+            market = self._api_wr.market_index()
+            with self._phase("sell_orders"):
+                self._generate_sell_orders_slow(all_trade_pairs_btc, acc_balance_assets_info, potential_buy_list,
+                                                market)
+            with self._phase("buy_intents"):
+                buy_intents = self._generate_buy_orders_slow(potential_buy_list, market, initial_btc_info,
+                                                             my_open_orders_buy)
+            with self._phase("apply_buy_orders", intents=len(buy_intents)):
+                self._apply_buy_orders(buy_intents, my_open_orders_buy)
 
         except Exception as ex:
-            LOG.error("Unknown exception has fired. Type:{} msg:{}".format(type(ex), ex.args[-1]))
+            self._on_cycle_error(ex)
         finally:
             LOG.info("BinanceWorker is shutting down!")
             self.release()
 
-    def _generate_sell_orders_slow(self, all_trade_pairs_btc, acc_balance_assets_info, potential_buy_list,
-                                   exchange_symbols_info):
+    def _open_orders_buy(self) -> List[models.Order]:
+        # All of the open orders show whether the account has changed since the last cycle
+        open_orders = self._api_wr.open_orders()
+        if open_orders is None:
+            return None
+        self._state.on_open_orders(open_orders)
+        return [order for order in open_orders if order.side == api.BnApiEnums.ORDER_SIDE_BUY]
+
+    def _set_own_bids(self, my_open_orders_buy: List[models.Order]):
+        # Our resting bids would narrow the spread of their pairs and flip the top between cycles
+        market = self._api_wr.market_index()
+        own_bids = {}
+        for order in my_open_orders_buy:
+            symbol_info = market.symbol_info(order.symbol)
+            if symbol_info and symbol_info.tick_size:
+                own_bids[order.symbol] = (order.price, symbol_info.tick_size)
+        self._api_wr.ranking().set_own_bids(own_bids)
+
+    def _create_order(self, **kwargs) -> bool:
+        deadline.check("{} order for {}".format(kwargs.get("side"), kwargs.get("symbol")))
+        res = self._api_wr.create_new_order(**kwargs)
+        self._state.on_order_sent(res)
+        if res:
+            self._state.on_order_created(kwargs["symbol"], kwargs["side"], kwargs.get("price"))
+        return res
+
+    def _cancel_order(self, order: models.Order) -> bool:
+        deadline.check("cancel of order {}".format(order.order_id))
+        res = self._api_wr.cancel_order(order)
+        self._state.on_order_sent(res)
+        return res
+
+    def _reprice(self):
+        """
+        Fast path between the full cycles: the best bid/ask of all symbols re-ranks the known pairs
+        and our BUY orders which have been outbid are moved to the new best bid
+        """
+        try:
+            pairs_ranking = self._api_wr.ranking()
+            if not len(pairs_ranking):
+                LOG.debug("Trade pairs aren't ranked yet, nothing to re-price")
+                return
+            with self._phase("book_tickers"):
+                book_tickers: List[models.BookTicker] = self._api_wr.book_tickers()
+            with self._phase("open_orders"):
+                my_open_orders_buy: List[models.Order] = self._open_orders_buy()
+            if not book_tickers or my_open_orders_buy is None:
+                raise ValueError("Something went wrong and one from mandatory params are None")
+            self._set_own_bids(my_open_orders_buy)
+            with self._phase("update_book"):
+                for book in book_tickers:
+                    pairs_ranking.update_book(book.symbol, book.bid_price, book.ask_price)
+            with self._phase("reprice_buy_orders"):
+                self._reprice_buy_orders(my_open_orders_buy, models.by_symbol(book_tickers),
+                                         self._api_wr.market_index())
+        except Exception as ex:
+            self._on_cycle_error(ex)
+
+    def _reprice_buy_orders(self, my_open_orders_buy: List[models.Order], book_tickers: dict,
+                            market: mkt.MarketIndex):
+        # Same bid rule as _generate_buy_orders_slow, the btc of the cancelled order pays for the new one
+        repriced = 0
+        for order in my_open_orders_buy:
+            book: models.BookTicker = book_tickers.get(order.symbol)
+            symbol_info = market.symbol_info(order.symbol)
+            if not book or not book.bid_price or not symbol_info or symbol_info.tick_size is None:
+                continue
+            tick_size = symbol_info.tick_size
+            if book.bid_price < order.price + tick_size / 2:
+                continue  # Ours is the best bid
+            bid = book.bid_price + tick_size
+            buy_qty = alg.reduce_to_step_size(order.price * order.remaining_qty / bid, symbol_info.step_size)
+            if (book.ask_price and bid >= book.ask_price) \
+                    or bid > symbol_info.max_price \
+                    or buy_qty < symbol_info.min_qty \
+                    or buy_qty * bid < symbol_info.min_notional:
+                FLOG.debug("BUY order {} of {} can't be re-priced to {:.9f}", order.order_id, order.symbol, bid)
+                continue
+            if not self._cancel_order(order):
+                LOG.debug("BUY order cancel for re-pricing has failed")
+                continue
+            if self._create_order(
+                    symbol=order.symbol,
+                    side=api.BnApiEnums.ORDER_SIDE_BUY,
+                    order_type=api.BnApiEnums.ORDER_TYPE_LIMIT,
+                    quantity=buy_qty,
+                    price=bid,
+                    time_in_force=api.BnApiEnums.TIME_IN_FORCE_GTC
+            ):
+                repriced += 1
+            else:
+                LOG.debug("BUY order create for re-pricing has failed")
+        LOG.info("BUY orders re-priced:{} open:{}".format(repriced, len(my_open_orders_buy)))
+
+    def _generate_sell_orders_slow(self, all_trade_pairs_btc: List[models.Ticker],
+                                   acc_balance_assets_info: List[models.Balance],
+                                   potential_buy_list: List[models.Ticker],
+                                   market: mkt.MarketIndex):
+        cfg_min_profit_coef = self._settings.exchange.min_profit_coef
+        cfg_loss_time_sec: int = self._settings.exchange.loss_time_sec
+        tickers = models.by_symbol(all_trade_pairs_btc)
+        potential_buy_symbols = {pair.symbol for pair in potential_buy_list}
+        already_bought = set()
         # Loop for all of my assets except 'BTC' and create 'SELL' orders
         for asset in acc_balance_assets_info:
-            LOG.debug("Try to generate 'SELL' orders for asset:{}".format(asset["asset"]))
-            if asset["asset"] == "BTC":
+            FLOG.debug("Try to generate 'SELL' orders for asset:{}", asset.asset)
+            if asset.asset == "BTC":
+                continue
+            symbol = market.symbol_for(asset.asset, "BTC")
+            if not symbol:
+                FLOG.debug("Asset {} hasn't got a trading 'BTC' pair. Continue", asset.asset)
                 continue
-            asset["symbol"] = asset["asset"] + "BTC"
-            asset["total_balance_fl"] = float(asset["free"]) + float(asset["locked"])
-            filter_price, filter_lot_size, filter_notional = \
-                self._get_filters_for_order_fast(exchange_symbols_info, asset["symbol"])
+            total_balance = asset.total
+            symbol_info = self._symbol_info_fast(market, symbol)
             # Find trade pair with 'BTC' on exchange in current moment for our asset
-            trade_info_for_asset = next((pr for pr in all_trade_pairs_btc if pr["symbol"] == asset["symbol"]), None)
-            if trade_info_for_asset and filter_price:
-                asset["ask_in_btc_fl"] = float(trade_info_for_asset["askPrice"]) - float(filter_price["tickSize"])
-                asset["total_cost_in_btc_fl"] = asset["total_balance_fl"] * float(trade_info_for_asset["lastPrice"])
-            else:
-                raise ValueError("trade_info_for_asset or filter_price is invalid")
+            trade_info_for_asset = tickers.get(symbol)
+            if not trade_info_for_asset:
+                # Pairs cheaper than min_pair_price aren't ranked, one such asset mustn't stop the whole cycle
+                FLOG.debug("Pair {} isn't ranked. Continue", symbol)
+                continue
+            ask_in_btc = trade_info_for_asset.ask_price - symbol_info.tick_size
+            total_cost_in_btc = total_balance * trade_info_for_asset.last_price
             # If asset already bought early we don't buy it again
-            asset_in_buy_lst = next((pr for pr in potential_buy_list if pr["symbol"] == asset["symbol"]), None)
-            if asset_in_buy_lst and asset["total_cost_in_btc_fl"] > float(filter_notional["minNotional"]):
-                potential_buy_list.remove(asset_in_buy_lst)
+            if symbol in potential_buy_symbols and total_cost_in_btc > symbol_info.min_notional:
+                already_bought.add(symbol)
             # Analise for new 'SELL' order
-            cfg_min_profit_coef = self._config.getfloat("Exchange", "min_profit_coef", fallback=1.04)
-            sell_qty = alg.reduce_to_step_size(float(asset["free"]), float(filter_lot_size["stepSize"]))
-            LOG.debug("Dump variables after Qty calculating."
-                      "\nQuantity: {}\nCfg min profit coef: {}\nTotal asset cost: {} 'BTC'\nAsk: {} 'BTC'"
-                .format(
-                    f"{sell_qty:.9f}",
-                    f"{cfg_min_profit_coef:.9f}",
-                    f"{asset['total_cost_in_btc_fl']:.9f}",
-                    f"{asset['ask_in_btc_fl']:.9f}"
-                )
-            )
+            sell_qty = alg.reduce_to_step_size(asset.free, symbol_info.step_size)
+            FLOG.debug("Dump variables after Qty calculating.\nQuantity: {:.9f}\nCfg min profit coef: {:.9f}"
+                       "\nTotal asset cost: {:.9f} 'BTC'\nAsk: {:.9f} 'BTC'",
+                       sell_qty, cfg_min_profit_coef, total_cost_in_btc, ask_in_btc)
             if not sell_qty \
-                    or float(asset["free"]) < sell_qty \
-                    or float(filter_lot_size["minQty"]) > sell_qty \
-                    or float(filter_lot_size["maxQty"]) < sell_qty:
+                    or asset.free < sell_qty \
+                    or symbol_info.min_qty > sell_qty \
+                    or symbol_info.max_qty < sell_qty:
                 LOG.debug("Quantity too low for trading. Continue".format(sell_qty))
                 continue
-            asset_last_trade: List[dict] = self._api_wr.my_trades_by_symbol(asset["symbol"])
+            asset_last_trade: List[dict] = self._api_wr.my_trades_by_symbol(symbol, total_balance=total_balance)
             last_trade_price: float = float(asset_last_trade[0]["price"])
-            if asset["ask_in_btc_fl"] > last_trade_price * cfg_min_profit_coef:
-                if self._api_wr.create_new_order(
-                        symbol=asset["symbol"],
+            if ask_in_btc > last_trade_price * cfg_min_profit_coef:
+                if self._create_order(
+                        symbol=symbol,
                         side=api.BnApiEnums.ORDER_SIDE_SELL,
                         order_type=api.BnApiEnums.ORDER_TYPE_LIMIT,
                         quantity=sell_qty,
-                        price=asset["ask_in_btc_fl"],
+                        price=ask_in_btc,
                         time_in_force=api.BnApiEnums.TIME_IN_FORCE_GTC
                 ):
                     LOG.debug("SELL order has successfully created")
@@ -645,13 +1107,11 @@ class BinanceWorker(exchange_base.IExchangeBase):
                     LOG.debug("SELL order create has failed")
                     continue
             else:
-                LOG.debug("Check loss time for symbol: {}".format(asset["symbol"]))
-                cfg_loss_time_sec: int = self._config.getint("Exchange", "loss_time_sec",
-                                                         fallback=604800)  # default - 7 days
+                FLOG.debug("Check loss time for symbol: {}", symbol)
                 if (tm.utc_timestamp() - int(asset_last_trade[0]["time"])) > cfg_loss_time_sec * 1000:
-                    LOG.debug("Loss time has reached. Create order for symbol: {}".format(asset["symbol"]))
-                    if self._api_wr.create_new_order(
-                            symbol=asset["symbol"],
+                    LOG.debug("Loss time has reached. Create order for symbol: {}".format(symbol))
+                    if self._create_order(
+                            symbol=symbol,
                             side=api.BnApiEnums.ORDER_SIDE_SELL,
                             order_type=api.BnApiEnums.ORDER_TYPE_MARKET,
                             quantity=sell_qty
@@ -660,22 +1120,30 @@ class BinanceWorker(exchange_base.IExchangeBase):
                     else:
                         LOG.debug("SELL order by loss time create has failed")
                         continue
+        # One pass instead of list.remove() for every held asset
+        if already_bought:
+            potential_buy_list[:] = [pair for pair in potential_buy_list if pair.symbol not in already_bought]
 
-    def _generate_buy_orders_slow(self, potential_buy_list, exchange_symbols_info, initial_btc_info):
-        # Loop for all potential_buy_list and create 'BUY' order
-        cfg_trade_prs_lim = self._config.getint("Exchange", "trade_pairs_limit", fallback=10)
-        cfg_min_free_btc_split_coef = self._config.getint("Exchange", "min_free_btc_split_coef", fallback=200)
-        free_btc_balance = float(initial_btc_info["free"])
+    def _generate_buy_orders_slow(self, potential_buy_list: List[models.Ticker],
+                                  market: mkt.MarketIndex, initial_btc_info: models.Balance,
+                                  my_open_orders_buy: List[models.Order]) -> List[order_reconciler.OrderIntent]:
+        # Loop for all potential_buy_list and generate 'BUY' order intents
+        buy_intents: List[order_reconciler.OrderIntent] = []
+        cfg_trade_prs_lim = self._settings.exchange.trade_pairs_limit
+        cfg_min_free_btc_split_coef = self._settings.exchange.min_free_btc_split_coef
+        # Our open 'BUY' orders aren't cancelled before the calculation, so their locked btc is available too
+        free_btc_balance = initial_btc_info.free + order_reconciler.locked_in_orders(my_open_orders_buy)
+        own_bids = {order.symbol: order.price for order in my_open_orders_buy}
         if free_btc_balance < cfg_trade_prs_lim / cfg_min_free_btc_split_coef:
             cfg_trade_prs_lim = 1
         estimated_by_pair = free_btc_balance / cfg_trade_prs_lim
         for buy_pair in potential_buy_list[0:cfg_trade_prs_lim]:
-            symbol = buy_pair["symbol"]
-            LOG.debug("Try to generate 'BUY' orders for \nSymbol: {}\nFree balance: {} 'BTC'\nTrade pair limit: {}"
-                      .format(symbol, f"{free_btc_balance:.9f}", cfg_trade_prs_lim))
-            filter_price, filter_lot_size, filter_notional = \
-                self._get_filters_for_order_fast(exchange_symbols_info, symbol)
-            min_allow_btc_balance = float(filter_notional["minNotional"])
+            symbol = buy_pair.symbol
+            FLOG.debug("Try to generate 'BUY' orders for \nSymbol: {}\nFree balance: {:.9f} 'BTC'"
+                       "\nTrade pair limit: {}",
+                       symbol, free_btc_balance, cfg_trade_prs_lim)
+            symbol_info = self._symbol_info_fast(market, symbol)
+            min_allow_btc_balance = symbol_info.min_notional
             if estimated_by_pair < min_allow_btc_balance or free_btc_balance < min_allow_btc_balance:
                 LOG.debug("Insufficient btc balance.\nAvailable balance: {0} 'BTC'\nMinimum balance: {1} 'BTC'"
                           "\nTry to increase available balance to initial btc balance."
@@ -686,60 +1154,74 @@ class BinanceWorker(exchange_base.IExchangeBase):
                     LOG.debug("Insufficient btc balance for symbol: {}. Continue.".format(symbol))
                     continue
             free_btc_balance -= estimated_by_pair
-            # Calculate bid
-            bid = float(buy_pair["bidPrice"]) + float(filter_price["tickSize"])
-            LOG.debug("Dump variables after bid calculating."
-                      "\nbid: {}\nBid price: {} 'BTC'\nTick size: {}"
-                .format(
-                    f"{bid:.9f}",
-                    buy_pair['bidPrice'],
-                    filter_price['tickSize']
-                )
-            )
-            if not bid or bid > float(filter_price["maxPrice"]) or bid < float(filter_price["minPrice"]):
+            # Calculate bid. Don't outbid our own order if it is the best bid already
+            tick_size = symbol_info.tick_size
+            best_bid = buy_pair.bid_price
+            own_bid = own_bids.get(symbol)
+            if own_bid is not None and abs(own_bid - best_bid) < tick_size / 2:
+                bid = own_bid
+            else:
+                bid = best_bid + tick_size
+            FLOG.debug("Dump variables after bid calculating.\nbid: {:.9f}\nBid price: {:.9f} 'BTC'\nTick size: {}",
+                       bid, best_bid, tick_size)
+            if not bid or bid > symbol_info.max_price or bid < symbol_info.min_price:
                 continue
             # Calculate quantity
-            buy_qty = alg.reduce_to_step_size(estimated_by_pair / bid, float(filter_lot_size["stepSize"]))
-            LOG.debug("Dump variables after buy Qty calculating."
-                      "\nQuantity: {}\nAvailable balance: {} 'BTC'\nStep size: {}"
-                .format(
-                    f"{buy_qty:.9f}",
-                    f"{estimated_by_pair:.9f}",
-                    filter_lot_size['stepSize']
-                )
-            )
+            buy_qty = alg.reduce_to_step_size(estimated_by_pair / bid, symbol_info.step_size)
+            FLOG.debug("Dump variables after buy Qty calculating.\nQuantity: {:.9f}\nAvailable balance: {:.9f} 'BTC'"
+                       "\nStep size: {}", buy_qty, estimated_by_pair, symbol_info.step_size)
             if not buy_qty:
                 LOG.debug("Buy quantity isn't valid. Continue.")
                 continue
-            if self._api_wr.create_new_order(
-                    symbol=symbol,
-                    side=api.BnApiEnums.ORDER_SIDE_BUY,
-                    order_type=api.BnApiEnums.ORDER_TYPE_LIMIT,
-                    quantity=buy_qty,
-                    price=bid,
-                    time_in_force=api.BnApiEnums.TIME_IN_FORCE_GTC
+            buy_intents.append(order_reconciler.OrderIntent(
+                symbol=symbol,
+                side=api.BnApiEnums.ORDER_SIDE_BUY,
+                order_type=api.BnApiEnums.ORDER_TYPE_LIMIT,
+                quantity=buy_qty,
+                price=bid,
+                time_in_force=api.BnApiEnums.TIME_IN_FORCE_GTC
+            ))
+        return buy_intents
+
+    def _apply_buy_orders(self, buy_intents: List[order_reconciler.OrderIntent],
+                          my_open_orders_buy: List[models.Order]):
+        plan = order_reconciler.reconcile(buy_intents, my_open_orders_buy,
+                                          self._settings.exchange.order_qty_tolerance_pct)
+        # Cancel stale orders first to release their btc for the new ones
+        not_cancelled = [order for order in plan.to_cancel if not self._cancel_order(order)]
+        if not_cancelled:
+            raise ValueError("Did't close all stale open orders for 'BUY' side")
+        for intent in plan.to_create:
+            if self._create_order(
+                    symbol=intent.symbol,
+                    side=intent.side,
+                    order_type=intent.order_type,
+                    quantity=intent.quantity,
+                    price=intent.price,
+                    time_in_force=intent.time_in_force
             ):
                 LOG.debug("BUY order has successfully created")
             else:
                 LOG.debug("BUY order create has failed")
+        LOG.info("BUY orders kept:{} cancelled:{} created:{}".format(
+            len(plan.kept), len(plan.to_cancel), len(plan.to_create)))
 
-    def _acc_btc_info_slow(self) -> dict:
+    def _acc_btc_info_slow(self) -> models.Balance:
         # query every time in loop because lod value is not represented
         acc_balance_for_assets = self._api_wr.acc_balance_for_assets()
         for asset in acc_balance_for_assets:
-            if asset["asset"] == "BTC":
+            if asset.asset == "BTC":
                 return asset
         raise ValueError("Don't have BTC info in my account assets list")
 
     @staticmethod
-    def _get_filters_for_order_fast(exchange_symbols_info, symbol):
-        symbol_info: dict = next((pr for pr in exchange_symbols_info if pr["symbol"] == symbol), None)
+    def _symbol_info_fast(market: mkt.MarketIndex, symbol: str) -> models.SymbolInfo:
+        symbol_info = market.symbol_info(symbol)
         if not symbol_info:
             raise ValueError("Bad symbol from potential_buy_list")
-        price_filter: dict = symbol_info["filters"][0]
-        lot_size_filter: dict = symbol_info["filters"][1]
-        min_notional_filter: dict = symbol_info["filters"][2]
-        return price_filter, lot_size_filter, min_notional_filter
+        if symbol_info.tick_size is None or symbol_info.step_size is None or symbol_info.min_notional is None:
+            raise ValueError("Symbol {} hasn't got price, lot size or min notional filter".format(symbol))
+        return symbol_info
 
 
 if __name__ == '__main__':
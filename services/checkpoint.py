@@ -0,0 +1,162 @@
+import io
+import os
+import pickle
+import struct
+import time
+import zlib
+from typing import Dict, List, Tuple
+from logger import logger
+from core import metrics
+from services import models
+
+LOG = logger.LOG
+
+MAGIC = b"CBCP"
+VERSION = 1
+# magic, format version, payload length, crc32 of the payload
+_HEADER = struct.Struct("<4sHII")
+
+_written_counter = metrics.counter("checkpoint.written")
+_loaded_counter = metrics.counter("checkpoint.loaded")
+_rejected_counter = metrics.counter("checkpoint.rejected")
+
+
+class CheckpointError(Exception):
+    pass
+
+
+class _PlainUnpickler(pickle.Unpickler):
+    # The payload holds only builtin types, nothing from the file may import or call code
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError("Global {}.{} is forbidden in a checkpoint".format(module, name))
+
+
+def _pack_models(items: list) -> List[tuple]:
+    return [tuple(getattr(item, name) for name in item.__slots__) for item in items]
+
+
+def _unpack_models(model_cls, rows: List[tuple]) -> list:
+    return [model_cls(*row) for row in rows]
+
+
+class WorkerCheckpoint(object):
+    """
+    What the worker knows about the exchange and the account, enough to skip the cold sync after a restart:
+    symbols metadata, the last own trade per symbol, our open orders and the exchange clock offset.
+    """
+    __slots__ = ("saved_at_ms", "clock_offset_ms", "symbols_info", "my_trades", "open_orders", "created_orders")
+
+    def __init__(self, saved_at_ms: int, clock_offset_ms: int, symbols_info: List[models.SymbolInfo],
+                 my_trades: list, open_orders: Dict[int, models.Order],
+                 created_orders: List[Tuple[str, str, float]] = None):
+        self.saved_at_ms = saved_at_ms
+        self.clock_offset_ms = clock_offset_ms
+        self.symbols_info = symbols_info
+        self.my_trades = my_trades  # [(symbol, entry)] in the LRU order of services.trades_cache
+        self.open_orders = open_orders
+        self.created_orders = created_orders if created_orders else []  # (symbol, side, price) sent after the fetch
+
+    def age_sec(self) -> float:
+        return max(0.0, time.time() - self.saved_at_ms / 1000)
+
+    def to_payload(self) -> dict:
+        return {
+            "saved_at_ms": self.saved_at_ms,
+            "clock_offset_ms": self.clock_offset_ms,
+            "symbols_info": _pack_models(self.symbols_info or []),
+            "my_trades": list(self.my_trades or []),
+            "open_orders": _pack_models(list((self.open_orders or {}).values())),
+            "created_orders": list(self.created_orders),
+        }
+
+    @staticmethod
+    def from_payload(payload: dict) -> "WorkerCheckpoint":
+        open_orders = _unpack_models(models.Order, payload["open_orders"])
+        return WorkerCheckpoint(
+            saved_at_ms=payload["saved_at_ms"],
+            clock_offset_ms=payload["clock_offset_ms"],
+            symbols_info=_unpack_models(models.SymbolInfo, payload["symbols_info"]),
+            my_trades=[(symbol, entry) for symbol, entry in payload["my_trades"]],
+            open_orders={order.order_id: order for order in open_orders},
+            created_orders=[tuple(item) for item in payload["created_orders"]],
+        )
+
+
+def dumps(checkpoint: WorkerCheckpoint) -> bytes:
+    payload = pickle.dumps(checkpoint.to_payload(), protocol=pickle.HIGHEST_PROTOCOL)
+    return _HEADER.pack(MAGIC, VERSION, len(payload), zlib.crc32(payload)) + payload
+
+
+def loads(data: bytes) -> WorkerCheckpoint:
+    if len(data) < _HEADER.size:
+        raise CheckpointError("Checkpoint is truncated: {} bytes".format(len(data)))
+    magic, version, length, crc = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise CheckpointError("Not a checkpoint file")
+    if version != VERSION:
+        raise CheckpointError("Checkpoint version {} isn't supported, expected {}".format(version, VERSION))
+    payload = data[_HEADER.size:]
+    if len(payload) != length:
+        raise CheckpointError("Checkpoint is truncated: {} of {} payload bytes".format(len(payload), length))
+    if zlib.crc32(payload) != crc:
+        raise CheckpointError("Checkpoint crc mismatch")
+    try:
+        return WorkerCheckpoint.from_payload(_PlainUnpickler(io.BytesIO(payload)).load())
+    except (pickle.UnpicklingError, KeyError, TypeError, ValueError) as ex:
+        raise CheckpointError("Checkpoint payload is invalid: {}".format(ex))
+
+
+def save(path: str, checkpoint: WorkerCheckpoint) -> bool:
+    """
+    Written to a temporary file and renamed over the old one, so a crash leaves either the old or the new checkpoint
+    """
+    if not path:
+        return False
+    tmp_path = path + ".tmp"
+    try:
+        data = dumps(checkpoint)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _written_counter.inc()
+        LOG.debug("Checkpoint of {} bytes has written to {}".format(len(data), path))
+        return True
+    except Exception as ex:
+        LOG.error("Error fired in {} with:{}".format(LOG.func_name(), ex.args[-1]))
+        return False
+
+
+def load(path: str) -> WorkerCheckpoint:
+    """
+    :return: None if there is no checkpoint or it is damaged, the worker does the cold sync then
+    """
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            checkpoint = loads(f.read())
+    except Exception as ex:
+        _rejected_counter.inc()
+        LOG.error("Error fired in {} with:{}. Start without checkpoint".format(LOG.func_name(), ex.args[-1]))
+        return None
+    _loaded_counter.inc()
+    return checkpoint
+
+
+if __name__ == '__main__':
+    import tempfile
+    demo = WorkerCheckpoint(
+        saved_at_ms=int(time.time() * 1000),
+        clock_offset_ms=-120,
+        symbols_info=[models.SymbolInfo("ETHBTC", "TRADING", "ETH", "BTC", 0.000001, 100000.0, 0.000001,
+                                        0.001, 100000.0, 0.001, 0.001)],
+        my_trades=[("ETHBTC", {"last_trade": {"id": 1, "price": "0.07", "time": 0}, "balance": 1.0})],
+        open_orders={1: models.Order("ETHBTC", 1, "BUY", "LIMIT", 0.069, 1.0, 0.0)},
+    )
+    demo_path = os.path.join(tempfile.gettempdir(), "worker_checkpoint_demo.bin")
+    save(demo_path, demo)
+    restored = load(demo_path)
+    LOG.info("Restored checkpoint: {} symbols, {} trades, {} open orders, clock offset {} ms".format(
+        len(restored.symbols_info), len(restored.my_trades), len(restored.open_orders), restored.clock_offset_ms))
@@ -0,0 +1,117 @@
+import math
+from typing import Dict, List
+from logger import logger
+from core import metrics
+from services import models
+
+LOG = logger.LOG
+
+BUSY_FACTOR = 0.5
+QUIET_FACTOR = 1.5
+# Share of our BUY orders outbid by the market which makes the cycle busy
+OFF_MARKET_BUSY_SHARE = 0.5
+# The worker isn't busy with its own cycles more than a half of the time
+CYCLE_COST_FACTOR = 2.0
+
+
+class CycleInputs(object):
+    """
+    What the worker has seen in the last cycle, the policy decides the next interval by it
+    """
+    __slots__ = ("move_percent", "elapsed_sec", "orders_total", "orders_off_market", "cycle_sec", "cycle_weight",
+                 "reprice_weight_per_min")
+
+    def __init__(self, move_percent: float = 0.0, elapsed_sec: float = 0.0, orders_total: int = 0,
+                 orders_off_market: int = 0, cycle_sec: float = 0.0, cycle_weight: int = 0,
+                 reprice_weight_per_min: float = 0.0):
+        self.move_percent = move_percent
+        self.elapsed_sec = elapsed_sec
+        self.orders_total = orders_total
+        self.orders_off_market = orders_off_market
+        self.cycle_sec = cycle_sec
+        self.cycle_weight = cycle_weight
+        self.reprice_weight_per_min = reprice_weight_per_min
+
+
+def price_moves_percent(prev_prices: Dict[str, float], tickers: List[models.Ticker],
+                        percentile: float = 90) -> float:
+    """
+    :return: the percentile of absolute last price changes of the symbols known in both snapshots, in percent
+    """
+    moves = []
+    for ticker in tickers:
+        prev_price = prev_prices.get(ticker.symbol)
+        if prev_price and ticker.last_price > 0:
+            moves.append(abs(ticker.last_price / prev_price - 1) * 100)
+    if not moves:
+        return 0.0
+    moves.sort()
+    return moves[min(len(moves) - 1, int(len(moves) * percentile / 100))]
+
+
+def off_market_orders(open_orders_buy: List[models.Order], tickers_by_symbol: Dict[str, models.Ticker]) -> int:
+    # Our BUY order below the best bid has been outbid, it waits for nothing
+    res = 0
+    for order in open_orders_buy:
+        ticker = tickers_by_symbol.get(order.symbol)
+        if ticker and order.price < ticker.bid_price:
+            res += 1
+    return res
+
+
+class CyclePolicy(object):
+    """
+    Interval between the worker cycles: shorter when prices move or our orders are outbid, longer when the market
+    is quiet, never shorter than the cycle cost and the request weight budget allow.
+    :param schedule_settings: core.config.ScheduleSettings
+    """
+
+    def __init__(self, schedule_settings, initial_interval_sec: float):
+        self._settings = schedule_settings
+        self.interval_sec = min(max(initial_interval_sec, schedule_settings.min_interval_sec),
+                                schedule_settings.max_interval_sec)
+        self._interval_gauge = metrics.gauge("schedule.interval_sec")
+
+    def next_interval(self, inputs: CycleInputs) -> float:
+        settings = self._settings
+        # Prices walk randomly, so the move over the elapsed time is scaled to a minute by its square root
+        move_per_min = inputs.move_percent / math.sqrt(inputs.elapsed_sec / 60) if inputs.elapsed_sec > 0 else 0.0
+        off_market_share = inputs.orders_off_market / inputs.orders_total if inputs.orders_total else 0.0
+        if move_per_min >= settings.busy_move_percent or off_market_share >= OFF_MARKET_BUSY_SHARE:
+            reason = "busy"
+            interval_sec = self.interval_sec * BUSY_FACTOR
+        elif inputs.elapsed_sec > 0 and move_per_min <= settings.quiet_move_percent and not inputs.orders_off_market:
+            reason = "quiet"
+            interval_sec = self.interval_sec * QUIET_FACTOR
+        else:
+            reason = "steady"
+            interval_sec = self.interval_sec
+        interval_sec = min(max(interval_sec, settings.min_interval_sec), settings.max_interval_sec)
+        cost_floor_sec = inputs.cycle_sec * CYCLE_COST_FACTOR
+        if interval_sec < cost_floor_sec:
+            interval_sec = cost_floor_sec
+            reason += ", cycle cost"
+        budget_per_min = settings.weight_limit_per_min * settings.weight_budget_share - inputs.reprice_weight_per_min
+        weight_floor_sec = 60 * inputs.cycle_weight / budget_per_min if budget_per_min > 0 \
+            else settings.max_interval_sec
+        if interval_sec < weight_floor_sec:
+            interval_sec = weight_floor_sec
+            reason += ", weight budget"
+        LOG.info("Next cycle in {:.0f} sec ({}). Move {:.2f}% in {:.0f} sec ({:.2f}%/min), off-market orders {}/{}, "
+                 "cycle {:.1f} sec and weight {}, re-pricing weight {:.0f}/min, budget {:.0f}/min".format(
+                     interval_sec, reason, inputs.move_percent, inputs.elapsed_sec, move_per_min,
+                     inputs.orders_off_market, inputs.orders_total, inputs.cycle_sec, inputs.cycle_weight,
+                     inputs.reprice_weight_per_min, budget_per_min))
+        self.interval_sec = interval_sec
+        self._interval_gauge.set(round(interval_sec, 1))
+        return interval_sec
+
+
+if __name__ == '__main__':
+    from core import config as cfg
+    policy = CyclePolicy(cfg.global_settings.schedule, cfg.global_settings.exchange.awake_timeout_sec)
+    policy.next_interval(CycleInputs(move_percent=0.05, elapsed_sec=300, cycle_sec=4, cycle_weight=120))
+    policy.next_interval(CycleInputs(move_percent=2.0, elapsed_sec=450, orders_total=10, orders_off_market=6,
+                                     cycle_sec=4, cycle_weight=120))
+    policy.next_interval(CycleInputs(move_percent=1.5, elapsed_sec=225, orders_total=10, orders_off_market=2,
+                                     cycle_sec=4, cycle_weight=400, reprice_weight_per_min=200))
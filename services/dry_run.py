@@ -0,0 +1,122 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+from logger import logger
+from services import models
+from services import order_reconciler
+
+LOG = logger.LOG
+
+
+class TestOrderResult(object):
+    __slots__ = ("intent", "ok", "latency_ms", "error")
+
+    def __init__(self, intent: order_reconciler.OrderIntent, ok: bool, latency_ms: float, error=None):
+        self.intent = intent
+        self.ok = ok
+        self.latency_ms = latency_ms
+        self.error = error
+
+    def to_dict(self) -> dict:
+        return {
+            "symbol": self.intent.symbol,
+            "side": self.intent.side,
+            "type": self.intent.order_type,
+            "quantity": self.intent.quantity,
+            "price": self.intent.price,
+            "time_in_force": self.intent.time_in_force,
+            "ok": self.ok,
+            "latency_ms": round(self.latency_ms, 2),
+            "error": self.error,
+        }
+
+
+def send_test_orders(send_func: Callable[[order_reconciler.OrderIntent], dict],
+                     intents: List[order_reconciler.OrderIntent],
+                     max_concurrent: int = None) -> List[TestOrderResult]:
+    """
+    Sends all intents to the test order endpoint at once, the blocking client calls run in threads.
+    :param send_func: intent -> parsed json answer or None, e.g. ApiWrapperMain.create_test_order
+    :param max_concurrent: cap of requests in flight, all of the intents if None or 0
+    :return: results in the order of the intents
+    """
+    def _send(intent: order_reconciler.OrderIntent) -> TestOrderResult:
+        started = time.perf_counter()
+        try:
+            res = send_func(intent)
+        except Exception as ex:
+            return TestOrderResult(intent, False, (time.perf_counter() - started) * 1000, repr(ex))
+        latency_ms = (time.perf_counter() - started) * 1000
+        if res is None:
+            return TestOrderResult(intent, False, latency_ms, "no answer")
+        if "code" in res or "msg" in res:
+            return TestOrderResult(intent, False, latency_ms, "{}:{}".format(res.get("code"), res.get("msg")))
+        return TestOrderResult(intent, True, latency_ms)
+
+    if not intents:
+        return []
+    workers = min(len(intents), max_concurrent) if max_concurrent else len(intents)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dry-run") as executor:
+        return list(executor.map(_send, intents))
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+class CycleReport(object):
+    """
+    What a dry run cycle would have done on the exchange and how long its parts took
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.phases_ms: Dict[str, float] = {}
+        self.cancels: List[models.Order] = []
+        self.results: List[TestOrderResult] = []
+        self.test_orders_ms = 0.0
+        self.total_ms = 0.0
+        self.error: str = None
+
+    def add_phase(self, name: str, duration_sec: float):
+        self.phases_ms[name] = self.phases_ms.get(name, 0.0) + duration_sec * 1000
+
+    def finish(self):
+        self.total_ms = (time.perf_counter() - self._started) * 1000
+
+    def to_dict(self) -> dict:
+        latencies = [result.latency_ms for result in self.results]
+        return {
+            "started_at": round(self.started_at, 3),
+            "total_ms": round(self.total_ms, 2),
+            "pipeline_ms": round(self.total_ms - self.test_orders_ms, 2),
+            "phases_ms": {name: round(value, 2) for name, value in self.phases_ms.items()},
+            "test_orders_ms": round(self.test_orders_ms, 2),
+            "test_order_latency_ms": {"p50": round(_percentile(latencies, 50), 2),
+                                      "p95": round(_percentile(latencies, 95), 2),
+                                      "max": round(max(latencies) if latencies else 0.0, 2)},
+            "orders": len(self.results),
+            "orders_rejected": sum(1 for result in self.results if not result.ok),
+            "would_place": [result.to_dict() for result in self.results],
+            "would_cancel": [{"symbol": order.symbol, "order_id": order.order_id, "side": order.side,
+                              "price": order.price, "remaining_qty": order.remaining_qty} for order in self.cancels],
+            "error": self.error,
+        }
+
+    def write(self, path: str):
+        report = self.to_dict()
+        LOG.info("Dry run cycle: {} ms (pipeline {} ms, test orders {} ms), orders:{} rejected:{} cancels:{}".format(
+            report["total_ms"], report["pipeline_ms"], report["test_orders_ms"], report["orders"],
+            report["orders_rejected"], len(report["would_cancel"])))
+        if not path:
+            return
+        try:
+            with open(path, "a") as f:
+                f.write(json.dumps(report) + "\n")
+        except Exception as ex:
+            LOG.error("Error fired in {} with:{}".format(LOG.func_name(), ex.args[-1]))
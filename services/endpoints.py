@@ -0,0 +1,162 @@
+import hashlib
+import hmac
+from typing import Callable, Dict, Tuple
+from logger import logger
+from core import config as cfg
+from core import metrics
+
+LOG = logger.LOG
+
+GET = "GET"
+POST = "POST"
+DELETE = "DELETE"
+
+_weight_counter = metrics.counter("rest.weight")
+
+
+def _decimal(value) -> str:
+    # Prices and quantities are always sent in the fixed point form, str() may give 1e-05
+    return "{:.8f}".format(value)
+
+
+class Param(object):
+    """
+    :param name: name of the param in the query
+    :param fmt: turns the value into the query string, str by default
+    """
+    __slots__ = ("name", "required", "fmt")
+
+    def __init__(self, name: str, required: bool = False, fmt: Callable = str):
+        self.name = name
+        self.required = required
+        self.fmt = fmt
+
+
+def required(name: str, fmt: Callable = str) -> Param:
+    return Param(name, True, fmt)
+
+
+def optional(name: str, fmt: Callable = str) -> Param:
+    return Param(name, False, fmt)
+
+
+class Endpoint(object):
+    """
+    One REST endpoint of the exchange. The name is also the name of its timeouts, see core.config.TimeoutSettings.
+    :param weight: request weight as the exchange counts it against the per minute limit
+    :param weight_all: weight without the optional symbol param, when the endpoint answers for all of the symbols
+    """
+    __slots__ = ("name", "method", "path", "weight", "weight_all", "signed", "params", "_spec")
+
+    def __init__(self, name: str, method: str, path: str, weight: int, signed: bool = False,
+                 params: Tuple[Param, ...] = (), weight_all: int = None):
+        if name not in cfg.ENDPOINTS:
+            raise ValueError("Endpoint {} has no timeouts in core.config.ENDPOINTS".format(name))
+        self.name = name
+        self.method = method
+        self.path = path
+        self.weight = weight
+        self.weight_all = weight_all if weight_all else weight
+        self.signed = signed
+        self.params = params
+        # Compiled once: the query prefix, formatter and mandatory flag of every param in the order of the query
+        self._spec = tuple((param.name, param.name + "=", param.fmt, param.required) for param in params)
+
+    def query(self, params: dict) -> str:
+        """
+        Optional params set to None are skipped, 0 is a value. The params not known by the endpoint are ignored
+        """
+        parts = []
+        for name, prefix, fmt, is_required in self._spec:
+            value = params.get(name)
+            if value is None:
+                if is_required:
+                    raise ValueError("Did't got {} param".format(name))
+                continue
+            parts.append(prefix + fmt(value))
+        return "&".join(parts)
+
+    def weight_of(self, params: dict) -> int:
+        return self.weight if params.get("symbol") else self.weight_all
+
+
+_ORDER_PARAMS = (
+    required("symbol"), required("side"), required("type"), required("quantity", _decimal), required("timestamp"),
+    optional("timeInForce"), optional("price", _decimal), optional("newClientOrderId"),
+    optional("stopPrice", _decimal), optional("icebergQty", _decimal), optional("newOrderRespType"),
+    optional("recvWindow"),
+)
+
+ENDPOINTS: Dict[str, Endpoint] = {endpoint.name: endpoint for endpoint in (
+    Endpoint("ping", GET, "/api/v1/ping", 1),
+    Endpoint("server_time", GET, "/api/v1/time", 1),
+    Endpoint("exchange_info", GET, "/api/v1/exchangeInfo", 10),
+    Endpoint("order_book", GET, "/api/v1/depth", 1, params=(required("symbol"), optional("limit"))),
+    Endpoint("trades", GET, "/api/v1/trades", 1, params=(required("symbol"), optional("limit"))),
+    Endpoint("agg_trades", GET, "/api/v1/aggTrades", 1, params=(
+        required("symbol"), optional("fromId"), optional("startTime"), optional("endTime"), optional("limit"))),
+    Endpoint("klines", GET, "/api/v1/klines", 1, params=(
+        required("symbol"), required("interval"), optional("startTime"), optional("endTime"), optional("limit"))),
+    Endpoint("ticker_24h", GET, "/api/v1/ticker/24hr", 1, params=(optional("symbol"),), weight_all=40),
+    Endpoint("book_ticker", GET, "/api/v3/ticker/bookTicker", 1, params=(optional("symbol"),), weight_all=2),
+    Endpoint("new_order", POST, "/api/v3/order", 1, signed=True, params=_ORDER_PARAMS),
+    Endpoint("test_order", POST, "/api/v3/order/test", 1, signed=True, params=_ORDER_PARAMS),
+    Endpoint("open_orders", GET, "/api/v3/openOrders", 1, signed=True, params=(
+        required("timestamp"), optional("symbol"), optional("recvWindow")), weight_all=40),
+    Endpoint("cancel_order", DELETE, "/api/v3/order", 1, signed=True, params=(
+        required("timestamp"), required("symbol"), optional("orderId"), optional("origClientOrderId"),
+        optional("newClientOrderId"), optional("recvWindow"))),
+    Endpoint("account", GET, "/api/v3/account", 5, signed=True, params=(
+        required("timestamp"), optional("recvWindow"))),
+    Endpoint("my_trades", GET, "/api/v3/myTrades", 5, signed=True, params=(
+        required("symbol"), required("timestamp"), optional("recvWindow"), optional("limit"), optional("fromId"))),
+)}
+
+
+def count_weight(endpoint: Endpoint, params: dict):
+    _weight_counter.inc(endpoint.weight_of(params))
+
+
+def weight_used() -> int:
+    """
+    Request weight spent since the start by all of the clients, the only source of it for the budget of the worker
+    """
+    return _weight_counter.value
+
+
+class RequestBuilder(object):
+    """
+    Path with the query and the headers of a request, signed for the signed endpoints.
+    Shared by the sync and the async clients, so every request of both of them goes through build().
+    """
+
+    def __init__(self, api_key: str = None, secret_key: str = None):
+        self._headers = {"X-MBX-APIKEY": api_key} if api_key else None
+        # The key pads of HMAC are computed once, every signature starts from a copy
+        self._signer = hmac.new(secret_key.encode(), digestmod=hashlib.sha256) if secret_key else None
+
+    def build(self, endpoint: Endpoint, params: dict) -> Tuple[str, dict]:
+        query = endpoint.query(params)
+        count_weight(endpoint, params)
+        if not endpoint.signed:
+            return (endpoint.path + "?" + query if query else endpoint.path), None
+        if not self._headers:
+            raise ValueError("Did't got api key from config")
+        if not self._signer:
+            raise ValueError("Did't got secret key from config")
+        signer = self._signer.copy()
+        signer.update(query.encode())
+        return endpoint.path + "?" + query + "&signature=" + signer.hexdigest(), self._headers
+
+
+if __name__ == '__main__':
+    builder = RequestBuilder("demo-api-key", "demo-secret")
+    for demo_name, demo_params in (
+            ("ticker_24h", {"symbol": "ETHBTC"}),
+            ("klines", {"symbol": "ETHBTC", "interval": "1m", "limit": 500}),
+            ("new_order", {"symbol": "ETHBTC", "side": "BUY", "type": "STOP_LOSS_LIMIT", "quantity": 0.00001,
+                           "timestamp": 1499827319559, "price": 0.069, "stopPrice": 0.07, "timeInForce": "GTC"}),
+    ):
+        demo_endpoint = ENDPOINTS[demo_name]
+        LOG.info("{} {} weight {}".format(demo_endpoint.method, builder.build(demo_endpoint, demo_params)[0],
+                                          demo_endpoint.weight_of(demo_params)))
@@ -7,5 +7,17 @@ class IExchangeBase(object):
     def run_worker(self):
         pass
 
+    def run_reprice(self):
+        # Optional fast path between run_worker calls
+        pass
+
+    def next_awake_timeout_sec(self, default_sec: float) -> float:
+        # Interval before the next run_worker call
+        return default_sec
+
+    def save_state(self):
+        # Optional checkpoint of the worker state for the warm restart
+        pass
+
     def release(self):
         pass
\ No newline at end of file
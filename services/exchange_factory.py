@@ -1,7 +1,6 @@
 from enum import Enum
 from logger import logger
 from services import exchange_base
-from services import binance_worker
 
 LOG = logger.LOG
 
@@ -13,8 +12,10 @@ class Exchanges(Enum):
 
 class ExchangeFactory(object):
     @staticmethod
-    def create_exchange(exchange: Exchanges, config) -> exchange_base.IExchangeBase:
+    def create_exchange(exchange: Exchanges, config, settings=None) -> exchange_base.IExchangeBase:
         if exchange == Exchanges.BINANCE:
-            return binance_worker.BinanceWorker(config=config)
+            # The worker pulls the http client in, so it is imported only when it's really created
+            from services import binance_worker
+            return binance_worker.BinanceWorker(config=config, settings=settings)
         elif exchange == Exchanges.BITFINEX:
             pass
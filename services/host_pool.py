@@ -0,0 +1,118 @@
+import asyncio
+import time
+from typing import Dict, List, Tuple
+from logger import logger
+from core import global_event_loop as gloop
+from core import metrics
+
+LOG = logger.LOG
+
+GROUP_PROBE = "host_probe"
+
+_best_host_gauge = metrics.gauge("host_pool.best_host")
+
+
+class HostStats(object):
+    def __init__(self, host: str):
+        self.host = host
+        self.latency_ewma: float = None  # None until the first successful request
+        self.error_rate_ewma = 0.0
+        self.down_until = 0.0
+        self.latency_gauge = metrics.gauge("host_pool.latency_ms.{}".format(host))
+        self.error_rate_gauge = metrics.gauge("host_pool.error_rate.{}".format(host))
+
+
+class HostPool(object):
+    """
+    Equivalent base urls of the exchange. Keeps an EWMA of latency and error rate of every host and
+    routes requests to the fastest healthy one. A host whose error rate exceeds max_error_rate is skipped
+    for cooldown_sec. Hosts without measurements keep the config order.
+    """
+
+    def __init__(self, hosts: List[str], alpha: float = 0.3, max_error_rate: float = 0.5, cooldown_sec: float = 30):
+        if not hosts:
+            raise ValueError("Did't got hosts param")
+        self._alpha = alpha
+        self._max_error_rate = max_error_rate
+        self._cooldown_sec = cooldown_sec
+        self._stats: List[HostStats] = [HostStats(host) for host in hosts]
+        self._stats_by_host: Dict[str, HostStats] = {stats.host: stats for stats in self._stats}
+        self._probe_task: asyncio.Task = None
+
+    @property
+    def hosts(self) -> List[str]:
+        return [stats.host for stats in self._stats]
+
+    def best_host(self) -> str:
+        return self.hosts_by_preference()[0]
+
+    def hosts_by_preference(self) -> List[str]:
+        """
+        Healthy hosts from the fastest, then the hosts in cooldown from the least failing, for failover
+        """
+        now = time.monotonic()
+        healthy = [stats for stats in self._stats if stats.down_until <= now]
+        down = [stats for stats in self._stats if stats.down_until > now]
+        healthy.sort(key=lambda stats: (stats.latency_ewma is None, stats.latency_ewma or 0))
+        down.sort(key=lambda stats: stats.error_rate_ewma)
+        return [stats.host for stats in healthy + down]
+
+    def report(self, host: str, latency_sec: float, ok: bool):
+        stats = self._stats_by_host.get(host)
+        if stats is None:
+            return
+        alpha = self._alpha
+        stats.error_rate_ewma = (1 - alpha) * stats.error_rate_ewma + alpha * (0.0 if ok else 1.0)
+        stats.error_rate_gauge.set(round(stats.error_rate_ewma, 3))
+        if ok:
+            if stats.latency_ewma is None:
+                stats.latency_ewma = latency_sec
+            else:
+                stats.latency_ewma = (1 - alpha) * stats.latency_ewma + alpha * latency_sec
+            stats.latency_gauge.set(round(stats.latency_ewma * 1000, 1))
+        elif stats.error_rate_ewma > self._max_error_rate and stats.down_until <= time.monotonic():
+            stats.down_until = time.monotonic() + self._cooldown_sec
+            LOG.warning("Host {} is unhealthy, error rate:{:.2f}. Skip it for {} sec"
+                        .format(host, stats.error_rate_ewma, self._cooldown_sec))
+
+    async def probe(self, ping_func):
+        """
+        :param ping_func: async ping_func(host), gives a true value if the host has answered
+        """
+
+        async def _probe_host(host: str):
+            started = time.monotonic()
+            try:
+                ok = bool(await ping_func(host))
+            except Exception as ex:
+                LOG.debug("Probe of host {} has failed with:{}".format(host, repr(ex)))
+                ok = False
+            self.report(host, time.monotonic() - started, ok)
+
+        await asyncio.gather(*[_probe_host(host) for host in self.hosts])
+        best_host = self.best_host()
+        if _best_host_gauge.value != best_host:
+            LOG.info("Best exchange host: {}".format(best_host))
+        _best_host_gauge.set(best_host)
+
+    def start_probing(self, ping_func, interval_sec: float) -> asyncio.Task:
+        async def _async_probe_loop():
+            while True:
+                await self.probe(ping_func)
+                await asyncio.sleep(interval_sec)
+
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = gloop.push_group_task(GROUP_PROBE, None, _async_probe_loop)
+        return self._probe_task
+
+
+# Clients of one process share the statistics of the same hosts
+_pools: Dict[Tuple[str, ...], HostPool] = {}
+
+
+def pool_for_hosts(hosts: Tuple[str, ...]) -> HostPool:
+    pool = _pools.get(hosts)
+    if pool is None:
+        pool = HostPool(list(hosts))
+        _pools[hosts] = pool
+    return pool
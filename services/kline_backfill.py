@@ -0,0 +1,277 @@
+import asyncio
+import json
+import os
+from array import array
+from typing import Dict, List, Tuple
+from logger import logger
+from core import config as cfg
+from utils import rate_limiter
+from utils import utc_timestamp as tm
+from services import binance_rest_api_async as api_async
+
+LOG = logger.LOG
+
+KLINES_PAGE_LIMIT = 500
+
+_MINUTE_MS = 60 * 1000
+_HOUR_MS = 60 * _MINUTE_MS
+_DAY_MS = 24 * _HOUR_MS
+
+# Length of one candle in ms. A month is taken with its max length, so a page window never
+# holds more than KLINES_PAGE_LIMIT candles.
+INTERVAL_MS: Dict[str, int] = {
+    api_async.BinanceApiEnums.KLINE_INTERVAL_1MINUTE: _MINUTE_MS,
+    api_async.BinanceApiEnums.KLINE_INTERVAL_3MINUTE: 3 * _MINUTE_MS,
+    api_async.BinanceApiEnums.KLINE_INTERVAL_5MINUTE: 5 * _MINUTE_MS,
+    api_async.BinanceApiEnums.KLINE_INTERVAL_15MINUTE: 15 * _MINUTE_MS,
+    api_async.BinanceApiEnums.KLINE_INTERVAL_30MINUTE: 30 * _MINUTE_MS,
+    api_async.BinanceApiEnums.KLINE_INTERVAL_1HOUR: _HOUR_MS,
+    api_async.BinanceApiEnums.KLINE_INTERVAL_2HOUR: 2 * _HOUR_MS,
+    api_async.BinanceApiEnums.KLINE_INTERVAL_4HOUR: 4 * _HOUR_MS,
+    api_async.BinanceApiEnums.KLINE_INTERVAL_6HOUR: 6 * _HOUR_MS,
+    api_async.BinanceApiEnums.KLINE_INTERVAL_8HOUR: 8 * _HOUR_MS,
+    api_async.BinanceApiEnums.KLINE_INTERVAL_12HOUR: 12 * _HOUR_MS,
+    api_async.BinanceApiEnums.KLINE_INTERVAL_1DAY: _DAY_MS,
+    api_async.BinanceApiEnums.KLINE_INTERVAL_3DAY: 3 * _DAY_MS,
+    api_async.BinanceApiEnums.KLINE_INTERVAL_1WEEK: 7 * _DAY_MS,
+    api_async.BinanceApiEnums.KLINE_INTERVAL_1MONTH: 31 * _DAY_MS,
+}
+
+# (column name, array typecode, index in the raw kline list)
+CANDLE_COLUMNS: List[Tuple[str, str, int]] = [
+    ("open_time", "q", 0),
+    ("open", "d", 1),
+    ("high", "d", 2),
+    ("low", "d", 3),
+    ("close", "d", 4),
+    ("volume", "d", 5),
+    ("close_time", "q", 6),
+    ("quote_volume", "d", 7),
+    ("trades", "q", 8),
+]
+
+
+class Candles(object):
+    """
+    Columnar candle series. Every column is an array.array with the same length,
+    ordered by open_time. Files written by CandleStore can be mapped with numpy.fromfile too.
+    """
+
+    def __init__(self, columns: Dict[str, array] = None):
+        if columns is None:
+            columns = {name: array(typecode) for name, typecode, _ in CANDLE_COLUMNS}
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns["open_time"])
+
+    def __getattr__(self, item):
+        try:
+            return self.__dict__["columns"][item]
+        except KeyError:
+            raise AttributeError(item)
+
+    def last_open_time(self) -> int:
+        open_time = self.columns["open_time"]
+        return open_time[-1] if open_time else None
+
+    def append_raw(self, raw_klines: List[list]):
+        for name, typecode, idx in CANDLE_COLUMNS:
+            column = self.columns[name]
+            if typecode == "d":
+                column.extend(float(kline[idx]) for kline in raw_klines)
+            else:
+                column.extend(int(kline[idx]) for kline in raw_klines)
+
+
+class CandleStore(object):
+    """
+    Append-only per-symbol, per-interval column files: <root>/<SYMBOL>/<interval>/<column>.bin
+    """
+
+    def __init__(self, root_dir: str):
+        if not root_dir:
+            raise ValueError("Did't got root dir for candle store")
+        self._root = root_dir
+
+    def _series_dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self._root, symbol, interval)
+
+    def load(self, symbol: str, interval: str) -> Candles:
+        candles = Candles()
+        series_dir = self._series_dir(symbol, interval)
+        if not os.path.isdir(series_dir):
+            return candles
+        for name, typecode, _ in CANDLE_COLUMNS:
+            path = os.path.join(series_dir, name + ".bin")
+            if not os.path.exists(path):
+                return Candles()
+            column = candles.columns[name]
+            with open(path, "rb") as f:
+                column.frombytes(f.read())
+        # Columns can differ in length after an interrupted append. Keep only complete rows.
+        rows = min(len(column) for column in candles.columns.values())
+        for name, column in candles.columns.items():
+            if len(column) > rows:
+                del column[rows:]
+        return candles
+
+    @staticmethod
+    def _rows(series_dir: str) -> int:
+        rows = None
+        for name, typecode, _ in CANDLE_COLUMNS:
+            path = os.path.join(series_dir, name + ".bin")
+            if not os.path.exists(path):
+                return None
+            column_rows = os.path.getsize(path) // array(typecode).itemsize
+            rows = column_rows if rows is None else min(rows, column_rows)
+        return rows
+
+    def last_open_time(self, symbol: str, interval: str) -> int:
+        # Reads only the tail of open_time column instead of loading the whole series
+        series_dir = self._series_dir(symbol, interval)
+        rows = self._rows(series_dir)
+        if not rows:
+            return None
+        open_time = array("q")
+        with open(os.path.join(series_dir, "open_time.bin"), "rb") as f:
+            f.seek((rows - 1) * open_time.itemsize)
+            open_time.frombytes(f.read(open_time.itemsize))
+        return open_time[0]
+
+    def _repair(self, symbol: str, interval: str):
+        """
+        Columns of unequal length are left by an interrupted append, they are cut to the complete rows.
+        A series without one of the columns can't be restored, it is moved aside and fetched again from scratch.
+        """
+        series_dir = self._series_dir(symbol, interval)
+        paths = [(os.path.join(series_dir, name + ".bin"), array(typecode).itemsize)
+                 for name, typecode, _ in CANDLE_COLUMNS]
+        missing = [path for path, _ in paths if not os.path.exists(path)]
+        if len(missing) == len(paths):
+            return
+        if missing:
+            corrupt_dir = "{}.corrupt.{}".format(series_dir, tm.utc_timestamp())
+            LOG.error("Candle series {} {} has no {} columns. Moved to {}, it will be rebuilt".format(
+                symbol, interval, [os.path.basename(path) for path in missing], corrupt_dir))
+            os.replace(series_dir, corrupt_dir)
+            return
+        rows = self._rows(series_dir)
+        torn = [(path, itemsize) for path, itemsize in paths if os.path.getsize(path) != rows * itemsize]
+        if torn:
+            LOG.warning("Candle series {} {} has columns of unequal length {}. Cut to {} complete rows".format(
+                symbol, interval, [os.path.basename(path) for path, _ in torn], rows))
+        for path, itemsize in torn:
+            with open(path, "r+b") as f:
+                f.truncate(rows * itemsize)
+
+    def append(self, symbol: str, interval: str, raw_klines: List[list]) -> int:
+        if not raw_klines:
+            return 0
+        self._repair(symbol, interval)
+        last_open_time = self.last_open_time(symbol, interval)
+        if last_open_time is not None:
+            raw_klines = [kline for kline in raw_klines if kline[0] > last_open_time]
+            if not raw_klines:
+                return 0
+        chunk = Candles()
+        chunk.append_raw(raw_klines)
+        series_dir = self._series_dir(symbol, interval)
+        os.makedirs(series_dir, exist_ok=True)
+        for name, column in chunk.columns.items():
+            with open(os.path.join(series_dir, name + ".bin"), "ab") as f:
+                column.tofile(f)
+        return len(chunk)
+
+
+class KlineBackfill(object):
+    """
+    Splits [start_time, end_time] into page sized windows, fetches them concurrently through
+    the async client and merges closed candles into the CandleStore.
+    """
+
+    def __init__(self, config, api: api_async.BinanceRestApi = None, store: CandleStore = None,
+                 settings: cfg.BackfillSettings = None):
+        if not config:
+            raise ValueError("Did't got correct config")
+        settings = settings if settings else cfg.BackfillSettings.from_parser(config)
+        self._api = api if api else api_async.BinanceRestApi(config)
+        self._store = store if store else CandleStore(settings.klines_dir)
+        self._page_limit = settings.klines_page_limit
+        self._semaphore = asyncio.Semaphore(settings.max_concurrent_requests)
+        self._limiter = rate_limiter.RateLimiter(settings.requests_per_sec)
+
+    @property
+    def store(self) -> CandleStore:
+        return self._store
+
+    def split_windows(self, interval: str, start_time: int, end_time: int) -> List[Tuple[int, int]]:
+        step = INTERVAL_MS.get(interval)
+        if not step:
+            raise ValueError("Unknown kline interval: {}".format(interval))
+        page_ms = step * self._page_limit
+        windows = []
+        window_start = start_time
+        while window_start <= end_time:
+            window_end = min(window_start + page_ms - 1, end_time)
+            windows.append((window_start, window_end))
+            window_start = window_end + 1
+        return windows
+
+    async def _fetch_window(self, symbol: str, interval: str, window: Tuple[int, int]) -> List[list]:
+        async with self._semaphore:
+            await self._limiter.acquire()
+            task = self._api.fetch_klines(
+                None, symbol, interval, start_time=window[0], end_time=window[1], limit=self._page_limit)
+            if not task:
+                return None
+            res = await task
+        if res is None:
+            return None
+        parsed = json.loads(res)
+        if not isinstance(parsed, list):
+            LOG.error("Error with klines window {} for {}: {}".format(window, symbol, parsed))
+            return None
+        return parsed
+
+    async def backfill(self, symbol: str, interval: str, start_time: int, end_time: int = None) -> int:
+        now = tm.utc_timestamp()
+        end_time = min(end_time, now) if end_time else now
+        windows = self.split_windows(interval, start_time, end_time)
+        if not windows:
+            return 0
+        LOG.debug("Backfill klines for {} {} with {} windows".format(symbol, interval, len(windows)))
+        pages = await asyncio.gather(*[self._fetch_window(symbol, interval, window) for window in windows])
+        merged: List[list] = []
+        for window, page in zip(windows, pages):
+            if page is None:
+                # Never store past a hole: the next top_up continues from the last stored candle
+                LOG.error("Klines window {} for {} {} has failed. Stop merge".format(window, symbol, interval))
+                break
+            merged.extend(page)
+        # The last candle can be still open. Store closed candles only
+        merged = [kline for kline in merged if kline[6] < now]
+        return self._store.append(symbol, interval, merged)
+
+    async def top_up(self, symbol: str, interval: str, start_time: int) -> int:
+        last_open_time = self._store.last_open_time(symbol, interval)
+        if last_open_time is not None:
+            # Not + INTERVAL_MS: months differ in length, the exchange returns the next candle after the stored one
+            start_time = max(start_time, last_open_time + 1)
+        return await self.backfill(symbol, interval, start_time)
+
+    async def top_up_many(self, symbols: List[str], interval: str, start_time: int) -> Dict[str, int]:
+        counts = await asyncio.gather(*[self.top_up(symbol, interval, start_time) for symbol in symbols])
+        return dict(zip(symbols, counts))
+
+
+if __name__ == '__main__':
+    from core import config as conf
+    from core import global_event_loop as gloop
+
+    conf.init_global_config("/home/andrew/dev/crypto_bot/bot.cfg")
+    backfill = KlineBackfill(conf.global_core_conf, settings=conf.global_settings.backfill)
+    day_ago = tm.utc_timestamp() - _DAY_MS
+    stored = gloop.global_ev_loop.run_until_complete(
+        backfill.top_up_many(["ETHBTC", "LTCBTC"], api_async.BinanceApiEnums.KLINE_INTERVAL_1MINUTE, day_ago))
+    LOG.debug(stored, content_type="json")
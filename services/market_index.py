@@ -0,0 +1,47 @@
+from typing import Dict, FrozenSet, List, Tuple
+from logger import logger
+from services import models
+
+LOG = logger.LOG
+
+SYMBOL_STATUS_TRADING = "TRADING"
+
+
+class MarketIndex(object):
+    """
+    Tradable symbols of the exchange grouped by quote asset. It is built from exchange info once per
+    metadata refresh, so the worker selects its universe by set lookups instead of symbol substrings
+    (e.g. "BTC" in "BTCUSDT" is a BTC base pair, not a BTC quoted one).
+    """
+
+    def __init__(self, symbols_info: List[models.SymbolInfo]):
+        by_quote: Dict[str, set] = {}
+        self._symbols_info: Dict[str, models.SymbolInfo] = {}
+        self._by_assets: Dict[Tuple[str, str], str] = {}
+        for info in symbols_info:
+            if info.status != SYMBOL_STATUS_TRADING:
+                continue
+            self._symbols_info[info.symbol] = info
+            self._by_assets[(info.base_asset, info.quote_asset)] = info.symbol
+            by_quote.setdefault(info.quote_asset, set()).add(info.symbol)
+        self._by_quote: Dict[str, FrozenSet[str]] = {quote: frozenset(symbols) for quote, symbols in by_quote.items()}
+        LOG.debug("Market index: {} trading symbols, {} quote assets"
+                  .format(len(self._symbols_info), len(self._by_quote)))
+
+    def __len__(self):
+        return len(self._symbols_info)
+
+    def __contains__(self, symbol: str):
+        return symbol in self._symbols_info
+
+    def symbols_for_quote(self, quote_asset: str) -> FrozenSet[str]:
+        return self._by_quote.get(quote_asset, frozenset())
+
+    def symbol_info(self, symbol: str) -> models.SymbolInfo:
+        return self._symbols_info.get(symbol)
+
+    def symbol_for(self, base_asset: str, quote_asset: str) -> str:
+        """
+        :return: trading symbol of the pair or None, e.g. ("LTC", "BTC") -> "LTCBTC"
+        """
+        return self._by_assets.get((base_asset, quote_asset))
@@ -0,0 +1,195 @@
+from typing import List
+
+
+class _SlotsModel(object):
+    """
+    Base of the exchange models. Fields are parsed once at ingestion, numbers are converted to float,
+    so the worker doesn't re-parse strings on every access.
+    """
+    __slots__ = ()
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={}".format(name, getattr(self, name)) for name in self.__slots__))
+
+
+class Ticker(_SlotsModel):
+    __slots__ = ("symbol", "last_price", "bid_price", "ask_price", "quote_volume", "price_change_percent", "rank")
+
+    def __init__(self, symbol: str, last_price: float, bid_price: float, ask_price: float, quote_volume: float,
+                 price_change_percent: float, rank: float = 0.0):
+        self.symbol = symbol
+        self.last_price = last_price
+        self.bid_price = bid_price
+        self.ask_price = ask_price
+        self.quote_volume = quote_volume
+        self.price_change_percent = price_change_percent
+        self.rank = rank
+
+    @staticmethod
+    def from_json(item: dict) -> "Ticker":
+        """
+        :param item: element of /api/v1/ticker/24hr answer
+        """
+        return Ticker(
+            item["symbol"],
+            float(item["lastPrice"]),
+            float(item["bidPrice"]),
+            float(item["askPrice"]),
+            float(item["quoteVolume"]),
+            float(item["priceChangePercent"])
+        )
+
+    @staticmethod
+    def from_json_list(items: List[dict]) -> List["Ticker"]:
+        from_json = Ticker.from_json
+        return [from_json(item) for item in items]
+
+
+class Order(_SlotsModel):
+    __slots__ = ("symbol", "order_id", "side", "order_type", "price", "orig_qty", "executed_qty", "status",
+                 "time_in_force")
+
+    def __init__(self, symbol: str, order_id: int, side: str, order_type: str, price: float, orig_qty: float,
+                 executed_qty: float, status: str = None, time_in_force: str = None):
+        self.symbol = symbol
+        self.order_id = order_id
+        self.side = side
+        self.order_type = order_type
+        self.price = price
+        self.orig_qty = orig_qty
+        self.executed_qty = executed_qty
+        self.status = status
+        self.time_in_force = time_in_force
+
+    @property
+    def remaining_qty(self) -> float:
+        return self.orig_qty - self.executed_qty
+
+    @staticmethod
+    def from_json(item: dict) -> "Order":
+        """
+        :param item: element of /api/v3/openOrders answer
+        """
+        return Order(
+            item["symbol"],
+            item["orderId"],
+            item["side"],
+            item.get("type"),
+            float(item["price"]),
+            float(item["origQty"]),
+            float(item["executedQty"]),
+            item.get("status"),
+            item.get("timeInForce")
+        )
+
+    @staticmethod
+    def from_json_list(items: List[dict]) -> List["Order"]:
+        from_json = Order.from_json
+        return [from_json(item) for item in items]
+
+
+class BookTicker(_SlotsModel):
+    __slots__ = ("symbol", "bid_price", "bid_qty", "ask_price", "ask_qty")
+
+    def __init__(self, symbol: str, bid_price: float, bid_qty: float, ask_price: float, ask_qty: float):
+        self.symbol = symbol
+        self.bid_price = bid_price
+        self.bid_qty = bid_qty
+        self.ask_price = ask_price
+        self.ask_qty = ask_qty
+
+    @staticmethod
+    def from_json(item: dict) -> "BookTicker":
+        """
+        :param item: element of /api/v3/ticker/bookTicker answer
+        """
+        return BookTicker(item["symbol"], float(item["bidPrice"]), float(item["bidQty"]), float(item["askPrice"]),
+                          float(item["askQty"]))
+
+    @staticmethod
+    def from_json_list(items: List[dict]) -> List["BookTicker"]:
+        from_json = BookTicker.from_json
+        return [from_json(item) for item in items]
+
+
+class Balance(_SlotsModel):
+    __slots__ = ("asset", "free", "locked")
+
+    def __init__(self, asset: str, free: float, locked: float):
+        self.asset = asset
+        self.free = free
+        self.locked = locked
+
+    @property
+    def total(self) -> float:
+        return self.free + self.locked
+
+    @staticmethod
+    def from_json(item: dict) -> "Balance":
+        """
+        :param item: element of "balances" of /api/v3/account answer
+        """
+        return Balance(item["asset"], float(item["free"]), float(item["locked"]))
+
+    @staticmethod
+    def from_json_list(items: List[dict]) -> List["Balance"]:
+        from_json = Balance.from_json
+        return [from_json(item) for item in items]
+
+
+class SymbolInfo(_SlotsModel):
+    __slots__ = ("symbol", "status", "base_asset", "quote_asset", "min_price", "max_price", "tick_size",
+                 "min_qty", "max_qty", "step_size", "min_notional")
+
+    def __init__(self, symbol: str, status: str, base_asset: str, quote_asset: str,
+                 min_price: float = None, max_price: float = None, tick_size: float = None,
+                 min_qty: float = None, max_qty: float = None, step_size: float = None, min_notional: float = None):
+        self.symbol = symbol
+        self.status = status
+        self.base_asset = base_asset
+        self.quote_asset = quote_asset
+        self.min_price = min_price
+        self.max_price = max_price
+        self.tick_size = tick_size
+        self.min_qty = min_qty
+        self.max_qty = max_qty
+        self.step_size = step_size
+        self.min_notional = min_notional
+
+    @staticmethod
+    def from_json(item: dict) -> "SymbolInfo":
+        """
+        :param item: element of "symbols" of /api/v1/exchangeInfo answer. Filters are found by their type
+        """
+        info = SymbolInfo(item["symbol"], item.get("status"), item.get("baseAsset"), item.get("quoteAsset"))
+        for symbol_filter in item.get("filters", ()):
+            filter_type = symbol_filter.get("filterType")
+            if filter_type == "PRICE_FILTER":
+                info.min_price = float(symbol_filter["minPrice"])
+                info.max_price = float(symbol_filter["maxPrice"])
+                info.tick_size = float(symbol_filter["tickSize"])
+            elif filter_type == "LOT_SIZE":
+                info.min_qty = float(symbol_filter["minQty"])
+                info.max_qty = float(symbol_filter["maxQty"])
+                info.step_size = float(symbol_filter["stepSize"])
+            elif filter_type == "MIN_NOTIONAL":
+                info.min_notional = float(symbol_filter["minNotional"])
+        return info
+
+    @staticmethod
+    def from_json_list(items: List[dict]) -> List["SymbolInfo"]:
+        from_json = SymbolInfo.from_json
+        return [from_json(item) for item in items]
+
+
+def by_symbol(items: list) -> dict:
+    """
+    :param items: list of models with "symbol" field
+    :return: {symbol: model}
+    """
+    return {item.symbol: item for item in items}
+
@@ -0,0 +1,89 @@
+from typing import Dict, List, Tuple
+from logger import logger
+from services import models
+
+LOG = logger.LOG
+
+
+class OrderIntent(object):
+    """
+    Order which the worker wants to have on the exchange after the current cycle
+    """
+
+    def __init__(
+            self,
+            symbol: str,
+            side: str,
+            order_type: str,
+            quantity: float,
+            price: float = None,
+            time_in_force: str = None
+    ):
+        self.symbol = symbol
+        self.side = side
+        self.order_type = order_type
+        self.quantity = quantity
+        self.price = price
+        self.time_in_force = time_in_force
+
+    def key(self) -> Tuple[str, str, str]:
+        return make_key(self.symbol, self.side, self.price)
+
+    def __repr__(self):
+        return "OrderIntent({} {} {} qty:{} price:{})".format(
+            self.symbol, self.side, self.order_type, self.quantity, self.price)
+
+
+# Prices are sent with 8 digits after dot, so they are compared in the same precision
+def make_key(symbol: str, side: str, price: float) -> Tuple[str, str, str]:
+    return symbol, side, "{:.8f}".format(price or 0.0)
+
+
+def open_order_key(order: models.Order) -> Tuple[str, str, str]:
+    return make_key(order.symbol, order.side, order.price)
+
+
+def is_same_qty(order: models.Order, intent: OrderIntent, qty_tolerance_pct: float) -> bool:
+    # Quantity of an intent follows the whole balance, so it drifts a bit every cycle even in a steady market
+    return abs(order.remaining_qty - intent.quantity) <= intent.quantity * qty_tolerance_pct / 100 + 1e-8
+
+
+class ReconcilePlan(object):
+    def __init__(self):
+        self.to_cancel: List[models.Order] = []
+        self.to_create: List[OrderIntent] = []
+        self.kept: List[models.Order] = []
+
+    def __repr__(self):
+        return "ReconcilePlan(cancel:{} create:{} kept:{})".format(
+            len(self.to_cancel), len(self.to_create), len(self.kept))
+
+
+def reconcile(intents: List[OrderIntent], open_orders: List[models.Order],
+              qty_tolerance_pct: float = 0.0) -> ReconcilePlan:
+    """
+    Matches desired orders with open ones by symbol, side, price and remaining quantity,
+    the quantities may differ by qty_tolerance_pct percent of the intent.
+    Matched open orders are kept untouched, so they don't lose their queue priority.
+    """
+    plan = ReconcilePlan()
+    open_by_key: Dict[Tuple[str, str, str], List[models.Order]] = {}
+    for order in open_orders:
+        open_by_key.setdefault(open_order_key(order), []).append(order)
+    for intent in intents:
+        same_orders = open_by_key.get(intent.key(), [])
+        same = next((order for order in same_orders if is_same_qty(order, intent, qty_tolerance_pct)), None)
+        if same is not None:
+            same_orders.remove(same)
+            plan.kept.append(same)
+        else:
+            plan.to_create.append(intent)
+    for orders in open_by_key.values():
+        plan.to_cancel.extend(orders)
+    LOG.debug("Orders reconcile result: {}".format(plan))
+    return plan
+
+
+def locked_in_orders(open_orders: List[models.Order]) -> float:
+    # Quote asset amount which is locked by the remaining part of the open orders
+    return sum(order.price * order.remaining_qty for order in open_orders)
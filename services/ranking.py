@@ -0,0 +1,211 @@
+import heapq
+from typing import Dict, FrozenSet, List, Tuple
+from services import models
+
+
+def rank_ticker(ticker: models.Ticker, percent_multiply_coef: float, bid: float = None) -> float:
+    """
+    Rank of a pair for buying: the wider the spread and the bigger the 24h volume, the better,
+    growth for the last 24h decreases it
+    :param bid: bid instead of the best one of the ticker
+    """
+    ask = ticker.ask_price
+    bid = ticker.bid_price if bid is None else bid
+    if not bid:
+        return float("-inf")
+    change_percent = ticker.price_change_percent
+    return ((ask - bid) / bid) * ticker.quote_volume * (1 - ((change_percent * percent_multiply_coef) / 100))
+
+
+class IndexedMaxHeap(object):
+    """
+    Binary max heap of (rank, key) with a position index, so the rank of any key is changed
+    or removed in O(log n).
+    """
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._ranks: List[float] = []
+        self._pos: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key: str):
+        return key in self._pos
+
+    def rank(self, key: str) -> float:
+        return self._ranks[self._pos[key]]
+
+    def update(self, key: str, rank: float):
+        pos = self._pos.get(key)
+        if pos is None:
+            self._keys.append(key)
+            self._ranks.append(rank)
+            pos = len(self._keys) - 1
+            self._pos[key] = pos
+            self._sift_up(pos)
+            return
+        old_rank = self._ranks[pos]
+        self._ranks[pos] = rank
+        if rank > old_rank:
+            self._sift_up(pos)
+        elif rank < old_rank:
+            self._sift_down(pos)
+
+    def remove(self, key: str):
+        pos = self._pos.pop(key, None)
+        if pos is None:
+            return
+        last = len(self._keys) - 1
+        if pos != last:
+            self._keys[pos] = self._keys[last]
+            self._ranks[pos] = self._ranks[last]
+            self._pos[self._keys[pos]] = pos
+        self._keys.pop()
+        self._ranks.pop()
+        if pos < len(self._keys):
+            self._sift_up(pos)
+            self._sift_down(pos)
+
+    def top(self, k: int) -> List[str]:
+        """
+        Keys of the k biggest ranks from the biggest. Walks only the k best branches of the heap,
+        O(k log k) and independent of the heap size. The whole heap is sorted at once instead,
+        one sort is cheaper than n pops.
+        """
+        res: List[str] = []
+        if not self._keys or k <= 0:
+            return res
+        size = len(self._keys)
+        if k >= size:
+            keys = self._keys
+            return [keys[pos] for pos in sorted(range(size), key=self._ranks.__getitem__, reverse=True)]
+        candidates = [(-self._ranks[0], 0)]
+        while candidates and len(res) < k:
+            _, pos = heapq.heappop(candidates)
+            res.append(self._keys[pos])
+            for child in (2 * pos + 1, 2 * pos + 2):
+                if child < size:
+                    heapq.heappush(candidates, (-self._ranks[child], child))
+        return res
+
+    def _swap(self, i: int, j: int):
+        keys, ranks = self._keys, self._ranks
+        keys[i], keys[j] = keys[j], keys[i]
+        ranks[i], ranks[j] = ranks[j], ranks[i]
+        self._pos[keys[i]] = i
+        self._pos[keys[j]] = j
+
+    def _sift_up(self, pos: int):
+        ranks = self._ranks
+        while pos > 0:
+            parent = (pos - 1) // 2
+            if ranks[pos] <= ranks[parent]:
+                break
+            self._swap(pos, parent)
+            pos = parent
+
+    def _sift_down(self, pos: int):
+        ranks = self._ranks
+        size = len(ranks)
+        while True:
+            largest = pos
+            for child in (2 * pos + 1, 2 * pos + 2):
+                if child < size and ranks[child] > ranks[largest]:
+                    largest = child
+            if largest == pos:
+                return
+            self._swap(pos, largest)
+            pos = largest
+
+
+class TickerRanking(object):
+    """
+    Incremental ranking of the trade pairs. A changed ticker (24h statistics or only the best bid/ask)
+    re-ranks its symbol in O(log n), the current top is read without sorting the whole market.
+    """
+
+    def __init__(self, percent_multiply_coef: float, min_pair_price: float = 0.0, universe: FrozenSet[str] = None):
+        self._percent_multiply_coef = percent_multiply_coef
+        self._min_pair_price = min_pair_price
+        self._universe = universe
+        self._tickers: Dict[str, models.Ticker] = {}
+        self._own_bids: Dict[str, Tuple[float, float]] = {}
+        self._heap = IndexedMaxHeap()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, symbol: str):
+        return symbol in self._heap
+
+    def set_universe(self, universe: FrozenSet[str]):
+        self._universe = universe
+        for symbol in [symbol for symbol in self._tickers if symbol not in universe]:
+            self.remove(symbol)
+
+    def ticker(self, symbol: str) -> models.Ticker:
+        return self._tickers.get(symbol)
+
+    def set_own_bids(self, own_bids: Dict[str, Tuple[float, float]]):
+        """
+        :param own_bids: symbol -> (price, tick size) of our resting BUY order. While ours is the best bid,
+        the spread is taken from the bid it has outbid by a tick, so our own orders don't reorder the top
+        """
+        changed = set(self._own_bids) | set(own_bids)
+        self._own_bids = own_bids
+        for symbol in changed:
+            ticker = self._tickers.get(symbol)
+            if ticker is not None:
+                self._rank(ticker)
+
+    def _rank(self, ticker: models.Ticker):
+        bid = None
+        own_bid = self._own_bids.get(ticker.symbol)
+        if own_bid is not None and abs(ticker.bid_price - own_bid[0]) < own_bid[1] / 2:
+            bid = own_bid[0] - own_bid[1]
+        ticker.rank = rank_ticker(ticker, self._percent_multiply_coef, bid)
+        self._heap.update(ticker.symbol, ticker.rank)
+
+    def update_ticker(self, ticker: models.Ticker):
+        if (self._universe is not None and ticker.symbol not in self._universe) \
+                or ticker.last_price <= self._min_pair_price:
+            self.remove(ticker.symbol)
+            return
+        self._tickers[ticker.symbol] = ticker
+        self._rank(ticker)
+
+    def update_tickers(self, tickers: List[models.Ticker], full: bool = False):
+        """
+        :param full: tickers are the whole market, symbols missing in them are removed
+        """
+        for ticker in tickers:
+            self.update_ticker(ticker)
+        if full:
+            present = {ticker.symbol for ticker in tickers}
+            for symbol in [symbol for symbol in self._tickers if symbol not in present]:
+                self.remove(symbol)
+
+    def update_book(self, symbol: str, bid_price: float, ask_price: float) -> bool:
+        """
+        Applies a best bid/ask delta to the known 24h ticker of the symbol
+        :return: False if the symbol isn't ranked
+        """
+        ticker = self._tickers.get(symbol)
+        if ticker is None:
+            return False
+        ticker.bid_price = bid_price
+        ticker.ask_price = ask_price
+        self._rank(ticker)
+        return True
+
+    def remove(self, symbol: str):
+        self._tickers.pop(symbol, None)
+        self._heap.remove(symbol)
+
+    def top(self, k: int) -> List[models.Ticker]:
+        return [self._tickers[symbol] for symbol in self._heap.top(k)]
+
+    def sorted_all(self) -> List[models.Ticker]:
+        return self.top(len(self._heap))
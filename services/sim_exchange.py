@@ -0,0 +1,786 @@
+import asyncio
+import bisect
+import json
+import random
+import time
+from collections import deque
+from typing import Deque, Dict, List, Tuple
+from logger import logger
+from services import endpoints
+from services import models
+
+LOG = logger.LOG
+
+ACCOUNT_OWN = "own"
+ACCOUNT_MARKET = "market"
+
+SIDE_BUY = "BUY"
+SIDE_SELL = "SELL"
+ORDER_TYPE_LIMIT = "LIMIT"
+ORDER_TYPE_MARKET = "MARKET"
+
+STATUS_NEW = "NEW"
+STATUS_PARTIALLY_FILLED = "PARTIALLY_FILLED"
+STATUS_FILLED = "FILLED"
+STATUS_CANCELED = "CANCELED"
+
+# Error answers in the same shape as the exchange gives them
+ERROR_INVALID_SYMBOL = {"code": -1121, "msg": "Invalid symbol."}
+ERROR_INSUFFICIENT_BALANCE = {"code": -2010, "msg": "Account has insufficient balance for requested action."}
+ERROR_UNKNOWN_ORDER = {"code": -2011, "msg": "Unknown order sent."}
+ERROR_INTERNAL = {"code": -1001, "msg": "Internal error; unable to process your request. Please try again."}
+
+
+def _filter_failure(filter_type: str) -> dict:
+    return {"code": -1013, "msg": "Filter failure: {}".format(filter_type)}
+
+
+def _is_step_multiple(value: float, step: float) -> bool:
+    if not step:
+        return True
+    return abs(round(value / step) * step - value) <= step * 1e-6
+
+
+def _price_key(price: float) -> float:
+    # Prices are keys of the book levels, they are compared in the exchange precision
+    return round(price, 8)
+
+
+class SimOrder(object):
+    __slots__ = ("order_id", "account", "symbol", "side", "order_type", "price", "orig_qty", "executed_qty",
+                 "cummulative_quote_qty", "status", "time_in_force", "time")
+
+    def __init__(self, order_id: int, account: str, symbol: str, side: str, order_type: str, price: float,
+                 quantity: float, time_in_force: str, time_ms: int):
+        self.order_id = order_id
+        self.account = account
+        self.symbol = symbol
+        self.side = side
+        self.order_type = order_type
+        self.price = price
+        self.orig_qty = quantity
+        self.executed_qty = 0.0
+        self.cummulative_quote_qty = 0.0
+        self.status = STATUS_NEW
+        self.time_in_force = time_in_force
+        self.time = time_ms
+
+    @property
+    def remaining_qty(self) -> float:
+        return self.orig_qty - self.executed_qty
+
+    def to_json(self) -> dict:
+        return {
+            "symbol": self.symbol,
+            "orderId": self.order_id,
+            "clientOrderId": "sim{}".format(self.order_id),
+            "price": "{:.8f}".format(self.price or 0.0),
+            "origQty": "{:.8f}".format(self.orig_qty),
+            "executedQty": "{:.8f}".format(self.executed_qty),
+            "cummulativeQuoteQty": "{:.8f}".format(self.cummulative_quote_qty),
+            "status": self.status,
+            "timeInForce": self.time_in_force,
+            "type": self.order_type,
+            "side": self.side,
+            "stopPrice": "0.00000000",
+            "icebergQty": "0.00000000",
+            "time": self.time,
+            "isWorking": True,
+        }
+
+
+class SimOrderBook(object):
+    """
+    Limit order book of one symbol with price-time priority: the best price first, FIFO within a price level.
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self._levels: Dict[str, Dict[float, Deque[SimOrder]]] = {SIDE_BUY: {}, SIDE_SELL: {}}
+        self._prices: Dict[str, List[float]] = {SIDE_BUY: [], SIDE_SELL: []}  # Ascending
+
+    def best_bid(self) -> float:
+        prices = self._prices[SIDE_BUY]
+        return prices[-1] if prices else None
+
+    def best_ask(self) -> float:
+        prices = self._prices[SIDE_SELL]
+        return prices[0] if prices else None
+
+    def depth(self, side: str, limit: int) -> List[Tuple[float, float]]:
+        prices = self._prices[side]
+        ordered = reversed(prices) if side == SIDE_BUY else prices
+        res = []
+        for price in ordered:
+            if len(res) >= limit:
+                break
+            res.append((price, sum(order.remaining_qty for order in self._levels[side][price])))
+        return res
+
+    def add(self, order: SimOrder):
+        price = _price_key(order.price)
+        levels = self._levels[order.side]
+        level = levels.get(price)
+        if level is None:
+            level = deque()
+            levels[price] = level
+            bisect.insort(self._prices[order.side], price)
+        level.append(order)
+
+    def remove(self, order: SimOrder) -> bool:
+        price = _price_key(order.price)
+        level = self._levels[order.side].get(price)
+        if not level or order not in level:
+            return False
+        level.remove(order)
+        if not level:
+            self._drop_level(order.side, price)
+        return True
+
+    def _drop_level(self, side: str, price: float):
+        del self._levels[side][price]
+        prices = self._prices[side]
+        del prices[bisect.bisect_left(prices, price)]
+
+    def match(self, side: str, quantity: float, limit_price: float = None,
+              dry_run: bool = False) -> List[Tuple[SimOrder, float, float]]:
+        """
+        Matches a taker order against the opposite side.
+        :param limit_price: None for a market order
+        :return: [(maker_order, qty, price)], makers are updated and removed unless dry_run
+        """
+        maker_side = SIDE_SELL if side == SIDE_BUY else SIDE_BUY
+        prices = self._prices[maker_side]
+        levels = self._levels[maker_side]
+        fills = []
+        left = quantity
+        index = 0
+        while left > 1e-12 and index < len(prices):
+            price = prices[index] if maker_side == SIDE_SELL else prices[-1 - index]
+            if limit_price is not None and (price > limit_price if side == SIDE_BUY else price < limit_price):
+                break
+            for maker in levels[price]:
+                qty = min(left, maker.remaining_qty)
+                fills.append((maker, qty, price))
+                left -= qty
+                if left <= 1e-12:
+                    break
+            index += 1
+        if not dry_run:
+            for maker, qty, price in fills:
+                maker.executed_qty += qty
+                maker.cummulative_quote_qty += qty * price
+                if maker.remaining_qty <= 1e-12:
+                    maker.status = STATUS_FILLED
+                    level = levels[_price_key(maker.price)]
+                    level.remove(maker)
+                    if not level:
+                        self._drop_level(maker_side, _price_key(maker.price))
+                else:
+                    maker.status = STATUS_PARTIALLY_FILLED
+        return fills
+
+
+class SimFaults(object):
+    """
+    Latency and faults injected into every simulated request.
+    :param error_rate: part of requests answered with an internal error
+    :param timeout_rate: part of requests which get no answer, as the clients see a timeout
+    """
+
+    def __init__(self, latency_sec: float = 0.0, latency_jitter_sec: float = 0.0, error_rate: float = 0.0,
+                 timeout_rate: float = 0.0, seed: int = None):
+        self.latency_sec = latency_sec
+        self.latency_jitter_sec = latency_jitter_sec
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self._rnd = random.Random(seed)
+
+    def delay(self) -> float:
+        return self.latency_sec + (self._rnd.uniform(0, self.latency_jitter_sec) if self.latency_jitter_sec else 0)
+
+    def fault(self) -> str:
+        """
+        :return: None, "error" or "timeout"
+        """
+        value = self._rnd.random()
+        if value < self.timeout_rate:
+            return "timeout"
+        if value < self.timeout_rate + self.error_rate:
+            return "error"
+        return None
+
+
+class SimExchange(object):
+    """
+    In-process exchange: per-symbol order books with price-time matching, balances of our account,
+    fills with fees and our trade history. Answers are the same json structures the REST api gives.
+    Liquidity and the rest of the market are orders of ACCOUNT_MARKET, which has no balances.
+    """
+
+    def __init__(self, fee_rate: float = 0.001, seed: int = None):
+        self.fee_rate = fee_rate
+        self._rnd = random.Random(seed)
+        self._symbols: Dict[str, models.SymbolInfo] = {}
+        self._books: Dict[str, SimOrderBook] = {}
+        self._stats: Dict[str, dict] = {}
+        self._balances: Dict[str, List[float]] = {}  # asset -> [free, locked]
+        self._orders: Dict[int, SimOrder] = {}  # Our open orders
+        self._trades: Dict[str, List[dict]] = {}  # Our trades by symbol
+        self._next_order_id = 1
+        self._next_trade_id = 1
+        self.orders_placed = 0
+        self.fills = 0
+
+    @staticmethod
+    def now_ms() -> int:
+        return int(time.time() * 1000)
+
+    # Setup
+
+    def add_symbol(self, info: models.SymbolInfo, last_price: float, quote_volume: float = 0.0,
+                   price_change_percent: float = 0.0):
+        self._symbols[info.symbol] = info
+        self._books[info.symbol] = SimOrderBook(info.symbol)
+        self._stats[info.symbol] = {
+            "open_price": last_price / (1 + price_change_percent / 100),
+            "high_price": last_price,
+            "low_price": last_price,
+            "last_price": last_price,
+            "volume": quote_volume / last_price if last_price else 0.0,
+            "quote_volume": quote_volume,
+            "count": 0,
+        }
+
+    def set_balance(self, asset: str, free: float, locked: float = 0.0):
+        self._balances[asset] = [free, locked]
+
+    def add_liquidity(self, symbol: str, side: str, price: float, quantity: float) -> SimOrder:
+        order = self._new_order(ACCOUNT_MARKET, symbol, side, ORDER_TYPE_LIMIT, price, quantity, "GTC")
+        self._books[symbol].add(order)
+        return order
+
+    def add_own_trade(self, symbol: str, side: str, price: float, quantity: float, time_ms: int = None):
+        # History for assets we hold from the start
+        info = self._symbols[symbol]
+        self._record_trade(info, None, side, price, quantity, 0.0, info.quote_asset, True, time_ms)
+
+    def symbols(self) -> List[str]:
+        return list(self._symbols)
+
+    def symbol_info(self, symbol: str) -> models.SymbolInfo:
+        return self._symbols.get(symbol)
+
+    def book(self, symbol: str) -> SimOrderBook:
+        return self._books.get(symbol)
+
+    # Orders
+
+    def _new_order(self, account: str, symbol: str, side: str, order_type: str, price: float, quantity: float,
+                   time_in_force: str) -> SimOrder:
+        order = SimOrder(self._next_order_id, account, symbol, side, order_type, price, quantity, time_in_force,
+                         self.now_ms())
+        self._next_order_id += 1
+        return order
+
+    def _balance(self, asset: str) -> List[float]:
+        balance = self._balances.get(asset)
+        if balance is None:
+            balance = [0.0, 0.0]
+            self._balances[asset] = balance
+        return balance
+
+    def _validate(self, info: models.SymbolInfo, order_type: str, quantity: float, price: float) -> dict:
+        if info.step_size is not None and (quantity < info.min_qty or quantity > info.max_qty
+                                           or not _is_step_multiple(quantity, info.step_size)):
+            return _filter_failure("LOT_SIZE")
+        if order_type == ORDER_TYPE_LIMIT:
+            if not price:
+                return {"code": -1102, "msg": "Mandatory parameter 'price' was not sent, was empty/null, or malformed."}
+            if info.tick_size is not None and (price < info.min_price or price > info.max_price
+                                               or not _is_step_multiple(price, info.tick_size)):
+                return _filter_failure("PRICE_FILTER")
+        reference_price = price if order_type == ORDER_TYPE_LIMIT else self._stats[info.symbol]["last_price"]
+        if info.min_notional is not None and quantity * reference_price < info.min_notional:
+            return _filter_failure("MIN_NOTIONAL")
+        return None
+
+    def place_order(self, symbol: str, side: str, order_type: str, quantity: float, price: float = None,
+                    time_in_force: str = None, account: str = ACCOUNT_OWN, test: bool = False) -> dict:
+        info = self._symbols.get(symbol)
+        if info is None or info.status != "TRADING":
+            return dict(ERROR_INVALID_SYMBOL)
+        if side not in (SIDE_BUY, SIDE_SELL) or order_type not in (ORDER_TYPE_LIMIT, ORDER_TYPE_MARKET):
+            return {"code": -1116, "msg": "Invalid orderType."}
+        error = self._validate(info, order_type, quantity, price)
+        if error:
+            return error
+        book = self._books[symbol]
+        limit_price = price if order_type == ORDER_TYPE_LIMIT else None
+        if account == ACCOUNT_OWN:
+            # Amount to lock: quote asset at the limit price for BUY (the cost of the fills for MARKET), base for SELL
+            if side == SIDE_BUY:
+                if limit_price is None:
+                    fills = book.match(side, quantity, None, dry_run=True)
+                    if sum(qty for _, qty, _ in fills) < quantity - 1e-12:
+                        return {"code": -2010, "msg": "Order would immediately match and take. Not enough liquidity."}
+                    lock_asset, lock_amount = info.quote_asset, sum(qty * fill_price for _, qty, fill_price in fills)
+                else:
+                    lock_asset, lock_amount = info.quote_asset, quantity * limit_price
+            else:
+                lock_asset, lock_amount = info.base_asset, quantity
+            balance = self._balance(lock_asset)
+            if balance[0] < lock_amount - 1e-12:
+                return dict(ERROR_INSUFFICIENT_BALANCE)
+            if test:
+                return {}
+            balance[0] -= lock_amount
+            balance[1] += lock_amount
+        elif test:
+            return {}
+        order = self._new_order(account, symbol, side, order_type, price, quantity, time_in_force or "GTC")
+        self.orders_placed += 1
+        for maker, qty, fill_price in book.match(side, quantity, limit_price):
+            order.executed_qty += qty
+            order.cummulative_quote_qty += qty * fill_price
+            self._on_fill(info, order, qty, fill_price, is_maker=False)
+            self._on_fill(info, maker, qty, fill_price, is_maker=True)
+            self._update_stats(symbol, qty, fill_price)
+        if order.remaining_qty <= 1e-12:
+            order.status = STATUS_FILLED
+        elif order_type == ORDER_TYPE_LIMIT and order.time_in_force == "GTC":
+            order.status = STATUS_PARTIALLY_FILLED if order.executed_qty else STATUS_NEW
+            book.add(order)
+            if account == ACCOUNT_OWN:
+                self._orders[order.order_id] = order
+        else:
+            # IOC/FOK or MARKET leftovers are expired, FOK is treated as IOC here
+            order.status = STATUS_CANCELED
+            self._release(info, order)
+        res = order.to_json()
+        res["transactTime"] = order.time
+        return res
+
+    def _on_fill(self, info: models.SymbolInfo, order: SimOrder, qty: float, price: float, is_maker: bool):
+        if order.account != ACCOUNT_OWN:
+            return
+        self.fills += 1
+        if order.side == SIDE_BUY:
+            quote = self._balance(info.quote_asset)
+            # Locked at the limit price (at the fill price for MARKET), the price improvement is released
+            locked_price = order.price if order.order_type == ORDER_TYPE_LIMIT else price
+            quote[1] -= qty * locked_price
+            quote[0] += qty * (locked_price - price)
+            commission = qty * self.fee_rate
+            self._balance(info.base_asset)[0] += qty - commission
+            commission_asset = info.base_asset
+        else:
+            self._balance(info.base_asset)[1] -= qty
+            commission = qty * price * self.fee_rate
+            self._balance(info.quote_asset)[0] += qty * price - commission
+            commission_asset = info.quote_asset
+        self._record_trade(info, order.order_id, order.side, price, qty, commission, commission_asset, is_maker)
+        if order.remaining_qty <= 1e-12:
+            self._orders.pop(order.order_id, None)
+
+    def _release(self, info: models.SymbolInfo, order: SimOrder):
+        # Unfilled part of our order gives its locked amount back
+        if order.account != ACCOUNT_OWN:
+            return
+        self._orders.pop(order.order_id, None)
+        if order.side == SIDE_BUY:
+            if order.order_type != ORDER_TYPE_LIMIT:
+                return
+            asset, amount = info.quote_asset, order.remaining_qty * order.price
+        else:
+            asset, amount = info.base_asset, order.remaining_qty
+        balance = self._balance(asset)
+        balance[1] -= amount
+        balance[0] += amount
+
+    def _record_trade(self, info: models.SymbolInfo, order_id: int, side: str, price: float, qty: float,
+                      commission: float, commission_asset: str, is_maker: bool, time_ms: int = None):
+        self._trades.setdefault(info.symbol, []).append({
+            "id": self._next_trade_id,
+            "orderId": order_id,
+            "price": "{:.8f}".format(price),
+            "qty": "{:.8f}".format(qty),
+            "commission": "{:.8f}".format(commission),
+            "commissionAsset": commission_asset,
+            "time": time_ms if time_ms is not None else self.now_ms(),
+            "isBuyer": side == SIDE_BUY,
+            "isMaker": is_maker,
+            "isBestMatch": True,
+        })
+        self._next_trade_id += 1
+
+    def _update_stats(self, symbol: str, qty: float, price: float):
+        stats = self._stats[symbol]
+        stats["last_price"] = price
+        stats["high_price"] = max(stats["high_price"], price)
+        stats["low_price"] = min(stats["low_price"], price)
+        stats["volume"] += qty
+        stats["quote_volume"] += qty * price
+        stats["count"] += 1
+
+    def cancel_order(self, symbol: str, order_id: int) -> dict:
+        order = self._orders.get(order_id)
+        if order is None or order.symbol != symbol:
+            return dict(ERROR_UNKNOWN_ORDER)
+        self._books[symbol].remove(order)
+        order.status = STATUS_CANCELED
+        self._release(self._symbols[symbol], order)
+        return {"symbol": symbol, "origClientOrderId": "sim{}".format(order_id), "orderId": order_id,
+                "clientOrderId": "cancel{}".format(order_id)}
+
+    def step_market(self, takers_per_symbol: int = 1, max_qty_coef: float = 3.0):
+        """
+        Moves the market: random taker orders of ACCOUNT_MARKET hit the best levels (and our resting orders),
+        then the liquidity around the last price is refilled.
+        :param max_qty_coef: the biggest taker order in sizes of a refilled level
+        """
+        rnd = self._rnd
+        for symbol, info in self._symbols.items():
+            book = self._books[symbol]
+            for _ in range(takers_per_symbol):
+                side = SIDE_BUY if rnd.random() < 0.5 else SIDE_SELL
+                best = book.best_ask() if side == SIDE_BUY else book.best_bid()
+                if best is None:
+                    continue
+                qty = self._round_qty(info, self._level_qty(info) * rnd.uniform(0.5, max_qty_coef))
+                self.place_order(symbol, side, ORDER_TYPE_MARKET, qty, account=ACCOUNT_MARKET)
+            self.refill_liquidity(symbol)
+
+    def _level_qty(self, info: models.SymbolInfo) -> float:
+        # Every level is worth of several min notional
+        last = self._stats[info.symbol]["last_price"]
+        return max(info.min_qty or 0.0, (info.min_notional or 0.0) * 20 / last if last else 0.0) or 1.0
+
+    @staticmethod
+    def _round_qty(info: models.SymbolInfo, qty: float) -> float:
+        if info.step_size:
+            qty = max(round(qty / info.step_size) * info.step_size, info.min_qty or 0.0)
+        return round(qty, 8)
+
+    def refill_liquidity(self, symbol: str, levels: int = 5, quantity: float = None):
+        info = self._symbols[symbol]
+        book = self._books[symbol]
+        tick = info.tick_size or 1e-8
+        last = self._stats[symbol]["last_price"]
+        qty = quantity if quantity else self._round_qty(info, self._level_qty(info))
+        if len(book.depth(SIDE_SELL, levels)) < levels:
+            start = max(book.best_bid() or last, last)
+            for i in range(1, levels + 1):
+                self.add_liquidity(symbol, SIDE_SELL, _price_key(start + i * tick), qty)
+        if len(book.depth(SIDE_BUY, levels)) < levels:
+            start = min(book.best_ask() or last, last)
+            for i in range(1, levels + 1):
+                if start - i * tick > 0:
+                    self.add_liquidity(symbol, SIDE_BUY, _price_key(start - i * tick), qty)
+
+    # Json views of the exchange
+
+    def exchange_info(self) -> dict:
+        symbols = []
+        for info in self._symbols.values():
+            symbols.append({
+                "symbol": info.symbol,
+                "status": info.status,
+                "baseAsset": info.base_asset,
+                "baseAssetPrecision": 8,
+                "quoteAsset": info.quote_asset,
+                "quotePrecision": 8,
+                "orderTypes": [ORDER_TYPE_LIMIT, ORDER_TYPE_MARKET],
+                "icebergAllowed": False,
+                "filters": [
+                    {"filterType": "PRICE_FILTER", "minPrice": "{:.8f}".format(info.min_price),
+                     "maxPrice": "{:.8f}".format(info.max_price), "tickSize": "{:.8f}".format(info.tick_size)},
+                    {"filterType": "LOT_SIZE", "minQty": "{:.8f}".format(info.min_qty),
+                     "maxQty": "{:.8f}".format(info.max_qty), "stepSize": "{:.8f}".format(info.step_size)},
+                    {"filterType": "MIN_NOTIONAL", "minNotional": "{:.8f}".format(info.min_notional)},
+                ],
+            })
+        return {"timezone": "UTC", "serverTime": self.now_ms(), "rateLimits": [], "exchangeFilters": [],
+                "symbols": symbols}
+
+    def _ticker_24h(self, symbol: str) -> dict:
+        stats = self._stats[symbol]
+        book = self._books[symbol]
+        bid = book.best_bid() or 0.0
+        ask = book.best_ask() or 0.0
+        change = stats["last_price"] - stats["open_price"]
+        now = self.now_ms()
+        return {
+            "symbol": symbol,
+            "priceChange": "{:.8f}".format(change),
+            "priceChangePercent": "{:.3f}".format(change / stats["open_price"] * 100 if stats["open_price"] else 0),
+            "weightedAvgPrice": "{:.8f}".format(stats["quote_volume"] / stats["volume"] if stats["volume"] else 0),
+            "prevClosePrice": "{:.8f}".format(stats["open_price"]),
+            "lastPrice": "{:.8f}".format(stats["last_price"]),
+            "lastQty": "0.00000000",
+            "bidPrice": "{:.8f}".format(bid),
+            "bidQty": "{:.8f}".format(sum(qty for _, qty in book.depth(SIDE_BUY, 1))),
+            "askPrice": "{:.8f}".format(ask),
+            "askQty": "{:.8f}".format(sum(qty for _, qty in book.depth(SIDE_SELL, 1))),
+            "openPrice": "{:.8f}".format(stats["open_price"]),
+            "highPrice": "{:.8f}".format(stats["high_price"]),
+            "lowPrice": "{:.8f}".format(stats["low_price"]),
+            "volume": "{:.8f}".format(stats["volume"]),
+            "quoteVolume": "{:.8f}".format(stats["quote_volume"]),
+            "openTime": now - 86400000,
+            "closeTime": now,
+            "firstId": 0,
+            "lastId": stats["count"],
+            "count": stats["count"],
+        }
+
+    def ticker_24h(self, symbol: str = None):
+        if symbol:
+            return self._ticker_24h(symbol) if symbol in self._symbols else dict(ERROR_INVALID_SYMBOL)
+        return [self._ticker_24h(item) for item in self._symbols]
+
+    def book_ticker(self, symbol: str = None):
+        def _book_ticker(item: str) -> dict:
+            book = self._books[item]
+            best_bid = book.depth(SIDE_BUY, 1)
+            best_ask = book.depth(SIDE_SELL, 1)
+            return {
+                "symbol": item,
+                "bidPrice": "{:.8f}".format(best_bid[0][0] if best_bid else 0),
+                "bidQty": "{:.8f}".format(best_bid[0][1] if best_bid else 0),
+                "askPrice": "{:.8f}".format(best_ask[0][0] if best_ask else 0),
+                "askQty": "{:.8f}".format(best_ask[0][1] if best_ask else 0),
+            }
+
+        if symbol:
+            return _book_ticker(symbol) if symbol in self._symbols else dict(ERROR_INVALID_SYMBOL)
+        return [_book_ticker(item) for item in self._symbols]
+
+    def order_book(self, symbol: str, limit: int = 100) -> dict:
+        book = self._books.get(symbol)
+        if book is None:
+            return dict(ERROR_INVALID_SYMBOL)
+        return {
+            "lastUpdateId": self._next_order_id,
+            "bids": [["{:.8f}".format(price), "{:.8f}".format(qty), []] for price, qty in book.depth(SIDE_BUY, limit)],
+            "asks": [["{:.8f}".format(price), "{:.8f}".format(qty), []] for price, qty in book.depth(SIDE_SELL, limit)],
+        }
+
+    def open_orders(self, symbol: str = None) -> List[dict]:
+        return [order.to_json() for order in self._orders.values() if not symbol or order.symbol == symbol]
+
+    def account_info(self) -> dict:
+        return {
+            "makerCommission": int(self.fee_rate * 10000),
+            "takerCommission": int(self.fee_rate * 10000),
+            "buyerCommission": 0,
+            "sellerCommission": 0,
+            "canTrade": True,
+            "canWithdraw": True,
+            "canDeposit": True,
+            "updateTime": self.now_ms(),
+            "balances": [{"asset": asset, "free": "{:.8f}".format(max(free, 0.0)),
+                          "locked": "{:.8f}".format(max(locked, 0.0))}
+                         for asset, (free, locked) in self._balances.items()],
+        }
+
+    def my_trades(self, symbol: str, from_id: int = None, limit: int = 500) -> List[dict]:
+        trades = self._trades.get(symbol, [])
+        if from_id is None:
+            return trades[-limit:] if limit else list(trades)
+        # Trade ids grow over all symbols, so the first one >= from_id is found by bisect
+        index = bisect.bisect_left([trade["id"] for trade in trades], from_id)
+        return trades[index:index + limit]
+
+
+class SimBinanceApi(object):
+    """
+    Surface of the sync services.binance_rest_api.BinanceRestApi on top of SimExchange,
+    with latency and faults of SimFaults. A timeout gives None as the real client does.
+    """
+
+    def __init__(self, exchange: SimExchange, faults: SimFaults = None):
+        if not exchange:
+            raise ValueError("Did't got exchange param")
+        self._exchange = exchange
+        self._faults = faults if faults else SimFaults()
+        self.requests = 0
+
+    def _call(self, name: str, symbol: str, func, *args, **kwargs):
+        # Weight is counted by the endpoint table as for the real client, see services.endpoints.RequestBuilder
+        self.requests += 1
+        endpoints.count_weight(endpoints.ENDPOINTS[name], {"symbol": symbol})
+        delay = self._faults.delay()
+        if delay:
+            time.sleep(delay)
+        fault = self._faults.fault()
+        if fault == "timeout":
+            LOG.error("Simulated timeout of {}".format(name))
+            return None
+        if fault == "error":
+            return dict(ERROR_INTERNAL)
+        return func(*args, **kwargs)
+
+    def ping_server(self):
+        return self._call("ping", None, lambda: {})
+
+    def fetch_server_time(self):
+        return self._call("server_time", None, lambda: {"serverTime": self._exchange.now_ms()})
+
+    def exchange_info(self):
+        return self._call("exchange_info", None, self._exchange.exchange_info)
+
+    def fetch_order_book(self, symbol: str, limit: int = None):
+        return self._call("order_book", symbol, self._exchange.order_book, symbol, limit or 100)
+
+    def fetch_ticker_24h(self, symbol: str = None):
+        return self._call("ticker_24h", symbol, self._exchange.ticker_24h, symbol)
+
+    def fetch_order_book_ticker(self, symbol: str = None):
+        return self._call("book_ticker", symbol, self._exchange.book_ticker, symbol)
+
+    def create_new_order(self, symbol: str, side: str, order_type: str, quantity: float, timestamp: int, **kwargs):
+        return self._call("new_order", symbol, self._exchange.place_order, symbol, side, order_type, quantity,
+                          price=kwargs.get("price"), time_in_force=kwargs.get("timeInForce"))
+
+    def create_new_test_order(self, symbol: str, side: str, order_type: str, quantity: float, timestamp: int,
+                              **kwargs):
+        return self._call("test_order", symbol, self._exchange.place_order, symbol, side, order_type, quantity,
+                          price=kwargs.get("price"), time_in_force=kwargs.get("timeInForce"), test=True)
+
+    def query_open_orders(self, timestamp: int, symbol: str = None, recvWindow: int = None):
+        return self._call("open_orders", symbol, self._exchange.open_orders, symbol)
+
+    def cancel_order(self, symbol: str, timestamp: int, orderId: int = None, origClientOrderId: str = None,
+                     newClientOrderId: str = None, recvWindow: int = None):
+        return self._call("cancel_order", symbol, self._exchange.cancel_order, symbol, orderId)
+
+    def query_acc_info(self, timestamp: int, recvWindow: int = None):
+        return self._call("account", None, self._exchange.account_info)
+
+    def my_trades(self, symbol: str, timestamp: int, limit: int = None, fromId: int = None, recvWindow: int = None):
+        return self._call("my_trades", symbol, self._exchange.my_trades, symbol, fromId, limit or 500)
+
+
+def create_app(exchange: SimExchange, faults: SimFaults = None):
+    """
+    aiohttp application with the REST routes of the exchange on top of SimExchange.
+    Signatures aren't checked. A simulated timeout holds the request for timeout_hold_sec.
+    """
+    from aiohttp import web
+
+    faults = faults if faults else SimFaults()
+    timeout_hold_sec = 60
+
+    def _json(res, status: int = None):
+        if status is None:
+            status = 400 if isinstance(res, dict) and "code" in res else 200
+        return web.Response(text=json.dumps(res), status=status, content_type="application/json")
+
+    @web.middleware
+    async def faults_middleware(request, handler):
+        delay = faults.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        fault = faults.fault()
+        if fault == "timeout":
+            await asyncio.sleep(timeout_hold_sec)
+        if fault == "error":
+            return _json(ERROR_INTERNAL, status=500)
+        return await handler(request)
+
+    def _float(params, name: str) -> float:
+        value = params.get(name)
+        return float(value) if value else None
+
+    async def ping(request):
+        return _json({})
+
+    async def server_time(request):
+        return _json({"serverTime": exchange.now_ms()})
+
+    async def exchange_info(request):
+        return _json(exchange.exchange_info())
+
+    async def depth(request):
+        return _json(exchange.order_book(request.query.get("symbol"), int(request.query.get("limit", 100))))
+
+    async def ticker_24h(request):
+        return _json(exchange.ticker_24h(request.query.get("symbol")))
+
+    async def book_ticker(request):
+        return _json(exchange.book_ticker(request.query.get("symbol")))
+
+    async def new_order(request, test: bool = False):
+        params = request.query
+        return _json(exchange.place_order(
+            params.get("symbol"), params.get("side"), params.get("type"), _float(params, "quantity"),
+            price=_float(params, "price"), time_in_force=params.get("timeInForce"), test=test))
+
+    async def new_test_order(request):
+        return await new_order(request, test=True)
+
+    async def cancel_order(request):
+        return _json(exchange.cancel_order(request.query.get("symbol"), int(request.query.get("orderId", 0))))
+
+    async def open_orders(request):
+        return _json(exchange.open_orders(request.query.get("symbol")))
+
+    async def account(request):
+        return _json(exchange.account_info())
+
+    async def my_trades(request):
+        params = request.query
+        from_id = params.get("fromId")
+        return _json(exchange.my_trades(params.get("symbol"), int(from_id) if from_id else None,
+                                        int(params.get("limit", 500))))
+
+    app = web.Application(middlewares=[faults_middleware])
+    app.router.add_get("/api/v1/ping", ping)
+    app.router.add_get("/api/v1/time", server_time)
+    app.router.add_get("/api/v1/exchangeInfo", exchange_info)
+    app.router.add_get("/api/v1/depth", depth)
+    app.router.add_get("/api/v1/ticker/24hr", ticker_24h)
+    app.router.add_get("/api/v3/ticker/bookTicker", book_ticker)
+    app.router.add_post("/api/v3/order", new_order)
+    app.router.add_post("/api/v3/order/test", new_test_order)
+    app.router.add_delete("/api/v3/order", cancel_order)
+    app.router.add_get("/api/v3/openOrders", open_orders)
+    app.router.add_get("/api/v3/account", account)
+    app.router.add_get("/api/v3/myTrades", my_trades)
+    return app
+
+
+async def serve(exchange: SimExchange, host: str = "127.0.0.1", port: int = 18780, faults: SimFaults = None):
+    from aiohttp import web
+    runner = web.AppRunner(create_app(exchange, faults))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    LOG.info("Simulated exchange listens on http://{}:{}".format(host, port))
+    return runner
+
+
+if __name__ == '__main__':
+    from configparser import ConfigParser
+    from services import binance_worker
+
+    sim = SimExchange(seed=1)
+    for base, price in (("ETH", 0.03), ("LTC", 0.008), ("NEO", 0.0009), ("BNB", 0.0015)):
+        sim.add_symbol(models.SymbolInfo(
+            symbol=base + "BTC", status="TRADING", base_asset=base, quote_asset="BTC", min_price=0.000001,
+            max_price=100000.0, tick_size=0.000001, min_qty=0.001, max_qty=100000.0, step_size=0.001,
+            min_notional=0.001), last_price=price, quote_volume=1000.0)
+        sim.refill_liquidity(base + "BTC")
+    sim.set_balance("BTC", 1.0)
+    sim.set_balance("LTC", 2.0)
+    sim.add_own_trade("LTCBTC", SIDE_BUY, 0.0075, 2.0)
+
+    sim_config = ConfigParser()
+    worker = binance_worker.BinanceWorker(
+        config=sim_config,
+        api_wrapper=binance_worker.ApiWrapperSim(sim_config, sim, faults=SimFaults(error_rate=0.05, seed=1)))
+    for cycle in range(5):
+        worker.run_worker()
+        sim.step_market(takers_per_symbol=3)
+        LOG.info("Cycle:{} orders placed:{} fills:{} open:{} balances:{}".format(
+            cycle, sim.orders_placed, sim.fills, len(sim.open_orders()), sim.account_info()["balances"]))
@@ -0,0 +1,145 @@
+import math
+import random
+import time
+from typing import List
+from logger import logger
+from services import models
+from services import sim_exchange as sim
+
+LOG = logger.LOG
+
+# Share of the quote assets in the listed pairs, BTC pairs are the most of them as on the exchange
+QUOTE_ASSETS = (("BTC", 0.55), ("ETH", 0.2), ("BNB", 0.1), ("USDT", 0.15))
+QUOTE_PRICES_IN_BTC = {"BTC": 1.0, "ETH": 0.03, "BNB": 0.0015, "USDT": 0.00016}
+
+
+def _base_asset_name(index: int) -> str:
+    # A0, A1, ... ZZ99 style names which never collide with the quote assets
+    letters = ""
+    index, rest = divmod(index, 100)
+    while True:
+        index, letter = divmod(index, 26)
+        letters = chr(ord("A") + letter) + letters
+        if not index:
+            break
+        index -= 1
+    return "X{}{}".format(letters, rest)
+
+
+def _tick_for_price(price: float) -> float:
+    # Around four significant digits of the price, as the real price filters are set, but not below a satoshi
+    return 10 ** max(-8, min(-2, math.floor(math.log10(price)) - 3))
+
+
+class SyntheticMarket(object):
+    """
+    Seeded synthetic market on top of sim_exchange.SimExchange: symbols with realistic filters, 24h statistics
+    and books, held assets with trade histories and our open BUY orders. The same seed gives the same market.
+    :param symbols: number of listed pairs
+    :param held_assets: number of assets with non zero balance (BTC isn't counted)
+    :param trading_share: share of symbols with TRADING status, the rest are in BREAK
+    """
+
+    def __init__(self, symbols: int, held_assets: int, seed: int = 1, open_orders: int = 10,
+                 trades_per_asset: int = 3, trading_share: float = 0.97, btc_balance: float = 1.0,
+                 book_levels: int = 5):
+        if symbols <= 0:
+            raise ValueError("Did't got symbols param")
+        self.rnd = random.Random(seed)
+        self.exchange = sim.SimExchange(seed=seed)
+        self.symbols: List[str] = []
+        self.btc_symbols: List[str] = []
+        self._book_levels = book_levels
+        self._generate_symbols(symbols, trading_share)
+        self._generate_account(held_assets, btc_balance, trades_per_asset)
+        self._generate_open_orders(open_orders)
+
+    def _generate_symbols(self, count: int, trading_share: float):
+        rnd = self.rnd
+        quotes = [quote for quote, _ in QUOTE_ASSETS]
+        weights = [weight for _, weight in QUOTE_ASSETS]
+        for index in range(count):
+            base = _base_asset_name(index)
+            quote = rnd.choices(quotes, weights)[0]
+            # Prices are log-uniform from satoshis to tenths of BTC, volumes are log-normal
+            price_btc = 10 ** rnd.uniform(-7.5, -1)
+            price = price_btc / QUOTE_PRICES_IN_BTC[quote]
+            tick = _tick_for_price(price)
+            price = round(max(round(price / tick), 10) * tick, 8)
+            quote_volume = math.exp(rnd.gauss(3, 2)) / QUOTE_PRICES_IN_BTC[quote]
+            min_notional = 0.001 / QUOTE_PRICES_IN_BTC[quote]
+            step = 10 ** rnd.randint(-3, 0) if price < 1 else 0.001
+            info = models.SymbolInfo(
+                symbol=base + quote,
+                status="TRADING" if rnd.random() < trading_share else "BREAK",
+                base_asset=base,
+                quote_asset=quote,
+                min_price=tick,
+                max_price=round(price * 1000, 8),
+                tick_size=tick,
+                min_qty=step,
+                max_qty=90000000.0,
+                step_size=step,
+                min_notional=min_notional,
+            )
+            self.exchange.add_symbol(info, last_price=price, quote_volume=quote_volume,
+                                     price_change_percent=rnd.gauss(0, 6))
+            self.exchange.refill_liquidity(info.symbol, levels=self._book_levels)
+            self.symbols.append(info.symbol)
+            if quote == "BTC" and info.status == "TRADING":
+                self.btc_symbols.append(info.symbol)
+
+    def _generate_account(self, held_assets: int, btc_balance: float, trades_per_asset: int):
+        rnd = self.rnd
+        exchange = self.exchange
+        exchange.set_balance("BTC", btc_balance)
+        now_ms = exchange.now_ms()
+        for symbol in rnd.sample(self.btc_symbols, min(held_assets, len(self.btc_symbols))):
+            info = exchange.symbol_info(symbol)
+            last_price = exchange.book(symbol).best_bid() or info.min_price
+            qty = round(max(round(0.01 / last_price / info.step_size), 1) * info.step_size, 8)
+            exchange.set_balance(info.base_asset, qty)
+            # Bought some time ago around the current price, the oldest trade goes first
+            for i in range(trades_per_asset):
+                trade_price = round(last_price * rnd.uniform(0.85, 1.1), 8)
+                trade_time = now_ms - rnd.randint(1, 14 * 86400) * 1000 * (trades_per_asset - i)
+                exchange.add_own_trade(symbol, sim.SIDE_BUY, trade_price, qty, time_ms=trade_time)
+
+    def _generate_open_orders(self, count: int):
+        exchange = self.exchange
+        for symbol in self.rnd.sample(self.btc_symbols, min(count, len(self.btc_symbols))):
+            info = exchange.symbol_info(symbol)
+            best_bid = exchange.book(symbol).best_bid()
+            if not best_bid or best_bid <= info.tick_size:
+                continue
+            price = round(best_bid - info.tick_size, 8)
+            qty = round(max(round(info.min_notional * 2 / price / info.step_size), 1) * info.step_size, 8)
+            res = exchange.place_order(symbol, sim.SIDE_BUY, sim.ORDER_TYPE_LIMIT, qty, price=price,
+                                       time_in_force="GTC")
+            if "code" in res:
+                LOG.debug("Synthetic open order for {} was rejected: {}".format(symbol, res))
+
+    # Raw json of the market, as the REST api gives it
+
+    def exchange_info(self) -> dict:
+        return self.exchange.exchange_info()
+
+    def ticker_24h(self) -> List[dict]:
+        return self.exchange.ticker_24h()
+
+    def account_info(self) -> dict:
+        return self.exchange.account_info()
+
+    def open_orders(self) -> List[dict]:
+        return self.exchange.open_orders()
+
+    def my_trades(self, symbol: str) -> List[dict]:
+        return self.exchange.my_trades(symbol)
+
+
+if __name__ == '__main__':
+    started = time.perf_counter()
+    market = SyntheticMarket(symbols=1000, held_assets=50, seed=7)
+    LOG.info("Generated {} symbols ({} trading BTC pairs), {} balances, {} open orders in {:.2f} sec".format(
+        len(market.symbols), len(market.btc_symbols), len(market.account_info()["balances"]),
+        len(market.open_orders()), time.perf_counter() - started))
@@ -0,0 +1,124 @@
+import json
+import os
+from collections import OrderedDict
+from typing import List
+from logger import logger
+from utils import utc_timestamp as tm
+
+LOG = logger.LOG
+
+MY_TRADES_PAGE_LIMIT = 500
+
+
+class MyTradesCache(object):
+    """
+    Last known own trade per symbol, synced incrementally with fromId.
+    Entries are evicted in LRU order over symbols and persisted to a json file by save(),
+    so a restart continues from the last seen trade id.
+
+    Every fill changes the total (free + locked) balance of the asset. While the balance
+    is the same as on the last sync, the cached trade is returned without any request.
+    """
+
+    def __init__(self, api, path: str = None, max_symbols: int = 512, recv_window: int = 5000):
+        if not api:
+            raise ValueError("Did't got api param")
+        self._api = api
+        self._path = path
+        self._max_symbols = max_symbols
+        self._recv_window = recv_window
+        self._entries: OrderedDict = OrderedDict()
+        self._is_dirty = False  # Entries have changed since the last save
+        self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, symbol: str):
+        return symbol in self._entries
+
+    def load(self):
+        if not self._path or not os.path.exists(self._path):
+            return
+        try:
+            with open(self._path, "r") as f:
+                entries = json.load(f)
+            for symbol, entry in entries:
+                self._entries[symbol] = entry
+            while len(self._entries) > self._max_symbols:
+                self._entries.popitem(last=False)
+            LOG.debug("Loaded {} symbols from trades cache {}".format(len(self._entries), self._path))
+        except Exception as ex:
+            LOG.error("Error fired in {} with:{}. Start with empty trades cache".format(LOG.func_name(), ex.args[-1]))
+            self._entries.clear()
+
+    def snapshot(self) -> list:
+        # [(symbol, entry)] from the least recently used, entries are replaced on sync, not changed in place
+        return list(self._entries.items())
+
+    def restore(self, entries: list) -> int:
+        """
+        Adds entries of symbols which the cache doesn't know yet, e.g. from a worker checkpoint.
+        A restored entry is trusted only while the asset balance is the same, see last_trades
+        """
+        restored = 0
+        # The known entries are newer, the restored ones go before them in their own order
+        for symbol, entry in reversed(entries):
+            if symbol not in self._entries:
+                self._entries[symbol] = entry
+                self._entries.move_to_end(symbol, last=False)
+                restored += 1
+        while len(self._entries) > self._max_symbols:
+            self._entries.popitem(last=False)
+        self._is_dirty = self._is_dirty or restored > 0
+        return restored
+
+    def save(self):
+        # Called once per worker cycle, the file is written only if some entry has changed
+        if not self._path or not self._is_dirty:
+            return
+        try:
+            tmp_path = self._path + ".tmp"
+            with open(tmp_path, "w") as f:
+                # Saved as a list of pairs to keep the LRU order
+                json.dump(list(self._entries.items()), f)
+            os.replace(tmp_path, self._path)
+            self._is_dirty = False
+        except Exception as ex:
+            LOG.error("Error fired in {} with:{}".format(LOG.func_name(), ex.args[-1]))
+
+    def _fetch(self, symbol: str, **kwargs) -> List[dict]:
+        res = self._api.my_trades(symbol=symbol, timestamp=tm.utc_timestamp(), recvWindow=self._recv_window, **kwargs)
+        if not isinstance(res, list):
+            raise ValueError("Error with my_trades for symbol {}: {}".format(symbol, res))
+        return res
+
+    def _sync(self, symbol: str, last_trade: dict) -> dict:
+        if last_trade is None:
+            trades = self._fetch(symbol, limit=1)
+            return trades[-1] if trades else None
+        page = self._fetch(symbol, fromId=last_trade["id"] + 1, limit=MY_TRADES_PAGE_LIMIT)
+        while page:
+            last_trade = page[-1]
+            if len(page) < MY_TRADES_PAGE_LIMIT:
+                break
+            page = self._fetch(symbol, fromId=last_trade["id"] + 1, limit=MY_TRADES_PAGE_LIMIT)
+        return last_trade
+
+    def last_trades(self, symbol: str, total_balance: float = None) -> List[dict]:
+        """
+        :return: [last_trade] or [] when there are no trades for the symbol yet
+        """
+        entry = self._entries.get(symbol)
+        if entry is not None:
+            self._entries.move_to_end(symbol)
+            if total_balance is not None and entry["balance"] == total_balance:
+                return [entry["last_trade"]] if entry["last_trade"] else []
+        last_trade = self._sync(symbol, entry["last_trade"] if entry else None)
+        new_entry = {"last_trade": last_trade, "balance": total_balance}
+        self._entries[symbol] = new_entry
+        if len(self._entries) > self._max_symbols:
+            self._entries.popitem(last=False)
+        if new_entry != entry:
+            self._is_dirty = True
+        return [last_trade] if last_trade else []
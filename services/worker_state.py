@@ -0,0 +1,115 @@
+import time
+from typing import Callable, Dict, FrozenSet, List, Tuple
+from logger import logger
+from core import metrics
+from services import models
+
+LOG = logger.LOG
+
+# A rejected order refreshes the symbols metadata not more often, dust positions may be rejected every cycle
+REJECTED_REFRESH_MIN_AGE_SEC = 60.0
+
+
+class CachedValue(object):
+    """
+    Value fetched from the exchange and kept between worker cycles until it expires or is invalidated
+    :param ttl_sec: 0 - fetched every time
+    """
+
+    def __init__(self, name: str, ttl_sec: float):
+        self.name = name
+        self.ttl_sec = ttl_sec
+        self.value = None
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        self.invalidated_by: str = "empty"
+        self._hits_counter = metrics.counter("worker.state.{}.hits".format(name))
+        self._misses_counter = metrics.counter("worker.state.{}.misses".format(name))
+
+    def is_valid(self) -> bool:
+        return self.invalidated_by is None and time.monotonic() < self._expires_at
+
+    def get(self, fetch_func: Callable):
+        """
+        :return: the kept value or a fetched one, a failed fetch (None) isn't kept
+        """
+        if self.is_valid():
+            self._hits_counter.inc()
+            return self.value
+        self._misses_counter.inc()
+        reason = self.invalidated_by if self.invalidated_by else "expired"
+        value = fetch_func()
+        if value is not None:
+            self.value = value
+            self._fetched_at = time.monotonic()
+            self._expires_at = self._fetched_at + self.ttl_sec
+            self.invalidated_by = None
+        LOG.debug("Worker state '{}' has fetched, reason: {}".format(self.name, reason))
+        return value
+
+    def restore(self, value, age_sec: float):
+        # Value from a checkpoint, it lives only the rest of its ttl
+        if value is None or age_sec >= self.ttl_sec:
+            return
+        self.value = value
+        self._fetched_at = time.monotonic() - age_sec
+        self._expires_at = self._fetched_at + self.ttl_sec
+        self.invalidated_by = None
+
+    def invalidate(self, reason: str, min_age_sec: float = 0.0):
+        """
+        :param min_age_sec: a value fetched less than min_age_sec ago is kept
+        """
+        if self.invalidated_by is None and time.monotonic() - self._fetched_at >= min_age_sec:
+            self.invalidated_by = reason
+
+
+def orders_fingerprint(open_orders: List[models.Order]) -> FrozenSet[Tuple[int, float]]:
+    # Any fill, cancel or new order on the account changes it
+    return frozenset((order.order_id, order.executed_qty) for order in open_orders)
+
+
+class WorkerState(object):
+    """
+    State of the worker which lives between cycles, with the rules when a part of it is fetched again:
+    - symbols metadata: after Exchange.symbols_info_ttl_sec, or when the exchange has rejected our order
+      (a filter or the symbol status may have changed), at most once a REJECTED_REFRESH_MIN_AGE_SEC;
+    - account balances: after Exchange.account_ttl_sec, after we have created or cancelled an order,
+      or when the open orders aren't the ones we have left after the last cycle (fills, manual trading).
+    Open orders are fetched every cycle, they are the cheap signal of the account changes.
+    Market data (24h and book tickers) is always fresh, it is what changes between cycles.
+    """
+
+    def __init__(self, exchange_settings):
+        """
+        :param exchange_settings: core.config.ExchangeSettings
+        """
+        self.symbols_info = CachedValue("symbols_info", exchange_settings.symbols_info_ttl_sec)
+        self.balances = CachedValue("balances", exchange_settings.account_ttl_sec)
+        self._orders_fingerprint: FrozenSet[Tuple[int, float]] = None
+        # Open orders of the last fetch by id and orders created after it, for the checkpoint
+        self.open_orders: Dict[int, models.Order] = {}
+        self.created_orders: List[Tuple[str, str, float]] = []
+
+    def on_open_orders(self, open_orders: List[models.Order]):
+        self.open_orders = {order.order_id: order for order in open_orders}
+        self.created_orders = []
+        fingerprint = orders_fingerprint(open_orders)
+        if fingerprint != self._orders_fingerprint:
+            self.balances.invalidate("open orders have changed")
+        self._orders_fingerprint = fingerprint
+
+    def on_order_sent(self, ok: bool):
+        # Our own orders change the account, a rejected one may mean stale symbol filters
+        self._orders_fingerprint = None
+        self.balances.invalidate("orders have been sent")
+        if not ok:
+            self.symbols_info.invalidate("order has been rejected", REJECTED_REFRESH_MIN_AGE_SEC)
+
+    def on_order_created(self, symbol: str, side: str, price: float):
+        self.created_orders.append((symbol, side, round(price, 8) if price else None))
+
+    def invalidate_all(self, reason: str):
+        self.symbols_info.invalidate(reason)
+        self.balances.invalidate(reason)
+        self._orders_fingerprint = None
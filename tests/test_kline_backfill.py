@@ -0,0 +1,108 @@
+import asyncio
+import calendar
+import configparser
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from services import kline_backfill
+
+MONTH = "1M"
+
+
+def _month_ms(year: int, month: int) -> int:
+    return calendar.timegm(datetime(year, month, 1).timetuple()) * 1000
+
+
+def _monthly_kline(year: int, month: int) -> list:
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    open_time = _month_ms(year, month)
+    return [open_time, "1.0", "1.1", "0.9", "1.0", "100.0", _month_ms(next_year, next_month) - 1, "100.0", 10]
+
+
+class _MonthlyKlinesApi(object):
+    # Answers like the exchange: the candles with open time inside the requested window
+    def __init__(self, klines: list):
+        self.klines = klines
+        self.windows = []
+
+    def fetch_klines(self, callback, symbol, interval, start_time=None, end_time=None, limit=None):
+        self.windows.append((start_time, end_time))
+        page = [kline for kline in self.klines if start_time <= kline[0] <= end_time][:limit]
+
+        async def _answer():
+            return json.dumps(page)
+
+        return asyncio.ensure_future(_answer())
+
+
+class TestKlineTopUp(unittest.TestCase):
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        shutil.rmtree(self.root_dir)
+
+    def test_monthly_top_up_after_february(self):
+        klines = [_monthly_kline(2024, month) for month in (1, 2, 3, 4)]
+        api = _MonthlyKlinesApi(klines)
+        config = configparser.ConfigParser()
+        config.read_dict({"Backfill": {"requests_per_sec": "1000"}})
+        backfill = kline_backfill.KlineBackfill(config, api=api, store=kline_backfill.CandleStore(self.root_dir))
+        backfill.store.append("ETHBTC", MONTH, klines[:2])
+
+        stored = self.loop.run_until_complete(backfill.top_up("ETHBTC", MONTH, klines[0][0]))
+
+        self.assertEqual(2, stored)
+        candles = backfill.store.load("ETHBTC", MONTH)
+        self.assertEqual([kline[0] for kline in klines], list(candles.open_time))
+        self.assertEqual(klines[1][0] + 1, api.windows[0][0])
+
+
+class TestCandleStore(unittest.TestCase):
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+        self.store = kline_backfill.CandleStore(self.root_dir)
+        self.klines = [_monthly_kline(2024, month) for month in (1, 2, 3, 4)]
+        self.store.append("ETHBTC", MONTH, self.klines[:2])
+
+    def tearDown(self):
+        shutil.rmtree(self.root_dir)
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.root_dir, "ETHBTC", MONTH, name + ".bin")
+
+    def test_missing_column_moves_series_aside(self):
+        with open(self._column_path("close"), "rb") as f:
+            close_column = f.read()
+        os.remove(self._column_path("volume"))
+
+        stored = self.store.append("ETHBTC", MONTH, self.klines)
+
+        self.assertEqual(4, stored)
+        self.assertEqual([kline[0] for kline in self.klines], list(self.store.load("ETHBTC", MONTH).open_time))
+        corrupt_dirs = [name for name in os.listdir(os.path.join(self.root_dir, "ETHBTC")) if name != MONTH]
+        self.assertEqual(1, len(corrupt_dirs))
+        with open(os.path.join(self.root_dir, "ETHBTC", corrupt_dirs[0], "close.bin"), "rb") as f:
+            self.assertEqual(close_column, f.read())
+
+    def test_torn_column_is_cut_to_complete_rows(self):
+        with open(self._column_path("open_time"), "ab") as f:
+            f.write(b"\x01\x02\x03")
+
+        stored = self.store.append("ETHBTC", MONTH, self.klines[2:])
+
+        self.assertEqual(2, stored)
+        self.assertEqual([kline[0] for kline in self.klines], list(self.store.load("ETHBTC", MONTH).open_time))
+        self.assertEqual(4 * 8, os.path.getsize(self._column_path("open_time")))
+
+
+if __name__ == '__main__':
+    unittest.main()
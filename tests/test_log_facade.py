@@ -0,0 +1,72 @@
+import logging
+import threading
+import unittest
+
+from core import config as cfg
+from core import log_facade
+from core import metrics
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.getMessage(), threading.current_thread() is threading.main_thread()))
+
+
+class _Log(object):
+    # Same shape as logger.LOG: the level methods and the file handler of its logging.Logger
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(name)
+        self._logger.propagate = False
+        self._logger.setLevel(logging.DEBUG)
+        self.log_file_handler = _ListHandler()
+        self._logger.addHandler(self.log_file_handler)
+
+    def debug(self, msg):
+        self._logger.debug(msg)
+
+    def info(self, msg):
+        self._logger.info(msg)
+
+
+def _settings(queue_size: int = 100) -> cfg.LogSettings:
+    return cfg.LogSettings(level="DEBUG", queue_size=queue_size, rank_log_every_n=1, metrics_interval_sec=0)
+
+
+class TestLogFacade(unittest.TestCase):
+    def setUp(self):
+        self.log = _Log("test_log_facade.{}".format(self.id()))
+        self.facade = log_facade.LogFacade(self.log)
+
+    def tearDown(self):
+        self.facade.stop()
+
+    def test_direct_and_facade_records_keep_order(self):
+        self.facade.configure(_settings())
+        for num in range(50):
+            self.log.info("direct {}".format(num))
+            self.facade.debug("facade {}", num)
+        self.facade.flush()
+
+        expected = [text.format(num) for num in range(50) for text in ("direct {}", "facade {}")]
+        self.assertEqual(expected, [msg for msg, _ in self.log.log_file_handler.records])
+        self.assertFalse(any(in_main for _, in_main in self.log.log_file_handler.records))
+
+    def test_full_queue_drops_records(self):
+        self.facade.configure(_settings(queue_size=1))
+        self.facade._listener.stop()  # Nobody reads the queue
+        dropped = metrics.counter("log.dropped").value
+        for num in range(5):
+            self.facade.info("record {}", num)
+
+        self.assertEqual(dropped + 4, metrics.counter("log.dropped").value)
+        self.facade._start_listener()
+        self.facade.flush()
+        self.assertEqual(["record 0"], [msg for msg, _ in self.log.log_file_handler.records])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import configparser
+import unittest
+
+from core import config as cfg
+from services import binance_worker
+from services import models
+from services import order_reconciler
+from services import sim_market
+
+
+def _open_order(symbol: str, price: float, qty: float) -> models.Order:
+    return models.Order(symbol, 1, "BUY", "LIMIT", price, qty, 0.0, "NEW", "GTC")
+
+
+class TestReconcile(unittest.TestCase):
+    def test_quantity_within_tolerance_keeps_order(self):
+        order = _open_order("ETHBTC", 0.006063, 16.493)
+        intent = order_reconciler.OrderIntent("ETHBTC", "BUY", "LIMIT", 16.823, 0.006063, "GTC")
+
+        plan = order_reconciler.reconcile([intent], [order], qty_tolerance_pct=5)
+
+        self.assertEqual([order], plan.kept)
+        self.assertFalse(plan.to_cancel or plan.to_create)
+
+    def test_quantity_out_of_tolerance_replaces_order(self):
+        order = _open_order("ETHBTC", 0.006063, 10.0)
+        intent = order_reconciler.OrderIntent("ETHBTC", "BUY", "LIMIT", 16.823, 0.006063, "GTC")
+
+        plan = order_reconciler.reconcile([intent], [order], qty_tolerance_pct=5)
+
+        self.assertEqual(([order], [intent]), (plan.to_cancel, plan.to_create))
+
+
+class TestSteadyMarket(unittest.TestCase):
+    def test_steady_market_keeps_every_order(self):
+        market = sim_market.SyntheticMarket(symbols=100, held_assets=5, seed=1)
+        config = configparser.ConfigParser()
+        settings = cfg.Settings.from_parser(config)
+        wrapper = binance_worker.ApiWrapperSim(config, market.exchange, settings=settings)
+        worker = binance_worker.BinanceWorker(config, api_wrapper=wrapper, settings=settings)
+        plans = []
+        reconcile = order_reconciler.reconcile
+
+        def _reconcile(*args, **kwargs):
+            plans.append(reconcile(*args, **kwargs))
+            return plans[-1]
+
+        try:
+            order_reconciler.reconcile = _reconcile
+            # The first cycle places the orders, the market doesn't move after it
+            for _ in range(4):
+                worker._work()
+        finally:
+            order_reconciler.reconcile = reconcile
+
+        self.assertEqual(4, len(plans))
+        self.assertTrue(plans[0].to_create)
+        for plan in plans[1:]:
+            self.assertEqual((len(plans[0].to_create), 0, 0),
+                             (len(plan.kept), len(plan.to_cancel), len(plan.to_create)))
+
+
+if __name__ == '__main__':
+    unittest.main()
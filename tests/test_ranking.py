@@ -0,0 +1,39 @@
+import random
+import unittest
+
+from services import models
+from services import ranking
+
+
+def _ticker(symbol: str, rnd: random.Random) -> models.Ticker:
+    bid = rnd.uniform(0.0001, 0.1)
+    return models.Ticker(symbol, bid, bid, bid * rnd.uniform(1.001, 1.1), rnd.uniform(1, 1000), rnd.uniform(-10, 10))
+
+
+class TestTickerRanking(unittest.TestCase):
+    def setUp(self):
+        self.rnd = random.Random(1)
+        self.ranking = ranking.TickerRanking(percent_multiply_coef=2)
+        self.ranking.update_tickers([_ticker("S{}BTC".format(num), self.rnd) for num in range(500)])
+
+    def _full_sort(self) -> list:
+        tickers = [self.ranking.ticker("S{}BTC".format(num)) for num in range(500)]
+        return sorted((ticker.rank for ticker in tickers if ticker), reverse=True)
+
+    def test_top_matches_full_sort(self):
+        for k in (1, 10, 100, 499, 500, 600):
+            self.assertEqual(self._full_sort()[:k], [ticker.rank for ticker in self.ranking.top(k)])
+
+    def test_top_after_updates_matches_full_sort(self):
+        for num in self.rnd.sample(range(500), 200):
+            bid = self.rnd.uniform(0.0001, 0.1)
+            self.ranking.update_book("S{}BTC".format(num), bid, bid * self.rnd.uniform(1.001, 1.1))
+        for num in self.rnd.sample(range(500), 50):
+            self.ranking.remove("S{}BTC".format(num))
+
+        self.assertEqual(self._full_sort()[:20], [ticker.rank for ticker in self.ranking.top(20)])
+        self.assertEqual(self._full_sort(), [ticker.rank for ticker in self.ranking.sorted_all()])
+
+
+if __name__ == '__main__':
+    unittest.main()
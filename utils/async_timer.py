@@ -1,6 +1,7 @@
 import asyncio
 from logger import logger
 from core import global_event_loop as gloop
+from core import tracing
 
 
 LOG = logger.LOG
@@ -15,7 +16,8 @@ class Timer(object):
     def start(self) -> bool:
         async def _async_f():
             try:
-                await asyncio.sleep(self._timeout)
+                with tracing.span("timer.sleep", timeout_sec=self._timeout):
+                    await asyncio.sleep(self._timeout)
             except Exception as ex:
                 LOG.error("Error with async_start_timer: {}".format(ex.args[-1]))
                 return None
@@ -0,0 +1,30 @@
+import asyncio
+import time
+
+
+# Token bucket shared by coroutines. Binance counts request weight per minute, so callers
+# acquire the weight of the endpoint they are going to hit.
+class RateLimiter(object):
+    def __init__(self, rate_per_sec: float, burst: float = None):
+        if not rate_per_sec or rate_per_sec <= 0:
+            raise ValueError("Did't got correct rate_per_sec param: {}".format(rate_per_sec))
+        self._rate = float(rate_per_sec)
+        self._capacity = float(burst) if burst else float(rate_per_sec)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    async def acquire(self, weight: float = 1):
+        if weight > self._capacity:
+            raise ValueError("Weight {} is bigger than limiter capacity {}".format(weight, self._capacity))
+        async with self._lock:
+            self._refill()
+            while self._tokens < weight:
+                await asyncio.sleep((weight - self._tokens) / self._rate)
+                self._refill()
+            self._tokens -= weight
@@ -1,5 +1,17 @@
 import time
 
+# Exchange clock minus the local one, signed requests are stamped by the exchange clock
+_offset_ms = 0
+
 
 def utc_timestamp() -> int:
-    return int(time.time() * 1000)
+    return int(time.time() * 1000) + _offset_ms
+
+
+def set_offset_ms(offset_ms: int):
+    global _offset_ms
+    _offset_ms = int(offset_ms)
+
+
+def offset_ms() -> int:
+    return _offset_ms